@@ -0,0 +1,119 @@
+"""
+Build time, memory, lookup latency and update cost of the autocomplete
+tries in core/autocomplete.py on synthetic catalog names.
+
+    python -m benchmarks.autocomplete --entries 1000000 --queries 20000
+    python -m benchmarks.autocomplete --from-db            # the configured database's values
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fanzone_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from chatbot.loadtest import percentile  # noqa: E402
+from core.autocomplete import AutocompleteIndex, KINDS, autocomplete_settings, keys, source_counts  # noqa: E402
+from core.datagen import ACTIVITY_WORDS, HOTEL_WORDS  # noqa: E402
+
+SYLLABLES = ['ma', 'ra', 'ka', 'sa', 'ta', 'na', 'li', 'mi', 'ri', 'zi', 'bo', 'do', 'fo', 'lo', 'ko', 'tu', 'du',
+             'ya', 'el', 'al', 'ou', 'an', 'es', 'ir', 'és']
+
+# Share of the entries per kind
+MIX = {'hotel': 0.55, 'activity': 0.25, 'match': 0.1, 'city': 0.04, 'stadium': 0.03, 'team': 0.03}
+
+PATTERNS = {
+    'hotel': lambda word, rng: f'{word()} {rng.choice(HOTEL_WORDS)} {word()}',
+    'activity': lambda word, rng: f'{word()} {rng.choice(ACTIVITY_WORDS)}',
+    'match': lambda word, rng: f'{word()} vs {word()} {rng.randint(1, 64)}',
+    'city': lambda word, rng: f'{word()} {word()}',
+    'stadium': lambda word, rng: f'Stade {word()} {word()}',
+    'team': lambda word, rng: f'{word()} {word()} FC',
+}
+
+
+def synthetic_counts(count, seed=0):
+    """{(kind, text): (rows, bookings)} with heavy-tailed popularity"""
+    rng = random.Random(seed)
+
+    def word():
+        return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+
+    counts = {}
+    for kind, share in MIX.items():
+        target = len(counts) + int(count * share)
+        while len(counts) < target:
+            counts[kind, PATTERNS[kind](word, rng)] = (int(rng.paretovariate(1.5)), int(rng.paretovariate(1.2)) - 1)
+    return counts
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--updates', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--from-db', action='store_true', help='Index the values of the configured database')
+    args = parser.parse_args()
+
+    counts = dict(source_counts()) if args.from_db else synthetic_counts(args.entries, args.seed)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    limit = autocomplete_settings()['limit']
+    index, build_ms = timed(lambda: AutocompleteIndex.from_counts(counts, limit))
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # What people type: the first 1-8 characters of a word of an existing entry
+    rng = random.Random(args.seed)
+    entries = list(counts)
+    prefixes = []
+    for _ in range(args.queries):
+        kind, text = rng.choice(entries)
+        key = rng.choice(keys(text))
+        prefixes.append((kind, key[:rng.randint(1, min(8, len(key)))]))
+
+    report = {
+        'entries': len(index),
+        'build_ms': round(build_ms, 1),
+        'memory_mib': round((rss_after - rss_before) / 1024, 1),
+    }
+    for mode in ('all_kinds', 'one_kind'):
+        latencies, empty = [], 0
+        for kind, prefix in prefixes:
+            kinds = [kind] if mode == 'one_kind' else None
+            results, ms = timed(lambda: index.search(prefix, kinds, limit))
+            latencies.append(ms)
+            empty += not results
+        latencies.sort()
+        report[mode] = {
+            'empty': empty,
+            'latency_ms_p50': round(percentile(latencies, 50), 4),
+            'latency_ms_p99': round(percentile(latencies, 99), 4),
+            'latency_ms_max': round(max(latencies), 3),
+        }
+
+    # New bookings of existing values, then values added and removed again, as model signals would apply them
+    booked = [rng.choice(entries) for _ in range(args.updates)]
+    _, booking_ms = timed(lambda: index.apply([(kind, text, 0, 1) for kind, text in booked]))
+    added = [(rng.choice(KINDS), f'Nouveau {rng.choice(SYLLABLES)}{number}') for number in range(args.updates)]
+    _, insert_ms = timed(lambda: index.apply([(kind, text, 1, 0) for kind, text in added]))
+    _, remove_ms = timed(lambda: index.apply([(kind, text, -1, 0) for kind, text in added]))
+    report['booking_update_us_avg'] = round(booking_ms * 1000 / max(args.updates, 1), 1)
+    report['insert_us_avg'] = round(insert_ms * 1000 / max(args.updates, 1), 1)
+    report['remove_us_avg'] = round(remove_ms * 1000 / max(args.updates, 1), 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
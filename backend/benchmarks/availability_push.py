@@ -0,0 +1,158 @@
+"""
+Fan-out cost of the match ticket availability push (core/availability.py,
+core/consumers.py) with simulated WebSocket subscribers on an in-memory
+channel layer.
+
+One broadcaster coalesces a stream of ticket changes. Each of ``--processes``
+hubs stands in for one server process and writes the deltas to its share of
+the subscribers. Popular tickets get most of the subscribers and most of the
+changes.
+
+    python -m benchmarks.availability_push --subscribers 100000 --seconds 5 --changes-per-second 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fanzone_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from channels.layers import InMemoryChannelLayer  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+from chatbot.loadtest import percentile  # noqa: E402
+from core.availability import BROADCASTER_CHANNEL, DEFAULTS  # noqa: E402
+from core.consumers import AvailabilityBroadcaster, AvailabilityHub  # noqa: E402
+
+
+class Socket:
+    """Stands in for a WebSocket consumer; counts the frames written to it"""
+    __slots__ = ('frames',)
+
+    def __init__(self):
+        self.frames = 0
+
+    async def send(self, text_data):
+        self.frames += 1
+
+
+class TimedHub(AvailabilityHub):
+    def __init__(self, layer, run):
+        super().__init__(layer)
+        self.run = run
+
+    async def dispatch(self, tickets):
+        sent = await super().dispatch(tickets)
+        self.run['frames'] += sent
+        self.run['fanout_ms'][-1] = (time.perf_counter() - self.run['broadcast_at']) * 1000
+        return sent
+
+
+class TimedBroadcaster(AvailabilityBroadcaster):
+    def __init__(self, run):
+        super().__init__()
+        self.run = run
+
+    async def broadcast(self):
+        now = time.perf_counter()
+        self.run['broadcast_at'] = now
+        self.run['fanout_ms'].append(0.0)
+        for pk in self.pending:
+            self.run['deltas'].setdefault(pk, []).append(now)
+        return await super().broadcast()
+
+
+def max_per_second(times):
+    """Most timestamps in any one-second window"""
+    best, start = 0, 0
+    for end, moment in enumerate(times):
+        while moment - times[start] >= 1:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+async def simulate(args):
+    rng = random.Random(args.seed)
+    tickets = list(range(1, args.tickets + 1))
+    popularity = [1 / rank for rank in range(1, args.tickets + 1)]
+    layer = InMemoryChannelLayer(capacity=args.changes_per_second * 2)
+    run = {'frames': 0, 'fanout_ms': [], 'deltas': {}, 'broadcast_at': 0.0}
+
+    hubs = [TimedHub(layer, run) for _ in range(args.processes)]
+    sockets = [Socket() for _ in range(args.subscribers)]
+    subscriptions = 0
+    for number, socket in enumerate(sockets):
+        watched = set(rng.choices(tickets, popularity, k=rng.randint(1, args.tickets_per_subscriber)))
+        await hubs[number % args.processes].subscribe(socket, watched)
+        subscriptions += len(watched)
+
+    broadcaster = TimedBroadcaster(run)
+    broadcaster.channel_layer = layer
+
+    async def broadcast_loop():
+        while True:
+            await broadcaster.availability_changed(await layer.receive(BROADCASTER_CHANNEL))
+
+    listener = asyncio.ensure_future(broadcast_loop())
+    available = {pk: 20000 for pk in tickets}
+    published, started = 0, time.perf_counter()
+    tick = 0.01
+    while time.perf_counter() - started < args.seconds:
+        for pk in rng.choices(tickets, popularity, k=max(1, int(args.changes_per_second * tick))):
+            available[pk] = max(0, available[pk] - rng.randint(1, 4))
+            await layer.send(BROADCASTER_CHANNEL, {
+                'type': 'availability.changed', 'tickets': [[pk, available[pk], time.time()]]})
+            published += 1
+        await asyncio.sleep(tick)
+    await asyncio.sleep(args.interval * 2)  # let the last broadcast fan out
+    listener.cancel()
+    for hub in hubs:
+        await hub.stop()
+
+    fanout = sorted(run['fanout_ms'])
+    deltas = sum(len(times) for times in run['deltas'].values())
+    return {
+        'subscribers': args.subscribers,
+        'subscriptions': subscriptions,
+        'processes': args.processes,
+        'interval_s': args.interval,
+        'changes_published': published,
+        'broadcasts': len(fanout),
+        'ticket_deltas': deltas,
+        'changes_per_delta': round(published / max(deltas, 1), 1),
+        'max_deltas_per_ticket_per_second': max((max_per_second(times) for times in run['deltas'].values()), default=0),
+        'frames_sent': run['frames'],
+        'frames_per_second': round(run['frames'] / args.seconds),
+        'fanout_ms_p50': round(percentile(fanout, 50), 1) if fanout else None,
+        'fanout_ms_p95': round(percentile(fanout, 95), 1) if fanout else None,
+        'fanout_ms_max': round(max(fanout), 1) if fanout else None,
+        'peak_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--subscribers', type=int, default=100000)
+    parser.add_argument('--tickets', type=int, default=468, help='Match tickets watched; both tournaments have 468')
+    parser.add_argument('--tickets-per-subscriber', type=int, default=3)
+    parser.add_argument('--processes', type=int, default=4, help='Server processes, one hub each')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--changes-per-second', type=int, default=5000)
+    parser.add_argument('--interval', type=float, default=DEFAULTS['interval'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    settings.AVAILABILITY_PUSH = {**getattr(settings, 'AVAILABILITY_PUSH', {}), 'interval': args.interval}
+    print(json.dumps(asyncio.run(simulate(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Prompt size and latency of long chatbot conversations, with and without the
+token-budgeted context window, against a local fake model.
+
+    python -m benchmarks.chat_context --turns 200
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from chatbot.context import DEFAULT_CONTEXT, ChatContext, estimate_tokens, prompt_tokens
+
+SYSTEM_PROMPT = (
+    "You are a helpful travel package assistant specializing in sports tourism. "
+    "You help users find and book sports event tickets, flights to event locations, "
+    "hotel accommodations, local activities and tours, and complete travel packages."
+)
+
+CITIES = ['Casablanca', 'Rabat', 'Marrakech', 'Tangier', 'Agadir', 'Fez']
+TOPICS = ['hotels near the stadium', 'flights from Paris', 'fan zone activities', 'match tickets', 'a full package']
+
+
+class FakeModel:
+    """Stands in for Gemini: deterministic replies, latency grows with prompt size"""
+
+    def __init__(self, base_latency=0.002, latency_per_1k_tokens=0.004, seed=0):
+        self.base_latency = base_latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.random = random.Random(seed)
+
+    def generate_content(self, contents):
+        tokens = prompt_tokens(contents)
+        time.sleep(self.base_latency + self.latency_per_1k_tokens * tokens / 1000)
+        words = self.random.randint(40, 160)
+        return ' '.join(f"answer{i % 17}" for i in range(words))
+
+
+def user_messages(turns, seed=0):
+    rng = random.Random(seed)
+    for i in range(turns):
+        city, topic = rng.choice(CITIES), rng.choice(TOPICS)
+        detail = ' '.join(rng.choice(['cheap', 'family', 'late', 'central', 'quiet', 'VIP']) for _ in range(rng.randint(3, 30)))
+        yield f"Turn {i}: I'm looking for {topic} in {city}, ideally {detail}."
+
+
+def run(context, turns, seed):
+    model = FakeModel(seed=seed)
+    sizes, latencies = [], []
+    for message in user_messages(turns, seed):
+        started = time.perf_counter()
+        contents = context.build(message)
+        reply = model.generate_content(contents)
+        latencies.append((time.perf_counter() - started) * 1000)
+        sizes.append(prompt_tokens(contents) + estimate_tokens(context.system_prompt))
+        context.add_turn(message, reply)
+    latencies.sort()
+    return {
+        'prompt_tokens': {str(n): sizes[n - 1] for n in (1, 50, 100, 200) if n <= turns},
+        'max_prompt_tokens': max(sizes),
+        'total_prompt_tokens': sum(sizes),
+        'latency_ms_p50': round(statistics.median(latencies), 2),
+        'latency_ms_p95': round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        'total_seconds': round(sum(latencies) / 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = {
+        'full_history': run(ChatContext(SYSTEM_PROMPT, max_tokens=10 ** 9, keep_turns=10 ** 9), args.turns, args.seed),
+        'windowed': run(ChatContext(SYSTEM_PROMPT, **DEFAULT_CONTEXT), args.turns, args.seed),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, result in results.items():
+        print(f"{name}:")
+        for key, value in result.items():
+            print(f"  {key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
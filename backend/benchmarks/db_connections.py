@@ -0,0 +1,82 @@
+"""
+Request latency and connections opened per request for the configured
+database, to compare CONN_MAX_AGE=0, persistent connections and the psycopg
+pool (DB_CONN_MAX_AGE / DB_POOL / POSTGRES_* environment variables).
+
+    POSTGRES_DB=fanzone DB_POOL=True python -m benchmarks.db_connections --requests 2000 --threads 8
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fanzone_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import close_old_connections, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from core.db_pool import connection_metrics, reset_connection_counts  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--migrate', action='store_true', help='Run migrations first')
+    args = parser.parse_args()
+
+    if args.migrate:
+        call_command('migrate', verbosity=0)
+        connections.close_all()
+    path = reverse('flight-list')
+    remaining = iter(range(args.requests))
+    lock = threading.Lock()
+    latencies = []
+
+    def worker():
+        client = Client(HTTP_HOST='localhost')
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                started = time.perf_counter()
+                # The test client skips the handler's connection cleanup; do it like a real request.
+                close_old_connections()
+                client.get(path)
+                close_old_connections()
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+        finally:
+            connections.close_all()
+
+    reset_connection_counts()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(json.dumps({
+        'requests': len(latencies),
+        'threads': args.threads,
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'latency_ms_p50': round(latencies[len(latencies) // 2], 2),
+        'latency_ms_p99': round(latencies[int(len(latencies) * 0.99)], 2),
+        'databases': connection_metrics(),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+DRF JSONRenderer/JSONParser against the orjson-backed classes in
+core/fastjson.py on a flight list, checking that the rendered bytes match.
+
+    python -m benchmarks.json_rendering --rows 10000 --repeat 20
+"""
+import argparse
+import io
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fanzone_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from core.datagen import HOST_CITIES, ORIGIN_CITIES  # noqa: E402
+from core.fastjson import ORJSONParser, ORJSONRenderer, orjson  # noqa: E402
+from core.models import Flight  # noqa: E402
+from core.serializers import FlightSerializer  # noqa: E402
+
+
+def flights(rows, seed=0):
+    """Unsaved flights shaped like generate_fixtures output"""
+    rng = random.Random(seed)
+    start = datetime(2025, 12, 1, tzinfo=dt_timezone.utc)
+    result = []
+    for pk in range(1, rows + 1):
+        departure = start + timedelta(minutes=rng.randrange(0, 60 * 24 * 240))
+        result.append(Flight(
+            pk=pk, flight_number=f"AT{rng.randrange(100, 9999)}", airline=rng.choice(['Royal Air Maroc', 'Air Arabia', None]),
+            departure_city=rng.choice(ORIGIN_CITIES), arrival_city=rng.choice(HOST_CITIES),
+            departure_time=departure, arrival_time=departure + timedelta(minutes=rng.randrange(45, 600)),
+            price=Decimal(rng.randrange(4000, 150000)) / 100, available_seats=rng.randint(0, 220),
+            image_url=None, created_at=start, updated_at=departure,
+        ))
+    return result
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(min(timings), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = flights(args.rows)
+    started = time.perf_counter()
+    data = FlightSerializer(rows, many=True).data
+    serialize_ms = round((time.perf_counter() - started) * 1000, 2)
+    # The same rows as raw Decimal/datetime values, as returned by .values()
+    fields = [field.attname for field in Flight._meta.concrete_fields]
+    raw = [{name: getattr(row, name) for name in fields} for row in rows]
+
+    stdlib_renderer, fast_renderer = JSONRenderer(), ORJSONRenderer()
+    body = stdlib_renderer.render(data)
+    identical = fast_renderer.render(data) == body and fast_renderer.render(raw) == stdlib_renderer.render(raw)
+    context = {'encoding': 'utf-8'}
+
+    print(json.dumps({
+        'rows': args.rows,
+        'orjson': orjson.__version__ if orjson else None,
+        'payload_kib': round(len(body) / 1024, 1),
+        'identical_output': identical,
+        'serialize_ms': serialize_ms,
+        'render_ms': {
+            'stdlib': best_of(args.repeat, lambda: stdlib_renderer.render(data)),
+            'orjson': best_of(args.repeat, lambda: fast_renderer.render(data)),
+        },
+        'render_raw_values_ms': {
+            'stdlib': best_of(args.repeat, lambda: stdlib_renderer.render(raw)),
+            'orjson': best_of(args.repeat, lambda: fast_renderer.render(raw)),
+        },
+        'parse_ms': {
+            'stdlib': best_of(args.repeat, lambda: JSONParser().parse(io.BytesIO(body), parser_context=context)),
+            'orjson': best_of(args.repeat, lambda: ORJSONParser().parse(io.BytesIO(body), parser_context=context)),
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Build time and top-k query latency of the catalog retrieval index on a
+synthetic catalog, without a database or network.
+
+    python -m benchmarks.retrieval --docs 1000000
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from chatbot.retrieval import DEFAULT_INDEX, KINDS, CatalogIndex
+
+CITIES = ['Casablanca', 'Rabat', 'Marrakech', 'Tangier', 'Agadir', 'Fez', 'Meknes', 'Oujda', 'Tetouan', 'Ouarzazate',
+          'Paris', 'Madrid', 'London', 'Lisbon', 'Istanbul', 'Cairo', 'Dakar', 'Abidjan', 'Lagos', 'Montreal']
+WORDS = ['stadium', 'riad', 'medina', 'souk', 'beach', 'desert', 'tour', 'palace', 'garden', 'museum', 'fan', 'zone',
+         'luxury', 'budget', 'family', 'spa', 'rooftop', 'view', 'central', 'quiet', 'final', 'group', 'derby']
+QUERIES = ['hotels in Marrakech with a spa', 'flights from Paris to Rabat', 'fan zone Casablanca final',
+           'desert tour Ouarzazate', 'riad medina Fez rooftop view', 'match tickets Tangier stadium',
+           'luxury palace Agadir beach', 'museum Rabat']
+
+
+def synthetic_documents(count, seed=0):
+    rng = random.Random(seed)
+    for pk in range(count):
+        kind = KINDS[pk % len(KINDS)]
+        words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+        name = f"{rng.choice(WORDS).title()} {pk}"
+        yield kind, pk, f"{name} {rng.choice(CITIES)} {rng.choice(CITIES)} {words}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--docs', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--max-postings', type=int, default=DEFAULT_INDEX['max_postings_per_term'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    index = CatalogIndex(compact_threshold=0, max_postings_per_term=args.max_postings)
+    started = time.perf_counter()
+    for kind, pk, text in synthetic_documents(args.docs, args.seed):
+        index.add(kind, pk, text)
+    index.compact()
+    build_seconds = time.perf_counter() - started
+
+    # Incremental updates after the build land in the delta segment.
+    index.compact_threshold = 50000
+    for kind, pk, text in synthetic_documents(1000, args.seed + 1):
+        index.add(kind, pk, text)
+
+    rng = random.Random(args.seed)
+    latencies = []
+    for _ in range(args.queries):
+        query = rng.choice(QUERIES)
+        started = time.perf_counter()
+        index.search(query, k=args.k)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    print(json.dumps({
+        'documents': len(index),
+        'build_seconds': round(build_seconds, 1),
+        'query_ms_p50': round(float(np.percentile(latencies, 50)), 3),
+        'query_ms_p99': round(float(np.percentile(latencies, 99)), 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Build time, memory, search latency and update cost of the in-memory flight
+schedule in core/routing.py on a synthetic hub-and-spoke schedule.
+
+    python -m benchmarks.routing --flights 1000000 --queries 200
+    python -m benchmarks.routing --from-db            # the configured database's flights
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone as dt_timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fanzone_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from chatbot.loadtest import percentile  # noqa: E402
+from core.datagen import CITIES, HOST_CITIES, ORIGIN_CITIES  # noqa: E402
+from core.routing import FlightSchedule, flight_rows  # noqa: E402
+
+HUBS = ['Paris', 'Madrid', 'Lisbon', 'Casablanca', 'Istanbul', 'Dubai']
+START = datetime(2030, 6, 1, tzinfo=dt_timezone.utc).timestamp()
+
+
+def synthetic_rows(count, days, seed=0):
+    """Flights over ``days`` days; most of them touch a hub, so long trips need connections"""
+    rng = random.Random(seed)
+    for pk in range(1, count + 1):
+        departure_city = rng.choice(CITIES)
+        if departure_city in HUBS or rng.random() < 0.3:
+            arrival_city = rng.choice(CITIES)
+        else:
+            arrival_city = rng.choice(HUBS)
+        if arrival_city == departure_city:
+            arrival_city = HUBS[(HUBS.index(departure_city) + 1) % len(HUBS)] if departure_city in HUBS else HUBS[0]
+        departs = START + rng.randrange(days * 24 * 12) * 300
+        yield (pk, departure_city, arrival_city, departs, departs + rng.randrange(45, 600) * 60,
+               rng.randrange(4000, 150000) / 100, rng.randint(0, 220))
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--flights', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--from-db', action='store_true', help='Load the flights of the configured database')
+    args = parser.parse_args()
+
+    rows = flight_rows() if args.from_db else synthetic_rows(args.flights, args.days, args.seed)
+    schedule, build_ms = timed(lambda: FlightSchedule.from_rows(rows))
+    rng = random.Random(args.seed)
+    departures = schedule._dep[:schedule._n]
+    low, high = int(departures.min()), int(departures.max())
+    origins = [city for city in ORIGIN_CITIES if city in schedule.city_ids]
+    destinations = [city for city in HOST_CITIES if city in schedule.city_ids]
+
+    report = {
+        'flights': len(schedule),
+        'build_ms': round(build_ms, 1),
+        'memory_mib': round(schedule.nbytes / 2 ** 20, 1),
+    }
+    for optimize in ('earliest', 'cheapest'):
+        latencies, found, legs = [], 0, []
+        for _ in range(args.queries):
+            origin, destination = rng.choice(origins), rng.choice(destinations)
+            itinerary, ms = timed(lambda: schedule.search(origin, destination, rng.randrange(low, high), optimize))
+            latencies.append(ms)
+            if itinerary:
+                found += 1
+                legs.append(len(itinerary['flight_ids']))
+        latencies.sort()
+        report[optimize] = {
+            'found': found,
+            'legs_avg': round(sum(legs) / len(legs), 2) if legs else None,
+            'latency_ms_p50': round(percentile(latencies, 50), 2),
+            'latency_ms_p95': round(percentile(latencies, 95), 2),
+            'latency_ms_max': round(max(latencies), 2),
+        }
+
+    # Reschedule existing flights by an hour, as a flight save would
+    ids = schedule._ids[:schedule._n]
+    updates = []
+    for _ in range(args.updates):
+        slot = rng.randrange(schedule._n)
+        updates.append((int(ids[slot]), schedule.city_names[schedule._dep_city[slot]], schedule.city_names[schedule._arr_city[slot]],
+                        int(schedule._dep[slot]) + 3600, int(schedule._arr[slot]) + 3600, schedule._price[slot] / 100, 10))
+    _, update_ms = timed(lambda: [schedule.upsert(row) for row in updates])
+    report['upsert_us_avg'] = round(update_ms * 1000 / max(args.updates, 1), 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
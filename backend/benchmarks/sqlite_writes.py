@@ -0,0 +1,144 @@
+"""
+Mixed read/write throughput on a file-backed SQLite database, first with
+Django's default SQLite setup and then with the production profile and the
+serialized write lane (core/sqlite.py).
+
+    python -m benchmarks.sqlite_writes --threads 16 --seconds 10 --write-ratio 0.2
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fanzone_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import OperationalError, connections  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from chatbot.models import Conversation  # noqa: E402
+from core.models import Booking, Flight  # noqa: E402
+from core.sqlite import reset_write_lanes, run_write  # noqa: E402
+
+MODES = {
+    'default': {'enabled': False},
+    'profile': {'enabled': True, 'write_lane': False},
+    'profile+lane': {'enabled': True, 'write_lane': True},
+}
+
+
+def prepare_database(path, flights=200):
+    connections.close_all()
+    settings.DATABASES['default']['NAME'] = path
+    call_command('migrate', verbosity=0)
+    user = get_user_model().objects.create(username='bench')
+    now = timezone.now()
+    Flight.objects.bulk_create([
+        Flight(
+            airline='FanAir',
+            flight_number=f"FA{i}",
+            departure_city='Paris',
+            arrival_city='Rabat',
+            departure_time=now,
+            arrival_time=now,
+            price=100 + i,
+            available_seats=100,
+        )
+        for i in range(flights)
+    ])
+    connections.close_all()
+    return user
+
+
+def book(user, flight_ids, i):
+    booking = Booking.objects.create(user=user, total_price=100)
+    booking.flight.add(flight_ids[i % len(flight_ids)])
+    Conversation.objects.create(user_message=f"booked {i}", bot_message='Booking received')
+
+
+def read():
+    flights = list(Flight.objects.filter(arrival_city='Rabat').order_by('price')[:50])
+    return len(flights), Booking.objects.count()
+
+
+def run_mode(mode, args, directory):
+    user = prepare_database(os.path.join(directory, f"{mode.replace('+', '_')}.sqlite3"))
+    flight_ids = list(Flight.objects.values_list('pk', flat=True))
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    latencies = {'reads': [], 'writes': []}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        try:
+            while time.perf_counter() < deadline:
+                kind = 'writes' if rng.random() < args.write_ratio else 'reads'
+                started = time.perf_counter()
+                try:
+                    if kind == 'writes':
+                        run_write(book, user, flight_ids, rng.randrange(1 << 30))
+                    else:
+                        read()
+                except OperationalError:
+                    with lock:
+                        counts['errors'] += 1
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    counts[kind] += 1
+                    latencies[kind].append(elapsed)
+        finally:
+            connections.close_all()
+
+    with override_settings(SQLITE_PROFILE=MODES[mode]):
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(args.seed + i,)) for i in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        reset_write_lanes()
+    connections.close_all()
+
+    def p99(values):
+        values = sorted(values)
+        return round(values[int(len(values) * 0.99)], 2) if values else None
+
+    return {
+        'mode': mode,
+        'reads_per_second': round(counts['reads'] / elapsed, 1),
+        'writes_per_second': round(counts['writes'] / elapsed, 1),
+        'locked_errors': counts['errors'],
+        'read_ms_p99': p99(latencies['reads']),
+        'write_ms_p99': p99(latencies['writes']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--mode', action='append', choices=sorted(MODES), help='Mode to run (repeatable, default: all)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = [run_mode(mode, args, directory) for mode in args.mode or MODES]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
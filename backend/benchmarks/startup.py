@@ -0,0 +1,101 @@
+"""
+Cold start time of ``django.setup()`` plus the URLconf import, with the
+import time of every module (``python -X importtime``) in a fresh interpreter.
+
+    python -m benchmarks.startup                 # slowest modules by cumulative time
+    python -m benchmarks.startup --top 40 --self # by time spent in the module itself
+    python -m benchmarks.startup --json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Upper bound for setup plus URLconf import checked by the test suite; the
+# measured time is about 0.8s, with the Gemini SDK loaded lazily.
+BUDGET_SECONDS = 3.0
+
+# Modules that must not be imported until they are used.
+LAZY_MODULES = ('google.generativeai', 'chatbot.services', 'dotenv', 'numpy', 'core.routing', 'chatbot.retrieval')
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_done = time.perf_counter()
+print(json.dumps({
+    'setup_seconds': setup_done - started,
+    'urlconf_seconds': urls_done - setup_done,
+    'total_seconds': urls_done - started,
+    'lazy_modules_loaded': [name for name in sys.argv[1:] if name in sys.modules],
+}))
+"""
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(importtime=False, settings_module=None):
+    """Timings from a fresh interpreter, plus per-module import times when ``importtime`` is set"""
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = settings_module or env.get('DJANGO_SETTINGS_MODULE', 'fanzone_backend.settings')
+    command = [sys.executable, '-W', 'ignore']
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', STARTUP_SCRIPT, *LAZY_MODULES]
+    result = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    if importtime:
+        report['modules'] = parse_importtime(result.stderr)
+    return report
+
+
+def parse_importtime(output):
+    """[{'module', 'self_ms', 'cumulative_ms', 'depth'}] from ``-X importtime`` output"""
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                'module': name,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                'depth': len(indent) // 2,
+            })
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--top', type=int, default=25, help='Number of modules to list')
+    parser.add_argument('--self', dest='by_self', action='store_true', help='Sort by self time instead of cumulative time')
+    parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+    args = parser.parse_args()
+
+    report = measure(importtime=True)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    key = 'self_ms' if args.by_self else 'cumulative_ms'
+    print(f"django.setup() {report['setup_seconds'] * 1000:8.1f}ms")
+    print(f"URLconf        {report['urlconf_seconds'] * 1000:8.1f}ms")
+    print(f"total          {report['total_seconds'] * 1000:8.1f}ms  (budget {BUDGET_SECONDS * 1000:.0f}ms)")
+    if report['lazy_modules_loaded']:
+        print(f"loaded eagerly: {', '.join(report['lazy_modules_loaded'])}")
+    print(f"\n{'self ms':>9} {'cumul ms':>9}  module")
+    for module in sorted(report['modules'], key=lambda m: m[key], reverse=True)[:args.top]:
+        print(f"{module['self_ms']:9.1f} {module['cumulative_ms']:9.1f}  {'  ' * module['depth']}{module['module']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+Benchmark suite for the API, booking and chatbot hot paths on generated data.
+
+Each scenario is timed over a number of requests through the Django test
+client and reports latency percentiles, queries per request and peak Python
+memory per request. Results are written as JSON and can be compared with a
+saved baseline; any metric that regresses past its threshold fails the run.
+
+    python -m benchmarks.suite --scale 0.1 --output results.json
+    python -m benchmarks.suite --save-baseline                       # writes benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold latency_ms_p95=0.5
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fanzone_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from chatbot.backends import reset_fakes  # noqa: E402
+from chatbot.loadtest import percentile  # noqa: E402
+from chatbot.resilience import reset_dependencies  # noqa: E402
+from core.datagen import generate  # noqa: E402
+from core.models import Booking, Flight, Hotel, MatchTicket, Package, User  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baseline.json'
+
+# Allowed relative increase over the baseline before a metric counts as a regression.
+DEFAULT_THRESHOLDS = {
+    'latency_ms_p50': 0.25,
+    'latency_ms_p95': 0.35,
+    'queries_avg': 0.0,
+    'peak_memory_kib': 0.25,
+}
+# Latency changes smaller than this are treated as noise whatever the ratio.
+LATENCY_NOISE_MS = 1.0
+
+FAKE_BACKENDS = {
+    'llm': {'BACKEND': 'chatbot.backends.FakeLLMBackend', 'OPTIONS': {}},
+    'hotels': {'BACKEND': 'chatbot.backends.FakeHotelAPI', 'OPTIONS': {}},
+}
+
+CHAT_MESSAGES = ["Show me hotels in Marrakech", "Are there any packages for Casablanca?",
+                 "Which activities do you recommend in Agadir?", "I need a flight to Rabat for the final"]
+
+
+class Bench:
+    """Shared clients and sample rows for the scenarios"""
+
+    def __init__(self):
+        self.user, _ = User.objects.get_or_create(username='benchmark')
+        self.api = Client(HTTP_HOST='localhost', headers={'Authorization': f"Bearer {AccessToken.for_user(self.user)}"})
+        self.browser = Client(HTTP_HOST='localhost')
+        self.browser.force_login(self.user)
+        # Sold-out items are rejected, so book ones with availability left.
+        self.flight = Flight.objects.filter(available_seats__gt=0).order_by('pk').first()
+        self.hotel = Hotel.objects.filter(available_rooms__gt=0).order_by('pk').first()
+        self.ticket = MatchTicket.objects.filter(available_tickets__gt=0).order_by('pk').first()
+        self.package = Package.objects.order_by('pk').first()
+
+    def booking_payload(self):
+        return {
+            'flight_ids': [self.flight.pk],
+            'hotel_ids': [self.hotel.pk],
+            'match_ticket_ids': [self.ticket.pk],
+            'total_price': str(self.flight.price + self.hotel.price_per_night + self.ticket.price),
+        }
+
+    def pending_booking(self, i):
+        booking = Booking.objects.create(user=self.user, total_price=self.flight.price)
+        booking.flight.add(self.flight)
+        return booking.pk
+
+
+def scenarios(bench):
+    """name -> (prepare(i) -> arg, untimed; request(arg) -> response)"""
+    api, browser = bench.api, bench.browser
+    none = lambda i: None  # noqa: E731
+    return {
+        'flight_list': (none, lambda _: api.get('/api/api/flights/')),
+        'flight_retrieve': (none, lambda _: api.get(f'/api/api/flights/{bench.flight.pk}/')),
+        'hotel_list': (none, lambda _: api.get('/api/api/hotels/')),
+        'match_ticket_list': (none, lambda _: api.get('/api/api/match-tickets/')),
+        'activity_list': (none, lambda _: api.get('/api/api/activities/')),
+        'package_list': (none, lambda _: api.get('/api/api/packages/')),
+        'booking_create': (none, lambda _: api.post('/api/api/bookings/', bench.booking_payload(), content_type='application/json')),
+        'booking_cancel': (bench.pending_booking, lambda pk: api.patch(
+            f'/api/api/bookings/{pk}/', {'status': 'cancelled'}, content_type='application/json')),
+        'trip_finder': (none, lambda _: api.get('/api/api/trip-finder/', {'ticket': bench.ticket.pk, 'travellers': 2})),
+        'package_book': (none, lambda _: api.post(f'/api/api/packages/{bench.package.pk}/book/')),
+        'page_flights': (none, lambda _: browser.get('/api/flights/')),
+        'page_hotels': (none, lambda _: browser.get('/api/hotels/')),
+        'page_match_tickets': (none, lambda _: browser.get('/api/match-tickets/')),
+        'page_activities': (none, lambda _: browser.get('/api/activities/')),
+        'chatbot_message': (lambda i: CHAT_MESSAGES[i % len(CHAT_MESSAGES)], lambda message: browser.post(
+            '/chatbot/message/', json.dumps({'message': message}), content_type='application/json')),
+        'core_chat_message': (lambda i: CHAT_MESSAGES[i % len(CHAT_MESSAGES)], lambda message: api.post(
+            '/api/api/chat/message/', {'message': message}, content_type='application/json')),
+    }
+
+
+def measure(prepare, request, iterations, warmup, memory_iterations):
+    for i in range(warmup):
+        request(prepare(i))
+
+    latencies, queries, errors = [], [], 0
+    for i in range(iterations):
+        arg = prepare(warmup + i)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = request(arg)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        errors += response.status_code >= 400
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for i in range(memory_iterations):
+            arg = prepare(warmup + iterations + i)
+            tracemalloc.reset_peak()
+            request(arg)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'requests': iterations,
+        'errors': errors,
+        'latency_ms_p50': round(percentile(latencies, 50), 3),
+        'latency_ms_p95': round(percentile(latencies, 95), 3),
+        'latency_ms_p99': round(percentile(latencies, 99), 3),
+        'queries_avg': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, thresholds):
+    """Regressions as (scenario, metric, baseline value, current value, allowed ratio)"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        for metric, allowed in thresholds.items():
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None or new <= old * (1 + allowed):
+                continue
+            if metric.startswith('latency') and new - old < LATENCY_NOISE_MS:
+                continue
+            regressions.append((name, metric, old, new, allowed))
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_thresholds(values):
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for value in values or []:
+        metric, _, ratio = value.partition('=')
+        if metric not in DEFAULT_THRESHOLDS or not ratio:
+            raise SystemExit(f"Invalid --threshold {value!r}; use one of {', '.join(DEFAULT_THRESHOLDS)}=RATIO")
+        thresholds[metric] = float(ratio)
+    return thresholds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=0.1, help='generate_fixtures scale for the throwaway database')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--use-configured-db', action='store_true', help='Benchmark the configured database as is')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--memory-iterations', type=int, default=3)
+    parser.add_argument('--scenario', action='append', help='Scenario to run (repeatable, default: all)')
+    parser.add_argument('--output', help='Write results JSON here')
+    parser.add_argument('--baseline', help='Compare against this results JSON')
+    parser.add_argument('--save-baseline', action='store_true', help=f"Also write results to {BASELINE_PATH}")
+    parser.add_argument('--threshold', action='append', help='METRIC=RATIO, e.g. latency_ms_p95=0.5 (repeatable)')
+    args = parser.parse_args()
+    thresholds = parse_thresholds(args.threshold)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.use_configured_db:
+            settings.DATABASES['default']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            connections.close_all()
+            call_command('migrate', verbosity=0)
+            generate(scale=args.scale, seed=args.seed)
+
+        reset_fakes()
+        reset_dependencies()
+        results = {
+            'meta': {
+                'created_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+                'git_revision': git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'scale': None if args.use_configured_db else args.scale,
+                'seed': args.seed,
+                'iterations': args.iterations,
+            },
+            'scenarios': {},
+        }
+        # Request logging would dominate the timings of the fast scenarios.
+        logging.disable(logging.CRITICAL)
+        with override_settings(CHATBOT_BACKENDS=FAKE_BACKENDS, DEBUG=False):
+            bench = Bench()
+            for name, (prepare, request) in scenarios(bench).items():
+                if args.scenario and name not in args.scenario:
+                    continue
+                results['scenarios'][name] = measure(prepare, request, args.iterations, args.warmup, args.memory_iterations)
+                print(f"{name:22} p50 {results['scenarios'][name]['latency_ms_p50']:9.2f}ms  "
+                      f"queries {results['scenarios'][name]['queries_avg']:7.1f}  "
+                      f"peak {results['scenarios'][name]['peak_memory_kib']:9.1f}KiB", file=sys.stderr)
+        connections.close_all()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n')
+    if args.save_baseline:
+        BASELINE_PATH.write_text(output + '\n')
+    if not args.output and not args.save_baseline:
+        print(output)
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), thresholds)
+        for name, metric, old, new, allowed in regressions:
+            print(f"REGRESSION {name} {metric}: {old} -> {new} (allowed +{allowed:.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Hotel, Flight, Activity, Match, Package, Conversation
+from .models import Hotel, Flight, Activity, Match, Package, Conversation, HotelRefresh
 
 @admin.register(Hotel)
 class HotelAdmin(admin.ModelAdmin):
@@ -36,4 +36,9 @@ class PackageAdmin(admin.ModelAdmin):
 class ConversationAdmin(admin.ModelAdmin):
     list_display = ('created_at', 'user_message', 'bot_message')
     list_filter = ('created_at',)
-    search_fields = ('user_message', 'bot_message') 
\ No newline at end of file
+    search_fields = ('user_message', 'bot_message')
+
+@admin.register(HotelRefresh)
+class HotelRefreshAdmin(admin.ModelAdmin):
+    list_display = ('city', 'refreshed_at', 'requested_at', 'duration_ms', 'hotel_count', 'last_error')
+    search_fields = ('city',)
@@ -0,0 +1,25 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
+
+# The models of CATALOG_FIELDS in chatbot/retrieval.py, listed here so that
+# connecting the receivers does not import the index (and NumPy)
+CATALOG_MODELS = ('core.Flight', 'core.Hotel', 'core.MatchTicket', 'core.Activity', 'core.Package')
+
+
+class ChatbotConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'chatbot'
+
+    def ready(self):
+        from core.background import BUILD_MODULES
+        from core.lazy import LazyReceiver
+
+        BUILD_MODULES.append('chatbot.retrieval')
+        # Only a loaded index needs updating (core/lazy.py)
+        update_index = LazyReceiver('chatbot.retrieval.update_index', if_loaded=True)
+        remove_from_index = LazyReceiver('chatbot.retrieval.remove_from_index', if_loaded=True)
+        for model_label in CATALOG_MODELS:
+            model = self.apps.get_model(model_label)
+            post_save.connect(update_index, sender=model, weak=False, dispatch_uid=f'catalog_index_save_{model_label}')
+            post_delete.connect(remove_from_index, sender=model, weak=False,
+                                dispatch_uid=f'catalog_index_delete_{model_label}')
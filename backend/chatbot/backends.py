@@ -0,0 +1,196 @@
+"""
+Pluggable backends for the chatbot's language model and hotel inventory API.
+
+Backends are configured in ``settings.CHATBOT_BACKENDS`` the same way Django
+configures caches: a dotted ``BACKEND`` path plus ``OPTIONS``. The fake
+backends are deterministic, need no network or API key, and can simulate
+latency and error rates for tests and load testing.
+"""
+import logging
+import os
+import random
+import re
+import textwrap
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .resilience import DependencyError, get_dependency
+
+logger = logging.getLogger(__name__)
+
+_env_loaded = False
+
+LOCATION_PROMPT = "Extract the location from this message, return only the location name:"
+
+DEFAULT_BACKENDS = {
+    'llm': {'BACKEND': 'chatbot.backends.GeminiBackend', 'OPTIONS': {}},
+    'hotels': {'BACKEND': 'chatbot.hotel_api.HotelAPIClient', 'OPTIONS': {}},
+}
+
+
+def backend_settings(name):
+    config = dict(DEFAULT_BACKENDS[name])
+    config.update(getattr(settings, 'CHATBOT_BACKENDS', {}).get(name, {}))
+    return config
+
+
+def load_env():
+    """Read API keys from .env once, when the first backend is built rather than at import"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def get_llm_backend(system_instruction=''):
+    load_env()
+    config = backend_settings('llm')
+    return import_string(config['BACKEND'])(system_instruction=system_instruction, **config.get('OPTIONS', {}))
+
+
+def get_hotel_api(timeout=None):
+    load_env()
+    config = backend_settings('hotels')
+    options = dict(config.get('OPTIONS', {}))
+    if timeout is not None:
+        options.setdefault('timeout', timeout)
+    return import_string(config['BACKEND'])(**options)
+
+
+class GeminiBackend:
+    """Google Gemini through google.generativeai"""
+    preferred_model = 'models/gemini-1.5-flash'
+    _model_name = None
+    _configure_lock = threading.Lock()
+
+    def __init__(self, system_instruction='', model=None, api_key=None, temperature=0.7, top_p=0.8, top_k=40, max_output_tokens=2048):
+        # Importing the SDK takes most of a second, so only processes that talk to Gemini pay for it.
+        import google.generativeai as genai
+
+        with self._configure_lock:
+            genai.configure(api_key=api_key or os.getenv('GEMINI_API_KEY'))
+        self.model_name = model or self.choose_model()
+        self.model = genai.GenerativeModel(self.model_name, system_instruction=system_instruction or None)
+        # Set generation configuration
+        self.generation_config = genai.types.GenerationConfig(
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k,
+            max_output_tokens=max_output_tokens,
+        )
+
+    @classmethod
+    def choose_model(cls):
+        """Pick a model supporting content generation, listing models once per process"""
+        if cls._model_name is None:
+            import google.generativeai as genai
+
+            try:
+                # List available models that support content generation
+                models = [
+                    m for m in get_dependency('gemini').call(lambda: list(genai.list_models()), key='list_models')
+                    if 'generateContent' in m.supported_generation_methods
+                ]
+                logger.info(f"Available models: {[m.name for m in models]}")
+                names = [m.name for m in models]
+                cls._model_name = cls.preferred_model if cls.preferred_model in names or not names else names[0]
+            except DependencyError as e:
+                logger.warning(f"Could not list Gemini models, using {cls.preferred_model}: {str(e)}")
+                return cls.preferred_model
+        return cls._model_name
+
+    def generate(self, contents, timeout=None):
+        request_options = {'timeout': timeout} if timeout else None
+        return self.model.generate_content(
+            contents,
+            generation_config=self.generation_config,
+            request_options=request_options,
+        ).text
+
+
+_fake_randoms = {}
+_fake_randoms_lock = threading.Lock()
+
+
+def fake_random(name, seed):
+    """Process-wide seeded generator, so fakes built per request still follow one sequence"""
+    with _fake_randoms_lock:
+        if (name, seed) not in _fake_randoms:
+            _fake_randoms[(name, seed)] = random.Random(seed)
+        return _fake_randoms[(name, seed)]
+
+
+def reset_fakes():
+    """Restart every fake backend's random sequence (used by tests)"""
+    with _fake_randoms_lock:
+        _fake_randoms.clear()
+
+
+class FakeBackendMixin:
+    """Seeded latency and failure injection shared by the fake backends"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0, timeout=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout = timeout
+        self._random = fake_random(type(self).__name__, seed)
+        self.calls = 0
+
+    def simulate(self):
+        self.calls += 1
+        with _fake_randoms_lock:
+            delay = self.latency + self._random.uniform(0, self.jitter) if self.jitter else self.latency
+            fail = self.error_rate and self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ConnectionError(f"{type(self).__name__}: simulated upstream error")
+
+
+class FakeLLMBackend(FakeBackendMixin):
+    """Deterministic stand-in for Gemini"""
+    cities = ('Casablanca', 'Rabat', 'Marrakech', 'Tangier', 'Agadir', 'Fez', 'Meknes', 'Oujda', 'Paris', 'Madrid')
+
+    def __init__(self, system_instruction='', **options):
+        super().__init__(**options)
+        self.system_instruction = system_instruction
+
+    def generate(self, contents, timeout=None):
+        self.simulate()
+        prompt = contents[-1]['parts'][-1]
+        if prompt.startswith(LOCATION_PROMPT):
+            return self.extract_location(prompt[len(LOCATION_PROMPT):])
+        return f"Happy to help with that! You asked: {textwrap.shorten(prompt, 120, placeholder='...')}"
+
+    def extract_location(self, message):
+        for city in self.cities:
+            if city.lower() in message.lower():
+                return city
+        words = re.findall(r'\b[A-Z][a-z]+\b', message)
+        return words[-1] if words else ''
+
+
+class FakeHotelAPI(FakeBackendMixin):
+    """Deterministic stand-in for the RapidAPI hotels endpoints"""
+    configured = True
+
+    def search(self, location):
+        self.simulate()
+        seed = zlib.crc32(location.lower().encode())
+        return [
+            {
+                "name": f"{location} {suffix}",
+                "location": location,
+                "rating": 3 + (seed + i) % 3,
+                "price_per_night": float(60 + (seed >> i) % 240),
+                "description": f"{suffix} in central {location}",
+                "image_url": "",
+            }
+            for i, suffix in enumerate(('Grand Hotel', 'Riad', 'Suites'))
+        ]
@@ -0,0 +1,161 @@
+"""
+Token-budgeted conversation context for the chatbot.
+
+``ChatContext`` keeps the last few turns verbatim and folds older turns into
+an extractive summary so that every prompt sent to the model stays within a
+fixed token budget, however long the conversation gets. The summary has two
+parts: the cities, dates and budgets mentioned in folded turns, which are kept
+longest, and one line per folded turn made of the sentences that mention them.
+Internal helper prompts (e.g. location extraction) are sent without history
+and never recorded here.
+"""
+import re
+import textwrap
+
+from django.conf import settings
+
+DEFAULT_CONTEXT = {
+    'max_tokens': 4000,
+    'keep_turns': 6,
+    'summary_tokens': 600,
+}
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+MONTHS = (r'(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?'
+          r'|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)')
+ENTITY_PATTERNS = {
+    'cities': re.compile(rf"\b(?:in|to|from|near|around|visit(?:ing)?)\s+(?!{MONTHS}\b)([A-Z][\w'-]+(?:\s[A-Z][\w'-]+)?)"),
+    'dates': re.compile(
+        r"\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}(?:/\d{2,4})?"
+        rf"|\d{{1,2}}(?:st|nd|rd|th)?\s+{MONTHS}|{MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?)\b"),
+    'budgets': re.compile(
+        r"[$\u20ac\u00a3]\s?\d[\d,]*(?:\.\d+)?"
+        r"|\b\d[\d,]*(?:\.\d+)?\s?(?:USD|EUR|GBP|MAD|dirhams?|euros?|dollars?)\b", re.IGNORECASE),
+}
+# Entities of each kind kept in the summary, most recent last
+MAX_ENTITIES = 8
+
+
+def extract_entities(text):
+    """The cities, dates and budgets mentioned in ``text``, by kind"""
+    return {kind: [m.group(m.lastindex or 0).strip() for m in pattern.finditer(text)]
+            for kind, pattern in ENTITY_PATTERNS.items()}
+
+
+def key_sentences(text, width):
+    """The sentences of ``text`` that mention an entity (or the first one), shortened to ``width``"""
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    kept = [s for s in sentences if any(extract_entities(s).values())] or sentences[:1]
+    return textwrap.shorten(' '.join(kept), width, placeholder='...')
+
+
+def context_settings():
+    config = dict(DEFAULT_CONTEXT)
+    config.update(getattr(settings, 'CHATBOT_CONTEXT', {}))
+    return config
+
+
+class ChatContext:
+    summary_ack = "Understood, I'll keep that in mind."
+
+    def __init__(self, system_prompt='', max_tokens=4000, keep_turns=6, summary_tokens=600, count_tokens=estimate_tokens):
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.summary_tokens = summary_tokens
+        self.count_tokens = count_tokens
+        self.turns = []
+        self.summary_lines = []
+        self.entities = {kind: [] for kind in ENTITY_PATTERNS}
+
+    @classmethod
+    def from_settings(cls, system_prompt=''):
+        return cls(system_prompt, **context_settings())
+
+    def dump(self):
+        """The turns and summary as JSON-serializable data, e.g. for the session"""
+        return {'turns': [list(turn) for turn in self.turns], 'summary_lines': list(self.summary_lines),
+                'entities': {kind: list(values) for kind, values in self.entities.items()}}
+
+    def load(self, data):
+        """Restore what ``dump()`` returned"""
+        self.turns = [tuple(turn) for turn in data.get('turns', ())]
+        self.summary_lines = list(data.get('summary_lines', ()))
+        self.entities = {kind: list(data.get('entities', {}).get(kind, ())) for kind in ENTITY_PATTERNS}
+        while len(self.turns) > self.keep_turns:
+            self._compress(self.turns.pop(0))
+
+    @property
+    def summary(self):
+        facts = '; '.join(f"{kind}: {', '.join(values)}" for kind, values in self.entities.items() if values)
+        return '\n'.join(([f"Mentioned so far - {facts}"] if facts else []) + self.summary_lines)
+
+    def add_turn(self, user_message, model_message):
+        """Record a user-visible exchange, compressing the oldest turns past ``keep_turns``"""
+        self.turns.append((user_message, model_message))
+        while len(self.turns) > self.keep_turns:
+            self._compress(self.turns.pop(0))
+
+    def _compress(self, turn):
+        user_message, model_message = turn
+        for kind, values in extract_entities(f"{user_message}\n{model_message}").items():
+            known = self.entities[kind]
+            for value in values:
+                if value in known:
+                    known.remove(value)
+                known.append(value)
+            del known[:-MAX_ENTITIES]
+        self.summary_lines.append(
+            f"- User: {key_sentences(user_message, 120)} | Assistant: {key_sentences(model_message, 160)}"
+        )
+        self._trim_summary(self.summary_tokens)
+
+    def _trim_summary(self, budget):
+        """Drop the oldest turn lines first, then the oldest entities"""
+        while self.summary_lines and self.count_tokens(self.summary) > budget:
+            self.summary_lines.pop(0)
+        while self.summary and self.count_tokens(self.summary) > budget:
+            max(self.entities.values(), key=len).pop(0)
+
+    def _summary_contents(self):
+        if not self.summary:
+            return []
+        return [
+            {'role': 'user', 'parts': [f"Summary of our earlier conversation:\n{self.summary}"]},
+            {'role': 'model', 'parts': [self.summary_ack]},
+        ]
+
+    def _turn_contents(self):
+        contents = []
+        for user_message, model_message in self.turns:
+            contents.append({'role': 'user', 'parts': [user_message]})
+            contents.append({'role': 'model', 'parts': [model_message]})
+        return contents
+
+    def build(self, user_message):
+        """
+        Return the contents to send for ``user_message`` (the system prompt is
+        sent separately as the model's system instruction).
+
+        Verbatim turns are folded into the summary, oldest first, until the
+        whole prompt fits the budget; the summary is trimmed last.
+        """
+        budget = self.max_tokens - self.count_tokens(self.system_prompt) - self.count_tokens(user_message)
+        while self.turns and self._history_tokens() > budget:
+            self._compress(self.turns.pop(0))
+        if self._history_tokens() > budget:
+            self._trim_summary(max(0, budget - self.count_tokens(self.summary_ack) - 10))
+        return self._summary_contents() + self._turn_contents() + [{'role': 'user', 'parts': [user_message]}]
+
+    def _history_tokens(self):
+        return prompt_tokens(self._summary_contents() + self._turn_contents(), self.count_tokens)
+
+
+def prompt_tokens(contents, count_tokens=estimate_tokens):
+    """Token count of a list of contents as built by ChatContext.build()"""
+    return sum(count_tokens(part) for content in contents for part in content['parts'])
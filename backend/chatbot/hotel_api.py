@@ -0,0 +1,91 @@
+import logging
+import os
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class HotelAPIClient:
+    """Client for the RapidAPI hotels4 endpoints used by the chatbot and the prewarm scheduler"""
+    search_url = "https://hotels4.p.rapidapi.com/locations/v3/search"
+    list_url = "https://hotels4.p.rapidapi.com/properties/v2/list"
+
+    def __init__(self, api_key=None, timeout=8.0):
+        self.api_key = api_key or os.getenv('HOTELS_API_KEY')
+        self.timeout = timeout
+
+    @property
+    def configured(self):
+        return bool(self.api_key)
+
+    def search(self, location):
+        """Return up to three hotels for a location, cheapest first"""
+        # Prepare the API request
+        headers = {
+            "X-RapidAPI-Key": self.api_key,
+            "X-RapidAPI-Host": "hotels4.p.rapidapi.com"
+        }
+
+        # First, search for the destination ID
+        search_params = {
+            "q": location,
+            "locale": "en_US",
+            "langid": "1033",
+            "siteid": "300000001"
+        }
+
+        search_response = requests.get(self.search_url, headers=headers, params=search_params, timeout=self.timeout)
+        search_data = search_response.json()
+
+        if not search_data.get('sr'):
+            logger.error(f"No destination found for location: {location}")
+            return []
+
+        # Get the first destination ID
+        destination_id = search_data['sr'][0]['gaiaId']
+
+        # Now search for hotels in that destination
+        payload = {
+            "currency": "USD",
+            "eapid": 1,
+            "locale": "en_US",
+            "siteId": 300000001,
+            "destination": {"id": destination_id},
+            "checkInDate": {
+                "day": 10,
+                "month": 10,
+                "year": 2024
+            },
+            "checkOutDate": {
+                "day": 15,
+                "month": 10,
+                "year": 2024
+            },
+            "rooms": [{"adults": 2}],
+            "resultsStartingIndex": 0,
+            "resultsSize": 3,
+            "sort": "PRICE_LOW_TO_HIGH"
+        }
+
+        response = requests.post(self.list_url, headers=headers, json=payload, timeout=self.timeout)
+        data = response.json()
+
+        if not data.get('data', {}).get('propertySearch', {}).get('properties'):
+            logger.error(f"No hotels found for location: {location}")
+            return []
+
+        # Transform the API response into our hotel format
+        hotels = []
+        for property in data['data']['propertySearch']['properties']:
+            hotel = {
+                "name": property['name'],
+                "location": location,
+                "rating": float(property.get('reviews', {}).get('score', 0)) / 2,  # Convert to 5-star scale
+                "price_per_night": float(property.get('price', {}).get('lead', {}).get('amount', 0)),
+                "description": property.get('summary', {}).get('location', ''),
+                "image_url": property.get('propertyGallery', {}).get('images', [{}])[0].get('image', {}).get('url', '')
+            }
+            hotels.append(hotel)
+
+        return hotels
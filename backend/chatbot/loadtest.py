@@ -0,0 +1,109 @@
+"""
+Load-test harness for the two chatbot endpoints.
+
+Drives ``/chatbot/message/`` (ChatbotService) and the core ``chat_message``
+API view at a given concurrency, either in-process through the Django test
+client or against a running server, and reports latency percentiles,
+throughput and database queries per request.
+"""
+import json
+import threading
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+ENDPOINTS = {
+    'chatbot': 'chatbot:message',
+    'core': 'chat_message',
+}
+
+DEFAULT_MESSAGES = [
+    "Hello! What can you help me with?",
+    "Show me hotels in Marrakech",
+    "Are there any packages for Casablanca?",
+    "Can you show me more options?",
+    "What is the best time to visit Tangier during the tournament?",
+    "I need a flight to Rabat for the final",
+    "Which activities do you recommend in Agadir?",
+    "Where is the match on Saturday?",
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_load(endpoint, total_requests=100, concurrency=4, messages=None, user=None, base_url=None):
+    """Send ``total_requests`` chat messages to ``endpoint`` and summarize the results"""
+    messages = messages or DEFAULT_MESSAGES
+    path = reverse(ENDPOINTS[endpoint])
+    headers = {}
+    if user is not None:
+        headers['Authorization'] = f"Bearer {AccessToken.for_user(user)}"
+
+    results = []
+    results_lock = threading.Lock()
+    next_request = iter(range(total_requests))
+
+    def send(i, client):
+        body = json.dumps({'message': messages[i % len(messages)]})
+        started = time.perf_counter()
+        if base_url:
+            response = client.post(base_url.rstrip('/') + path, data=body, headers={'Content-Type': 'application/json', **headers})
+            return (time.perf_counter() - started) * 1000, response.status_code, None
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(path, data=body, content_type='application/json', headers=headers)
+        return (time.perf_counter() - started) * 1000, response.status_code, len(queries)
+
+    def worker(close_connection):
+        if base_url:
+            import requests
+            client = requests.Session()
+        else:
+            client = Client(HTTP_HOST='localhost')
+        try:
+            while True:
+                with results_lock:
+                    i = next(next_request, None)
+                if i is None:
+                    return
+                result = send(i, client)
+                with results_lock:
+                    results.append(result)
+        finally:
+            if close_connection and not base_url:
+                connection.close()
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        worker(close_connection=False)
+    else:
+        threads = [threading.Thread(target=worker, args=(True,)) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(r[0] for r in results)
+    query_counts = [r[2] for r in results if r[2] is not None]
+    return {
+        'endpoint': path,
+        'requests': len(results),
+        'concurrency': concurrency,
+        'errors': sum(1 for r in results if r[1] >= 400),
+        'throughput_rps': round(len(results) / elapsed, 2) if elapsed else None,
+        'latency_ms_p50': round(percentile(latencies, 50), 2) if latencies else None,
+        'latency_ms_p95': round(percentile(latencies, 95), 2) if latencies else None,
+        'latency_ms_p99': round(percentile(latencies, 99), 2) if latencies else None,
+        'queries_per_request_avg': round(sum(query_counts) / len(query_counts), 2) if query_counts else None,
+        'queries_per_request_max': max(query_counts) if query_counts else None,
+    }
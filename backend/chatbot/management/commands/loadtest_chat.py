@@ -0,0 +1,58 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from chatbot.backends import reset_fakes
+from chatbot.loadtest import ENDPOINTS, run_load
+from chatbot.resilience import reset_dependencies
+
+
+class Command(BaseCommand):
+    help = 'Load-test the chatbot endpoints and report latency percentiles, throughput and DB queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS), help='Endpoint to test (repeatable, default: all)')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--base-url', help='Test a running server instead of the in-process client (no query counts)')
+        parser.add_argument('--username', default='loadtest', help='User the core chat endpoint authenticates as')
+        parser.add_argument('--fake', action='store_true', help='Use the deterministic local LLM and hotel API backends')
+        parser.add_argument('--llm-latency', type=float, default=0.0)
+        parser.add_argument('--llm-error-rate', type=float, default=0.0)
+        parser.add_argument('--hotel-latency', type=float, default=0.0)
+        parser.add_argument('--hotel-error-rate', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        user, _ = get_user_model().objects.get_or_create(username=options['username'])
+
+        overrides = {}
+        if options['fake']:
+            overrides['CHATBOT_BACKENDS'] = {
+                'llm': {'BACKEND': 'chatbot.backends.FakeLLMBackend', 'OPTIONS': {
+                    'latency': options['llm_latency'],
+                    'error_rate': options['llm_error_rate'],
+                    'seed': options['seed'],
+                }},
+                'hotels': {'BACKEND': 'chatbot.backends.FakeHotelAPI', 'OPTIONS': {
+                    'latency': options['hotel_latency'],
+                    'error_rate': options['hotel_error_rate'],
+                    'seed': options['seed'],
+                }},
+            }
+            reset_fakes()
+        reset_dependencies()
+
+        reports = []
+        with override_settings(**overrides):
+            for endpoint in options['endpoint'] or sorted(ENDPOINTS):
+                reports.append(run_load(
+                    endpoint,
+                    total_requests=options['requests'],
+                    concurrency=options['concurrency'],
+                    user=user,
+                    base_url=options['base_url'],
+                ))
+        self.stdout.write(json.dumps(reports, indent=2))
@@ -0,0 +1,39 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from chatbot.prewarm import RateLimiter, due_cities, prewarm_settings, refresh_cities, refresh_metrics
+
+
+class Command(BaseCommand):
+    help = 'Prefetch and refresh external hotel data for upcoming match host cities'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single refresh pass and exit')
+        parser.add_argument('--interval', type=int, help='Seconds between refresh passes')
+        parser.add_argument('--batch-size', type=int, help='Cities fetched per batch')
+        parser.add_argument('--rate', type=float, help='Maximum RapidAPI requests per second')
+        parser.add_argument('--status', action='store_true', help='Print refresh metrics as JSON and exit')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.stdout.write(json.dumps(refresh_metrics(), indent=2))
+            return
+
+        config = prewarm_settings()
+        interval = options['interval'] or config['interval']
+        limiter = RateLimiter(options['rate'] or config['rate'])
+
+        while True:
+            started = time.perf_counter()
+            cities = due_cities()
+            summary = refresh_cities(cities, limiter=limiter, batch_size=options['batch_size'])
+            self.stdout.write(
+                f"Refreshed {summary['cities']} of {len(cities)} due cities "
+                f"({summary['created']} hotels created, {summary['updated']} updated, "
+                f"{summary['errors']} errors) in {time.perf_counter() - started:.1f}s"
+            )
+            if options['once']:
+                return
+            time.sleep(interval)
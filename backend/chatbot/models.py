@@ -46,6 +46,11 @@ class Match(models.Model):
     ticket_price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date'], name='match_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.home_team} vs {self.away_team}"
 
@@ -79,5 +84,22 @@ class Conversation(models.Model):
     bot_message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='conversation_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Conversation at {self.created_at}"
+
+class HotelRefresh(models.Model):
+    """Prefetch state of external hotel inventory for one city"""
+    city = models.CharField(max_length=200, unique=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    requested_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.FloatField(default=0)
+    hotel_count = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
     def __str__(self):
-        return f"Conversation at {self.created_at}" 
\ No newline at end of file
+        return f"Hotel refresh for {self.city}"
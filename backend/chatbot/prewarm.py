@@ -0,0 +1,284 @@
+"""
+Prefetching of external hotel inventory for match host cities.
+
+The ``prewarm_hotels`` management command runs ``refresh_due_cities`` on a
+schedule so that chat requests can answer hotel questions from local data
+instead of calling RapidAPI inline. Settings live in ``settings.HOTEL_PREWARM``.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.compression import bump_catalog_version
+from core.models import Activity, Hotel as CoreHotel, MatchTicket
+from core.sqlite import run_write
+from core.trip_finder import host_city
+from .backends import get_hotel_api
+from .models import Hotel, Match, HotelRefresh
+from .resilience import get_dependency
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'batch_size': 5,
+    'rate': 0.5,
+    'max_age_hours': 12,
+    'horizon_days': 90,
+    'interval': 3600,
+    'live_search': False,
+}
+
+DEFAULT_IMAGE_URL = "https://images.unsplash.com/photo-1582719478250-c89cae4dc85b?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=2070&q=80"
+
+
+def prewarm_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'HOTEL_PREWARM', {}))
+    return config
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` calls per second with bursts of up to ``burst`` calls"""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until ``tokens`` calls are allowed and return the time waited"""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (tokens - self._tokens) / self.rate)
+            self._tokens -= tokens
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+def upcoming_host_cities(now=None, horizon_days=None):
+    """Cities hosting a match between now and the prefetch horizon"""
+    now = now or timezone.now()
+    horizon_days = prewarm_settings()['horizon_days'] if horizon_days is None else horizon_days
+    until = now + timedelta(days=horizon_days)
+
+    known = set(CoreHotel.objects.values_list('city', flat=True).distinct())
+    venues = set(MatchTicket.objects.filter(match_date__range=(now, until)).values_list('stadium', flat=True).distinct())
+    venues.update(Match.objects.filter(date__range=(now, until)).values_list('venue', flat=True).distinct())
+    return sorted({host_city(venue, known) for venue in venues if venue})
+
+
+def known_city(city):
+    """``city`` as spelled by a catalog hotel or activity or an upcoming match, or None when it is none of these"""
+    city = city.strip()
+    if not city:
+        return None
+    for model in (CoreHotel, Activity):
+        match = model.objects.filter(city__iexact=city).values_list('city', flat=True).first()
+        if match:
+            return match
+    for host in upcoming_host_cities():
+        if host.lower() == city.lower():
+            return host
+    return None
+
+
+def request_refresh(city):
+    """Ask the scheduler to fetch a city on its next run (used on chat cache misses)"""
+    # The city comes from the language model; only cities we know of are worth a RapidAPI call
+    city = known_city(city)
+    if city is None:
+        return False
+    run_write(_request_refresh, city)
+    return True
+
+
+def _request_refresh(city):
+    updated = HotelRefresh.objects.filter(city__iexact=city).update(requested_at=timezone.now())
+    if not updated:
+        HotelRefresh.objects.get_or_create(city=city, defaults={'requested_at': timezone.now()})
+
+
+def due_cities(now=None):
+    """Host cities and requested cities whose hotel data is missing or stale"""
+    now = now or timezone.now()
+    config = prewarm_settings()
+    cities = upcoming_host_cities(now, config['horizon_days'])
+    run_write(
+        HotelRefresh.objects.bulk_create,
+        [HotelRefresh(city=city) for city in cities],
+        ignore_conflicts=True,
+    )
+    stale_before = now - timedelta(hours=config['max_age_hours'])
+    due = HotelRefresh.objects.filter(
+        Q(city__in=cities) | Q(requested_at__isnull=False)
+    ).filter(
+        Q(refreshed_at__isnull=True) |
+        Q(refreshed_at__lt=stale_before) |
+        Q(requested_at__gt=F('refreshed_at'))
+    ).order_by(F('refreshed_at').asc(nulls_first=True), 'city')
+    return list(due.values_list('city', flat=True))
+
+
+def upsert_hotels(hotels):
+    """Create new hotels and update changed ones in both hotel tables; returns (created, updated)"""
+    by_name = {}
+    for data in hotels:
+        by_name[data['name']] = data
+    if not by_name:
+        return 0, 0
+
+    now = timezone.now()
+    with transaction.atomic():
+        chatbot_existing = {h.name: h for h in Hotel.objects.filter(name__in=by_name)}
+        core_existing = {h.name: h for h in CoreHotel.objects.filter(name__in=by_name)}
+        new_chatbot, changed_chatbot, new_core, changed_core = [], [], [], []
+
+        for name, data in by_name.items():
+            rating = min(5, max(1, round(float(data['rating']))))
+            price = Decimal(str(data['price_per_night'])).quantize(Decimal('0.01'))
+            description = data.get('description', '')
+
+            hotel = chatbot_existing.get(name)
+            if hotel is None:
+                new_chatbot.append(Hotel(
+                    name=name,
+                    location=data['location'],
+                    rating=rating,
+                    price_per_night=price,
+                    description=description,
+                    is_ai_suggested=True,
+                ))
+            elif (hotel.rating, hotel.price_per_night, hotel.description) != (rating, price, description):
+                hotel.rating, hotel.price_per_night, hotel.description = rating, price, description
+                changed_chatbot.append(hotel)
+
+            hotel = core_existing.get(name)
+            if hotel is None:
+                new_core.append(CoreHotel(
+                    name=name,
+                    city=data['location'],
+                    address=description,
+                    description=description,
+                    price_per_night=price,
+                    available_rooms=10,
+                    rating=rating,
+                    image_url=data.get('image_url') or DEFAULT_IMAGE_URL,
+                ))
+            elif (hotel.rating, hotel.price_per_night) != (rating, price):
+                hotel.rating, hotel.price_per_night, hotel.updated_at = rating, price, now
+                changed_core.append(hotel)
+
+        Hotel.objects.bulk_create(new_chatbot)
+        Hotel.objects.bulk_update(changed_chatbot, ['rating', 'price_per_night', 'description'])
+        CoreHotel.objects.bulk_create(new_core)
+        CoreHotel.objects.bulk_update(changed_core, ['rating', 'price_per_night', 'updated_at'])
+
+    if new_core or changed_core:
+        # Bulk writes skip the catalog signals
+        bump_catalog_version()
+    return len(new_core), len(changed_core)
+
+
+def store_batch(hotels, timings, errors):
+    """Write one batch of fetched hotels and its per-city refresh records"""
+    created, updated = upsert_hotels(hotels)
+    refreshed_at = timezone.now()
+    for city, (duration_ms, count) in timings.items():
+        HotelRefresh.objects.update_or_create(city=city, defaults={
+            'refreshed_at': refreshed_at,
+            'requested_at': None,
+            'duration_ms': duration_ms,
+            'hotel_count': count,
+            'last_error': '',
+        })
+    for city, (duration_ms, error) in errors.items():
+        # A failed request expires: host cities stay due, other cities wait for the next chat request
+        HotelRefresh.objects.update_or_create(city=city, defaults={
+            'requested_at': None,
+            'duration_ms': duration_ms,
+            'last_error': error,
+        })
+    return created, updated
+
+
+def refresh_cities(cities, client=None, limiter=None, batch_size=None):
+    """Fetch and store hotels for ``cities`` in batches; returns a summary dict"""
+    config = prewarm_settings()
+    dependency = get_dependency('rapidapi')
+    client = client or get_hotel_api(timeout=dependency.timeout)
+    limiter = limiter or RateLimiter(config['rate'])
+    batch_size = batch_size or config['batch_size']
+    summary = {'cities': 0, 'created': 0, 'updated': 0, 'errors': 0}
+
+    for start in range(0, len(cities), batch_size):
+        batch = cities[start:start + batch_size]
+        fetched, timings, errors = [], {}, {}
+        for city in batch:
+            limiter.acquire(2)  # destination lookup + property list
+            started = time.perf_counter()
+            try:
+                hotels = dependency.call(client.search, city, key=('hotels', city.lower()))
+                fetched.extend(hotels)
+                timings[city] = (time.perf_counter() - started) * 1000, len(hotels)
+            except Exception as e:
+                logger.warning(f"Could not prefetch hotels for {city}: {str(e)}")
+                errors[city] = (time.perf_counter() - started) * 1000, str(e)
+
+        created, updated = run_write(store_batch, fetched, timings, errors)
+
+        summary['cities'] += len(timings)
+        summary['created'] += created
+        summary['updated'] += updated
+        summary['errors'] += len(errors)
+
+    return summary
+
+
+def refresh_due_cities(now=None, **kwargs):
+    return refresh_cities(due_cities(now), **kwargs)
+
+
+def local_hotels(location, limit=3):
+    """Prefetched hotels for a location in the same shape as HotelAPIClient.search()"""
+    hotels = CoreHotel.objects.filter(city__icontains=location).order_by('price_per_night')[:limit]
+    return [
+        {
+            "name": hotel.name,
+            "location": hotel.city,
+            "rating": hotel.rating,
+            "price_per_night": float(hotel.price_per_night),
+            "description": hotel.description,
+            "image_url": hotel.image_url or '',
+        }
+        for hotel in hotels
+    ]
+
+
+def refresh_metrics(now=None):
+    """Staleness and timing of the last refresh for every tracked city"""
+    now = now or timezone.now()
+    metrics = []
+    for row in HotelRefresh.objects.order_by('city'):
+        metrics.append({
+            'city': row.city,
+            'staleness_seconds': (now - row.refreshed_at).total_seconds() if row.refreshed_at else None,
+            'last_duration_ms': row.duration_ms,
+            'hotel_count': row.hotel_count,
+            'pending_request': row.requested_at is not None,
+            'last_error': row.last_error,
+        })
+    return metrics
@@ -0,0 +1,240 @@
+"""
+Guards for the outbound calls made by the chatbot (Gemini, RapidAPI).
+
+Each external service is wrapped in a ``Dependency`` which enforces a
+deadline, bounds the number of concurrent calls, trips a circuit breaker
+after repeated failures and coalesces identical in-flight calls so they
+share a single request. Limits are read from ``settings.CHATBOT_RESILIENCE``.
+"""
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+
+from core.metrics import record_dependency
+from core.profiling import timed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {
+    'timeout': 10.0,
+    'max_concurrency': 4,
+    'acquire_timeout': 0.5,
+    'failure_threshold': 5,
+    'reset_timeout': 30.0,
+    'half_open_max_calls': 1,
+}
+
+
+class DependencyError(Exception):
+    """Raised when a guarded call is rejected or does not complete in time"""
+
+    def __init__(self, dependency, message):
+        super().__init__(f"{dependency}: {message}")
+        self.dependency = dependency
+
+
+class CircuitOpenError(DependencyError):
+    pass
+
+
+class DependencyTimeout(DependencyError):
+    pass
+
+
+class ConcurrencyLimitExceeded(DependencyError):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, half_open_max_calls=1, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+
+    def _trip(self):
+        self._state = self.OPEN
+        self._opened_at = self.clock()
+        self._failures = 0
+        self._probes = 0
+
+    def allow_request(self):
+        """Return True if a call may go through, reserving a probe slot when half-open"""
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            return False
+
+    def release_probe(self):
+        """Give back a probe slot reserved by allow_request() that was never used"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trip()
+                return
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._trip()
+
+
+class Dependency:
+    """Deadline, bulkhead, circuit breaker and request coalescing for one service"""
+
+    def __init__(self, name, timeout=10.0, max_concurrency=4, acquire_timeout=0.5,
+                 failure_threshold=5, reset_timeout=30.0, half_open_max_calls=1, clock=time.monotonic):
+        self.name = name
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self.breaker = CircuitBreaker(
+            failure_threshold=failure_threshold,
+            reset_timeout=reset_timeout,
+            half_open_max_calls=half_open_max_calls,
+            clock=clock,
+        )
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"{name}-call")
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def available(self):
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def call(self, fn, *args, key=None, timeout=None, **kwargs):
+        """
+        Run fn(*args, **kwargs) under this dependency's guards.
+
+        Calls sharing the same ``key`` while one of them is in flight wait for
+        that call and receive its result (or exception) instead of issuing
+        their own request.
+        """
+        started = time.perf_counter()
+        try:
+            with timed(self.name):
+                result = self._call(fn, args, kwargs, key, timeout)
+        except Exception as e:
+            record_dependency(self.name, time.perf_counter() - started, e)
+            raise
+        record_dependency(self.name, time.perf_counter() - started)
+        return result
+
+    def _call(self, fn, args, kwargs, key, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        if key is None:
+            return self._guarded_call(fn, args, kwargs, timeout)
+
+        with self._inflight_lock:
+            shared = self._inflight.get(key)
+            if shared is None:
+                shared = self._inflight[key] = Future()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            try:
+                return shared.result(timeout=timeout)
+            except FutureTimeoutError:
+                raise DependencyTimeout(self.name, f"no response within {timeout}s")
+
+        try:
+            result = self._guarded_call(fn, args, kwargs, timeout)
+        except BaseException as e:
+            shared.set_exception(e)
+            raise
+        else:
+            shared.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _guarded_call(self, fn, args, kwargs, timeout):
+        if not self._semaphore.acquire(timeout=self.acquire_timeout):
+            raise ConcurrencyLimitExceeded(self.name, "too many concurrent calls")
+        if not self.breaker.allow_request():
+            self._semaphore.release()
+            raise CircuitOpenError(self.name, "circuit open")
+
+        try:
+            # Run in the caller's context so request timing sees the outbound call.
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        except BaseException:
+            self._semaphore.release()
+            self.breaker.release_probe()
+            raise
+        # The slot is only freed once the call really returns, so calls that
+        # outlive their deadline keep counting against the concurrency limit.
+        future.add_done_callback(lambda f: self._semaphore.release())
+
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self.breaker.record_failure()
+            logger.warning(f"{self.name} call exceeded its {timeout}s deadline")
+            raise DependencyTimeout(self.name, f"no response within {timeout}s")
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+
+_dependencies = {}
+_registry_lock = threading.Lock()
+
+
+def get_dependency(name):
+    """Return the process-wide Dependency for ``name``, creating it from settings"""
+    with _registry_lock:
+        dependency = _dependencies.get(name)
+        if dependency is None:
+            limits = dict(DEFAULT_LIMITS)
+            limits.update(getattr(settings, 'CHATBOT_RESILIENCE', {}).get(name, {}))
+            dependency = _dependencies[name] = Dependency(name, **limits)
+        return dependency
+
+
+def reset_dependencies():
+    """Forget all dependency state (used by tests)"""
+    with _registry_lock:
+        _dependencies.clear()
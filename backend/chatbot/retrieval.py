@@ -0,0 +1,309 @@
+"""
+In-process BM25 retrieval index over the core catalog (flights, hotels, match
+tickets, activities and packages), used to ground chatbot answers.
+
+The index is a compacted column-compressed (CSC layout) set of NumPy arrays
+holding precomputed BM25 term impacts, plus a small in-memory delta for rows saved since the last compaction. Model signals
+keep it current within a process; deleted and replaced rows are tombstoned and
+dropped at the next compaction. Document frequencies include tombstoned rows
+until then, which only affects scores marginally. The signal handlers never
+compact: once the delta reaches ``compact_threshold`` postings they start a
+background rebuild, which swaps in a freshly compacted index.
+
+The process-wide index is built in a background thread when the server
+starts (core/background.py), and rebuilt every ``rebuild_interval`` seconds
+to pick up other processes' writes. Until the first build is done, answers
+are not grounded.
+"""
+import math
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+
+from core.background import BackgroundBuild
+
+KINDS = ('flight', 'hotel', 'match_ticket', 'activity', 'package')
+
+CATALOG_FIELDS = {
+    'flight': ('core.Flight', ('flight_number', 'airline', 'departure_city', 'arrival_city')),
+    'hotel': ('core.Hotel', ('name', 'city', 'address', 'description')),
+    'match_ticket': ('core.MatchTicket', ('match_name', 'stadium', 'match_type')),
+    'activity': ('core.Activity', ('name', 'city', 'activity_type', 'description')),
+    'package': ('core.Package', ('name', 'description')),
+}
+
+DEFAULT_INDEX = {
+    'compact_threshold': 50000,
+    'max_postings_per_term': 2000,
+    'rebuild_interval': 3600,
+}
+
+STOPWORDS = frozenset(
+    'a an and any are at be can do for from i in is it me my of on or show some the there to what which with you'.split()
+)
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def index_settings():
+    config = dict(DEFAULT_INDEX)
+    config.update(getattr(settings, 'CATALOG_INDEX', {}))
+    return config
+
+
+class CatalogIndex:
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, compact_threshold=50000, max_postings_per_term=2000):
+        self.compact_threshold = compact_threshold
+        self.max_postings_per_term = max_postings_per_term
+        self._lock = threading.RLock()
+        self.vocab = {}
+        self.keys = []
+        self.key_index = {}
+        self._n = 0
+        self._live = 0
+        self._total_length = 0.0
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._alive = np.zeros(1024, dtype=bool)
+        self._kinds = np.zeros(1024, dtype=np.int8)
+        self._df = np.zeros(1024, dtype=np.int32)
+        # Compacted segment: postings of term t are indices[indptr[t]:indptr[t + 1]],
+        # sorted by BM25 impact so the strongest matches come first.
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._impacts = np.zeros(0, dtype=np.float32)
+        self._tfs = np.zeros(0, dtype=np.float32)
+        self._delta = {}
+        self._delta_postings = 0
+
+    def __len__(self):
+        return self._live
+
+    @staticmethod
+    def _grow(array, size):
+        if size <= len(array):
+            return array
+        grown = np.zeros(max(size, len(array) * 2), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _impact(self, tf, length, avgdl):
+        return tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avgdl))
+
+    def add(self, kind, pk, text):
+        """Index (or re-index) one catalog row"""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove((kind, pk))
+            doc = self._n
+            self._n += 1
+            self._lengths = self._grow(self._lengths, self._n)
+            self._alive = self._grow(self._alive, self._n)
+            self._kinds = self._grow(self._kinds, self._n)
+            length = sum(terms.values())
+            self._lengths[doc] = length
+            self._alive[doc] = True
+            self._kinds[doc] = KINDS.index(kind)
+            self.keys.append((kind, pk))
+            self.key_index[(kind, pk)] = doc
+            self._live += 1
+            self._total_length += length
+
+            for term, tf in terms.items():
+                term_id = self.vocab.setdefault(term, len(self.vocab))
+                self._df = self._grow(self._df, term_id + 1)
+                self._df[term_id] += 1
+                docs, tfs = self._delta.setdefault(term_id, ([], []))
+                docs.append(doc)
+                tfs.append(tf)
+            self._delta_postings += len(terms)
+
+    @property
+    def compaction_due(self):
+        """Whether the delta has reached ``compact_threshold`` postings; compacting is left to the caller"""
+        return bool(self.compact_threshold) and self._delta_postings >= self.compact_threshold
+
+    def remove(self, kind, pk):
+        with self._lock:
+            self._remove((kind, pk))
+
+    def _remove(self, key):
+        doc = self.key_index.pop(key, None)
+        if doc is not None and self._alive[doc]:
+            self._alive[doc] = False
+            self._live -= 1
+            self._total_length -= float(self._lengths[doc])
+
+    def compact(self):
+        """Merge the delta into the compacted segment, dropping removed rows"""
+        with self._lock:
+            n_terms = len(self.vocab)
+            main_terms = len(self._indptr) - 1
+            cols = [np.repeat(np.arange(main_terms, dtype=np.int32), np.diff(self._indptr))]
+            rows = [self._indices]
+            tfs = [self._tfs]
+            for term_id, (docs, delta_tfs) in self._delta.items():
+                cols.append(np.full(len(docs), term_id, dtype=np.int32))
+                rows.append(np.asarray(docs, dtype=np.int32))
+                tfs.append(np.asarray(delta_tfs, dtype=np.float32))
+            rows, cols, tfs = np.concatenate(rows), np.concatenate(cols), np.concatenate(tfs)
+
+            alive = self._alive[:self._n]
+            keep = alive[rows]
+            rows, cols, tfs = rows[keep], cols[keep], tfs[keep]
+            rows = (np.cumsum(alive, dtype=np.int64) - 1)[rows].astype(np.int32)
+
+            self.keys = [key for key, live in zip(self.keys, alive) if live]
+            self.key_index = {key: doc for doc, key in enumerate(self.keys)}
+            self._n = self._live = len(self.keys)
+            self._lengths = self._lengths[:len(alive)][alive]
+            self._kinds = self._kinds[:len(alive)][alive]
+            self._alive = np.ones(self._n, dtype=bool)
+            self._total_length = float(self._lengths.sum())
+            avgdl = self._total_length / self._live if self._live else 1.0
+
+            impacts = self._impact(tfs, self._lengths[rows], avgdl).astype(np.float32)
+            # Group postings by term, strongest impact first.
+            order = np.lexsort((-impacts, cols))
+            self._indices, self._impacts, self._tfs = rows[order], impacts[order], tfs[order]
+            self._indptr = np.zeros(n_terms + 1, dtype=np.int64)
+            np.cumsum(np.bincount(cols, minlength=n_terms), out=self._indptr[1:])
+            self._df = np.diff(self._indptr).astype(np.int32)
+            self._delta = {}
+            self._delta_postings = 0
+
+    def search(self, query, k=5, kinds=None):
+        """Return up to ``k`` (key, score) pairs, best first"""
+        with self._lock:
+            if not self._live:
+                return []
+            term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+            avgdl = self._total_length / self._live or 1.0
+            docs, scores = [], []
+            main_terms = len(self._indptr) - 1
+            for term_id in term_ids:
+                df = self._df[term_id]
+                idf = math.log(1 + (self._n - df + 0.5) / (df + 0.5))
+                if term_id < main_terms:
+                    start = self._indptr[term_id]
+                    end = min(self._indptr[term_id + 1], start + self.max_postings_per_term)
+                    docs.append(self._indices[start:end])
+                    scores.append(self._impacts[start:end] * idf)
+                delta = self._delta.get(term_id)
+                if delta:
+                    delta_docs = np.asarray(delta[0], dtype=np.int32)
+                    impacts = self._impact(np.asarray(delta[1], dtype=np.float32), self._lengths[delta_docs], avgdl)
+                    docs.append(delta_docs)
+                    scores.append(impacts * idf)
+            if not docs:
+                return []
+
+            docs = np.concatenate(docs)
+            scores = np.concatenate(scores)
+            if len(term_ids) > 1:
+                docs, inverse = np.unique(docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=scores)
+            mask = self._alive[docs]
+            if kinds:
+                mask &= np.isin(self._kinds[docs], [KINDS.index(kind) for kind in kinds])
+            docs, scores = docs[mask], scores[mask]
+
+            if len(docs) > k:
+                top = np.argpartition(-scores, k)[:k]
+                docs, scores = docs[top], scores[top]
+            order = np.argsort(-scores, kind='stable')
+            return [(self.keys[docs[i]], float(scores[i])) for i in order]
+
+
+def document_text(kind, obj):
+    """Searchable text of a catalog row"""
+    _, fields = CATALOG_FIELDS[kind]
+    return ' '.join(str(getattr(obj, field) or '') for field in fields)
+
+
+def catalog_documents():
+    """Yield (kind, pk, text) for every catalog row"""
+    for kind, (model_label, fields) in CATALOG_FIELDS.items():
+        rows = apps.get_model(model_label).objects.values_list('pk', *fields)
+        for pk, *values in rows.iterator(chunk_size=5000):
+            yield kind, pk, ' '.join(str(value or '') for value in values)
+
+
+def build_index():
+    config = index_settings()
+    index = CatalogIndex(compact_threshold=0, max_postings_per_term=config['max_postings_per_term'])
+    for kind, pk, text in catalog_documents():
+        index.add(kind, pk, text)
+    index.compact()
+    index.compact_threshold = config['compact_threshold']
+    return index
+
+
+_holder = BackgroundBuild('catalog index', build_index)
+
+
+def get_index():
+    """The process-wide catalog index, or None until its first build is done; rebuilt in the background when old"""
+    return _holder.get(index_settings()['rebuild_interval'])
+
+
+def refresh_index():
+    """Build the index in this thread and swap it in"""
+    return _holder.refresh()
+
+
+def reset_index():
+    """Drop the process-wide index (used by tests)"""
+    _holder.reset()
+
+
+def catalog_kind(model):
+    label = model._meta.label
+    for kind, (model_label, _) in CATALOG_FIELDS.items():
+        if model_label == label:
+            return kind
+    return None
+
+
+def update_index(sender, instance, **kwargs):
+    """post_save handler keeping a built index current"""
+    index = _holder.value
+    if index is not None:
+        kind = catalog_kind(sender)
+        index.add(kind, instance.pk, document_text(kind, instance))
+        if index.compaction_due:
+            # Compacting holds the index lock for a full re-sort; a background rebuild swaps in a compacted copy
+            _holder.start()
+
+
+def remove_from_index(sender, instance, **kwargs):
+    """post_delete handler keeping a built index current"""
+    index = _holder.value
+    if index is not None:
+        index.remove(catalog_kind(sender), instance.pk)
+
+
+def find_catalog_rows(query, k=5, kinds=None):
+    """Catalog model instances best matching ``query``, in rank order, as (kind, obj) pairs"""
+    index = get_index()
+    if index is None:
+        return []
+    hits = index.search(query, k=k, kinds=kinds)
+    by_kind = {}
+    for (kind, pk), _ in hits:
+        by_kind.setdefault(kind, []).append(pk)
+    rows = {
+        kind: apps.get_model(CATALOG_FIELDS[kind][0]).objects.in_bulk(pks)
+        for kind, pks in by_kind.items()
+    }
+    return [(kind, rows[kind][pk]) for (kind, pk), _ in hits if pk in rows[kind]]
@@ -2,47 +2,29 @@ import json
 import os
 import logging
 from datetime import datetime, timedelta
+from decimal import Decimal
 from django.db.models import Q
-from dotenv import load_dotenv
 from django.conf import settings
 from django.utils import timezone
-import requests
 
-from .models import Hotel, Flight, Activity, Match, Package, Conversation
-import google.generativeai as genai
-
-# Load environment variables
-load_dotenv()
-
-# Configure Google Gemini AI
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+from core.db_router import replica_reads
+from core.metrics import record_cache
+from .models import Hotel, Flight, Activity, Match, Package
+from .context import ChatContext
+from .backends import LOCATION_PROMPT, get_hotel_api, get_llm_backend
+from .prewarm import local_hotels, prewarm_settings, request_refresh
+from .resilience import DependencyError, get_dependency
+from .retrieval import find_catalog_rows
+from .tasks import log_conversation, save_suggested_package, upsert_external_hotels
 
 logger = logging.getLogger(__name__)
 
 class ChatbotService:
     def __init__(self):
         try:
-            # List available models that support content generation
-            models = [m for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-            logger.info(f"Available models: {[m.name for m in models]}")
-
-            # Choose a valid supported model
-            supported_model = 'models/gemini-1.5-flash'
-            if supported_model not in [m.name for m in models]:
-                supported_model = models[0].name  # fallback if not available
-
-            self.model = genai.GenerativeModel(supported_model)
-
-            # Set generation configuration
-            self.chat_config = genai.types.GenerationConfig(
-                temperature=0.7,
-                top_p=0.8,
-                top_k=40,
-                max_output_tokens=2048,
-            )
-            self.chat = None
-            # Start the chat session
-            self.chat = self.model.start_chat(history=[])
+            # Outbound calls go through these guards (deadline, concurrency, circuit breaker)
+            self.gemini = get_dependency('gemini')
+            self.rapidapi = get_dependency('rapidapi')
 
             # Define system prompt
             self.system_prompt = """You are a helpful travel package assistant specializing in sports tourism. 
@@ -57,20 +39,104 @@ class ChatbotService:
             If you don't have specific information about prices or availability, 
             suggest that the user contact customer service for the most up-to-date details."""
 
-            # Send system prompt
-            self.chat.send_message(self.system_prompt, generation_config=self.chat_config)
+            # The system prompt is sent as the model's system instruction with every request
+            self.llm = get_llm_backend(self.system_prompt)
 
-            # Initialize conversation context
+            # Initialize conversation context (recent turns verbatim, older ones summarized)
+            self.context = ChatContext.from_settings(self.system_prompt)
             self.last_location = None
 
-            # Initialize API credentials
-            self.hotels_api_key = os.getenv('HOTELS_API_KEY')
-            self.hotels_api_url = "https://hotels4.p.rapidapi.com/properties/v2/list"
+            # Initialize the hotel inventory API
+            self.hotel_api = get_hotel_api(timeout=self.rapidapi.timeout)
 
         except Exception as e:
             logger.error(f"Error initializing ChatbotService: {str(e)}", exc_info=True)
             raise
 
+    def dump_state(self):
+        """The conversation state to keep between requests"""
+        return {'context': self.context.dump(), 'last_location': self.last_location}
+
+    def load_state(self, state):
+        """Continue the conversation saved by ``dump_state()``"""
+        if state:
+            self.context.load(state.get('context', {}))
+            self.last_location = state.get('last_location')
+
+    def generate(self, contents):
+        """Call Gemini through the guards and return the response text"""
+        return self.gemini.call(
+            lambda: self.llm.generate(contents, timeout=self.gemini.timeout),
+            key=('generate_content', repr(contents)),
+        )
+
+    def ask_gemini(self, prompt):
+        """Answer a user message with the windowed conversation context and catalog grounding"""
+        grounding = self.catalog_grounding(prompt)
+        if grounding:
+            prompt = f"{grounding}\n\nUser question: {prompt}"
+        return self.generate(self.context.build(prompt))
+
+    def catalog_grounding(self, user_message):
+        """Catalog rows relevant to the message, formatted for the model to cite"""
+        try:
+            rows = find_catalog_rows(user_message, k=5)
+        except Exception as e:
+            logger.error(f"Error searching catalog index: {str(e)}", exc_info=True)
+            return ''
+        if not rows:
+            return ''
+        lines = [self.describe_catalog_row(kind, obj) for kind, obj in rows]
+        return "Catalog entries you can cite (only quote prices and availability from these):\n" + '\n'.join(lines)
+
+    def describe_catalog_row(self, kind, obj):
+        if kind == 'flight':
+            return f"[flight {obj.pk}] {obj.airline or 'Flight'} {obj.flight_number}: {obj.departure_city} to {obj.arrival_city} on {obj.departure_time:%Y-%m-%d %H:%M}, ${obj.price}, {obj.available_seats} seats left"
+        if kind == 'hotel':
+            return f"[hotel {obj.pk}] {obj.name} in {obj.city}: {obj.rating}/5, ${obj.price_per_night} per night, {obj.available_rooms} rooms left"
+        if kind == 'match_ticket':
+            return f"[match_ticket {obj.pk}] {obj.match_name} at {obj.stadium} on {obj.match_date:%Y-%m-%d %H:%M}: ${obj.price}, {obj.available_tickets} tickets left"
+        if kind == 'activity':
+            return f"[activity {obj.pk}] {obj.name} in {obj.city} on {obj.activity_date:%Y-%m-%d}: ${obj.price}, {obj.available_spots} spots left"
+        return f"[package {obj.pk}] {obj.name}: ${obj.price} ({obj.discount}% off)"
+
+    def ask_helper(self, prompt):
+        """Send an internal one-off prompt without conversation history"""
+        return self.generate([{'role': 'user', 'parts': [prompt]}])
+
+    def match_local_location(self, message):
+        """Find a city or venue we already know about in the message, without calling Gemini"""
+        from core.models import Hotel as CoreHotel
+
+        text = message.lower()
+        known = set(CoreHotel.objects.values_list('city', flat=True).distinct())
+        known.update(Hotel.objects.values_list('location', flat=True).distinct())
+        known.update(Match.objects.values_list('venue', flat=True).distinct())
+        for name in sorted(filter(None, known), key=len, reverse=True):
+            if name.lower() in text:
+                return name
+        return None
+
+    def degraded_response(self, user_message):
+        """Answer from local data while Gemini is unavailable"""
+        from core.models import Hotel as CoreHotel
+
+        location = self.match_local_location(user_message)
+        matches = Match.objects.filter(date__gte=timezone.now()).order_by('date')
+        hotels = CoreHotel.objects.order_by('price_per_night')
+        if location:
+            matches = matches.filter(venue__icontains=location)
+            hotels = hotels.filter(city__icontains=location)
+
+        response = "Our assistant is temporarily busy, but here is what I can find in our catalog"
+        response += f" for {location}:\n\n" if location else ":\n\n"
+        for match in matches[:3]:
+            response += f"- {match.home_team} vs {match.away_team}\n  Venue: {match.venue}\n  Date: {match.date:%Y-%m-%d}\n  Ticket price: ${match.ticket_price}\n\n"
+        for hotel in hotels[:3]:
+            response += f"- {hotel.name}\n  Location: {hotel.city}\n  Rating: {hotel.rating}/5\n  Price per night: ${hotel.price_per_night}\n\n"
+        response += "Please try again in a moment for a more detailed answer."
+        return response
+
     def search_database(self, query, category):
         """Search the database for relevant items based on the query and category"""
         try:
@@ -104,15 +170,16 @@ class ChatbotService:
         """Suggest a package based on location and optional date range"""
         try:
             # Find relevant items
-            hotels = Hotel.objects.filter(location__icontains=location)[:3]
-            flights = Flight.objects.filter(
+            hotels = list(Hotel.objects.filter(location__icontains=location)[:3])
+            flights = list(Flight.objects.filter(
                 Q(departure_city__icontains=location) | 
                 Q(arrival_city__icontains=location)
-            )[:3]
-            activities = Activity.objects.filter(location__icontains=location)[:3]
-            matches = Match.objects.filter(venue__icontains=location)[:3]
+            )[:3])
+            activities = list(Activity.objects.filter(location__icontains=location)[:3])
+            matches = list(Match.objects.filter(venue__icontains=location)[:3])
 
-            if not any([hotels, flights, activities, matches]):
+            # Package requires a hotel, a flight and a match
+            if not (hotels and flights and matches):
                 return None
 
             # Calculate total price and discount
@@ -122,28 +189,33 @@ class ChatbotService:
                 sum(a.price for a in activities),
                 sum(m.ticket_price for m in matches)
             ])
-            discount = 0.15  # 15% discount for packages
-            final_price = total_price * (1 - discount)
-
-            # Create package name
-            package_name = f"Sports Tourism Package - {location}"
-
-            # Create the package
-            package = Package.objects.create(
-                name=package_name,
-                hotel=hotels.first() if hotels else None,
-                flight=flights.first() if flights else None,
-                match=matches.first() if matches else None,
+            discount = Decimal('0.15')  # 15% discount for packages
+            final_price = (total_price * (1 - discount)).quantize(Decimal('0.01'))
+
+            # Built here for the answer; a background worker saves it
+            package = Package(
+                name=f"Sports Tourism Package - {location}",
+                hotel=hotels[0],
+                flight=flights[0],
+                match=matches[0],
                 total_price=total_price,
                 discount_percentage=discount * 100,
                 final_price=final_price,
                 is_ai_suggested=True,
                 status="suggested"
             )
-
-            # Add activities
-            if activities:
-                package.activities.set(activities)
+            package.suggested_activities = activities
+
+            save_suggested_package.enqueue(
+                name=package.name,
+                hotel=package.hotel.pk,
+                flight=package.flight.pk,
+                match=package.match.pk,
+                activities=[activity.pk for activity in activities],
+                total_price=total_price,
+                discount_percentage=package.discount_percentage,
+                final_price=final_price,
+            )
 
             return package
         except Exception as e:
@@ -153,109 +225,52 @@ class ChatbotService:
     def search_external_hotels(self, location):
         """Search for hotels from an external API"""
         try:
-            if not self.hotels_api_key:
+            if not self.hotel_api.configured:
                 logger.error("Hotels API key not configured")
                 return []
 
-            # Prepare the API request
-            headers = {
-                "X-RapidAPI-Key": self.hotels_api_key,
-                "X-RapidAPI-Host": "hotels4.p.rapidapi.com"
-            }
-
-            # First, search for the destination ID
-            search_url = "https://hotels4.p.rapidapi.com/locations/v3/search"
-            search_params = {
-                "q": location,
-                "locale": "en_US",
-                "langid": "1033",
-                "siteid": "300000001"
-            }
-
-            search_response = requests.get(search_url, headers=headers, params=search_params)
-            search_data = search_response.json()
-
-            if not search_data.get('sr'):
-                logger.error(f"No destination found for location: {location}")
-                return []
-
-            # Get the first destination ID
-            destination_id = search_data['sr'][0]['gaiaId']
-
-            # Now search for hotels in that destination
-            payload = {
-                "currency": "USD",
-                "eapid": 1,
-                "locale": "en_US",
-                "siteId": 300000001,
-                "destination": {"id": destination_id},
-                "checkInDate": {
-                    "day": 10,
-                    "month": 10,
-                    "year": 2024
-                },
-                "checkOutDate": {
-                    "day": 15,
-                    "month": 10,
-                    "year": 2024
-                },
-                "rooms": [{"adults": 2}],
-                "resultsStartingIndex": 0,
-                "resultsSize": 3,
-                "sort": "PRICE_LOW_TO_HIGH"
-            }
-
-            response = requests.post(self.hotels_api_url, headers=headers, json=payload)
-            data = response.json()
-
-            if not data.get('data', {}).get('propertySearch', {}).get('properties'):
-                logger.error(f"No hotels found for location: {location}")
-                return []
-
-            # Transform the API response into our hotel format
-            hotels = []
-            for property in data['data']['propertySearch']['properties']:
-                hotel = {
-                    "name": property['name'],
-                    "location": location,
-                    "rating": float(property.get('reviews', {}).get('score', 0)) / 2,  # Convert to 5-star scale
-                    "price_per_night": float(property.get('price', {}).get('lead', {}).get('amount', 0)),
-                    "description": property.get('summary', {}).get('location', ''),
-                    "image_url": property.get('propertyGallery', {}).get('images', [{}])[0].get('image', {}).get('url', '')
-                }
-                hotels.append(hotel)
-
-            return hotels
+            return self.rapidapi.call(self.hotel_api.search, location, key=('hotels', location.lower()))
 
+        except DependencyError as e:
+            logger.warning(f"Hotels API unavailable for {location}: {str(e)}")
+            return []
         except Exception as e:
             logger.error(f"Error searching external hotels: {str(e)}", exc_info=True)
             return []
 
+    def find_hotels(self, location):
+        """Hotels for a location from prefetched data, or from the live API when enabled"""
+        if prewarm_settings()['live_search']:
+            external_hotels = self.search_external_hotels(location)
+            # Add the hotels to the database in the background
+            upsert_external_hotels.enqueue(hotels=external_hotels)
+            return external_hotels
+
+        hotels = local_hotels(location)
+        record_cache('hotel_prewarm', bool(hotels))
+        if not hotels:
+            # Let the prewarm scheduler pick this city up on its next run
+            request_refresh(location)
+        return hotels
+
+    @replica_reads
     def process_message(self, user_message):
         try:
             logger.info(f"Processing message: {user_message}")
 
-            # Store user message
-            conversation = Conversation.objects.create(
-                user_message=user_message,
-                created_at=timezone.now()
-            )
+            received_at = timezone.now()
 
             # First check for "search for other options" or similar phrases
             if any(phrase in user_message.lower() for phrase in ['search for other options', 'more options', 'other options', 'show more']):
                 if self.last_location:
                     # Search for more hotels in the last mentioned location
-                    external_hotels = self.search_external_hotels(self.last_location)
+                    external_hotels = self.find_hotels(self.last_location)
                     
                     if external_hotels:
                         response = f"Here are some additional hotels in {self.last_location}:\n\n"
                         for hotel in external_hotels:
                             response += f"- {hotel['name']}\n  Location: {hotel['location']}\n  Rating: {hotel['rating']}/5\n  Price per night: ${hotel['price_per_night']}\n\n"
                         
-                        # Add the hotels to the database
-                        for hotel_data in external_hotels:
-                            self.create_or_update_hotel(hotel_data)
-                        
                         response += "Would you like to know more about any of these hotels, or should I search for other options?"
                     else:
                         response = f"I couldn't find any more hotels in {self.last_location}. Would you like to try a different location?"
@@ -264,17 +279,13 @@ class ChatbotService:
                     location = self.extract_location(user_message)
                     if location:
                         self.last_location = location
-                        external_hotels = self.search_external_hotels(location)
+                        external_hotels = self.find_hotels(location)
                         
                         if external_hotels:
                             response = f"Here are some hotels in {location}:\n\n"
                             for hotel in external_hotels:
                                 response += f"- {hotel['name']}\n  Location: {hotel['location']}\n  Rating: {hotel['rating']}/5\n  Price per night: ${hotel['price_per_night']}\n\n"
                             
-                            # Add the hotels to the database
-                            for hotel_data in external_hotels:
-                                self.create_or_update_hotel(hotel_data)
-                            
                             response += "Would you like to know more about any of these hotels, or should I search for other options?"
                         else:
                             response = f"I couldn't find any hotels in {location}. Would you like to try a different location?"
@@ -311,17 +322,13 @@ class ChatbotService:
                         response += "Would you like to know more about any of these hotels, or should I search for other options?"
                     else:
                         # If no hotels found in database, use external API to suggest hotels
-                        external_hotels = self.search_external_hotels(location)
+                        external_hotels = self.find_hotels(location)
                         
                         if external_hotels:
                             response = f"I found these hotels in {location}:\n\n"
                             for hotel in external_hotels:
                                 response += f"- {hotel['name']}\n  Location: {hotel['location']}\n  Rating: {hotel['rating']}/5\n  Price per night: ${hotel['price_per_night']}\n\n"
                             
-                            # Add the hotels to the database
-                            for hotel_data in external_hotels:
-                                self.create_or_update_hotel(hotel_data)
-                            
                             response += "Would you like to know more about any of these hotels, or should I search for other options?"
                         else:
                             response = f"I couldn't find any hotels in {location}. Would you like to try a different location?"
@@ -361,7 +368,7 @@ class ChatbotService:
                                 response += f"Flight: {package.flight.flight_number}\n"
                             if package.match:
                                 response += f"Match: {package.match.home_team} vs {package.match.away_team}\n"
-                            response += f"Activities: {', '.join(a.name for a in package.activities.all())}\n"
+                            response += f"Activities: {', '.join(a.name for a in package.suggested_activities)}\n"
                             response += f"Original Price: ${package.total_price}\n"
                             response += f"Discount: {package.discount_percentage}%\n"
                             response += f"Final Price: ${package.final_price}\n\n"
@@ -383,14 +390,18 @@ class ChatbotService:
             # Finally, use Gemini for general queries
             else:
                 # Use Gemini for general queries
-                response = self.chat.send_message(
-                    user_message,
-                    generation_config=self.chat_config
-                ).text
-
-            # Store bot response
-            conversation.bot_message = response
-            conversation.save()
+                try:
+                    response = self.ask_gemini(user_message)
+                except DependencyError as e:
+                    logger.warning(f"Gemini unavailable, answering from local data: {str(e)}")
+                    response = self.degraded_response(user_message)
+                except Exception as e:
+                    logger.error(f"Error calling Gemini, answering from local data: {str(e)}", exc_info=True)
+                    response = self.degraded_response(user_message)
+
+            # Logged by a background worker, off the request path
+            log_conversation.enqueue(user_message=user_message, bot_message=response, created_at=received_at)
+            self.context.add_turn(user_message, response)
 
             return response
 
@@ -401,12 +412,15 @@ class ChatbotService:
     def extract_location(self, message):
         """Extract location from user message using Gemini"""
         try:
-            prompt = f"Extract the location from this message, return only the location name: {message}"
-            response = self.chat.send_message(prompt, generation_config=self.chat_config).text
+            prompt = f"{LOCATION_PROMPT} {message}"
+            response = self.ask_helper(prompt)
             return response.strip()
+        except DependencyError as e:
+            logger.warning(f"Gemini unavailable, matching location locally: {str(e)}")
+            return self.match_local_location(message)
         except Exception as e:
             logger.error(f"Error extracting location: {str(e)}", exc_info=True)
-            return None
+            return self.match_local_location(message)
 
     def create_or_update_hotel(self, hotel_data):
         """Create or update a hotel in both core and chatbot databases"""
@@ -0,0 +1,37 @@
+"""
+Background tasks of the chatbot: writes that used to run inside the chat
+request (see core/task_queue.py).
+"""
+from django.utils.dateparse import parse_datetime
+
+from core.task_queue import task
+from .models import Conversation, Package
+from .prewarm import upsert_hotels
+
+
+@task
+def log_conversation(user_message, bot_message, created_at):
+    conversation = Conversation.objects.create(user_message=user_message, bot_message=bot_message)
+    # created_at is auto_now_add; keep the time of the chat, not of the worker
+    Conversation.objects.filter(pk=conversation.pk).update(created_at=parse_datetime(created_at))
+
+
+@task(priority=-10)
+def upsert_external_hotels(hotels):
+    upsert_hotels(hotels)
+
+
+@task(priority=10)
+def save_suggested_package(name, hotel, flight, match, activities, total_price, discount_percentage, final_price):
+    package = Package.objects.create(
+        name=name,
+        hotel_id=hotel,
+        flight_id=flight,
+        match_id=match,
+        total_price=total_price,
+        discount_percentage=discount_percentage,
+        final_price=final_price,
+        is_ai_suggested=True,
+        status='suggested',
+    )
+    package.activities.set(activities)
@@ -0,0 +1,304 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core.compression import catalog_version
+from core.models import Activity as CoreActivity, Hotel as CoreHotel, MatchTicket
+from core.trip_finder import host_city
+from .apps import CATALOG_MODELS
+from .context import ChatContext, estimate_tokens, prompt_tokens
+from .models import Hotel, HotelRefresh
+from .prewarm import RateLimiter, due_cities, local_hotels, refresh_cities, request_refresh
+from .retrieval import CATALOG_FIELDS, CatalogIndex, find_catalog_rows, refresh_index, reset_index
+from .resilience import (
+    CircuitBreaker, CircuitOpenError, ConcurrencyLimitExceeded,
+    Dependency, DependencyTimeout, reset_dependencies,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def failing_call():
+    raise ConnectionError("upstream down")
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_threshold_and_probes_when_half_open(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        clock.now = 10
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())  # only one probe at a time
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+        breaker.record_failure()
+        clock.now = 5
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+class DependencyTests(SimpleTestCase):
+    def test_slow_call_hits_deadline(self):
+        release = threading.Event()
+        dependency = Dependency('slow', timeout=0.05, max_concurrency=1)
+        with self.assertRaises(DependencyTimeout):
+            dependency.call(release.wait, 5)
+        release.set()
+
+    def test_failures_trip_breaker_and_recover(self):
+        clock = FakeClock()
+        dependency = Dependency('flaky', failure_threshold=2, reset_timeout=30, clock=clock)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                dependency.call(failing_call)
+        with self.assertRaises(CircuitOpenError):
+            dependency.call(lambda: 'ok')
+        self.assertFalse(dependency.available)
+
+        clock.now = 30
+        self.assertEqual(dependency.call(lambda: 'ok'), 'ok')
+        self.assertTrue(dependency.available)
+
+    def test_concurrency_limit(self):
+        release = threading.Event()
+        dependency = Dependency('busy', timeout=0.05, max_concurrency=1, acquire_timeout=0.01)
+        with self.assertRaises(DependencyTimeout):
+            dependency.call(release.wait, 5)
+        # The timed-out call still holds the only slot until it returns.
+        with self.assertRaises(ConcurrencyLimitExceeded):
+            dependency.call(lambda: 'ok')
+        release.set()
+        time.sleep(0.05)
+        self.assertEqual(dependency.call(lambda: 'ok'), 'ok')
+
+    def test_identical_calls_are_coalesced(self):
+        calls = []
+        release = threading.Event()
+
+        def slow_prompt(prompt):
+            calls.append(prompt)
+            release.wait(5)
+            return prompt.upper()
+
+        dependency = Dependency('llm', timeout=5, max_concurrency=4)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(dependency.call(slow_prompt, 'hi', key='hi')))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, ['hi'])
+        self.assertEqual(results, ['HI', 'HI', 'HI'])
+
+
+class ChatContextTests(SimpleTestCase):
+    def test_long_conversation_stays_within_budget(self):
+        system_prompt = 'You are a travel assistant. ' * 10
+        context = ChatContext(system_prompt, max_tokens=1500, keep_turns=4, summary_tokens=300)
+        for i in range(200):
+            message = f"Turn {i}: show me hotels in Rabat " + 'please ' * (i % 40)
+            contents = context.build(message)
+            self.assertLessEqual(prompt_tokens(contents) + estimate_tokens(system_prompt), 1500)
+            self.assertEqual(contents[-1]['parts'], [message])
+            context.add_turn(message, 'Here are some hotels. ' * 20)
+
+        self.assertEqual(len(context.turns), 4)
+        self.assertTrue(context.turns[-1][0].startswith('Turn 199'))
+        self.assertIn('Turn 195', context.summary)
+        self.assertNotIn('Turn 0:', context.summary)
+
+    def test_summary_appears_before_recent_turns(self):
+        context = ChatContext(max_tokens=10000, keep_turns=1)
+        context.add_turn('first question', 'first answer')
+        context.add_turn('second question', 'second answer')
+        contents = context.build('third question')
+        self.assertIn('first question', contents[0]['parts'][0])
+        self.assertEqual([c['parts'][0] for c in contents[2:]], ['second question', 'second answer', 'third question'])
+
+    def test_summary_keeps_cities_dates_and_budgets_after_their_turns_are_dropped(self):
+        context = ChatContext(max_tokens=10000, keep_turns=1, summary_tokens=60)
+        context.add_turn('Hello! I want hotels in Marrakech from Dec 20th, budget $300 a night.',
+                         'Sure. Riad Yasmine costs 250 euros. It has a lovely pool.')
+        for i in range(5):
+            context.add_turn(f'Question {i} about the stadium', f'Answer {i} about the stadium')
+
+        self.assertNotIn('Riad Yasmine', context.summary)
+        self.assertIn('cities: Marrakech; dates: Dec 20th; budgets: $300, 250 euros', context.summary)
+        self.assertIn('Question 3', context.summary)
+        self.assertLessEqual(estimate_tokens(context.summary), 60)
+
+        restored = ChatContext(max_tokens=10000, keep_turns=1, summary_tokens=60)
+        restored.load(context.dump())
+        self.assertEqual(restored.summary, context.summary)
+
+
+class FakeHotelClient:
+    def __init__(self, price=100.0, fail_for=()):
+        self.price = price
+        self.fail_for = fail_for
+        self.searched = []
+
+    def search(self, location):
+        self.searched.append(location)
+        if location in self.fail_for:
+            raise ConnectionError("upstream down")
+        return [{
+            "name": f"{location} Palace",
+            "location": location,
+            "rating": 8.6 / 2,
+            "price_per_night": self.price,
+            "description": f"Central {location}",
+            "image_url": "",
+        }]
+
+
+class PrewarmTests(TestCase):
+    def setUp(self):
+        MatchTicket.objects.create(
+            match_name='Morocco vs Egypt', match_date=timezone.now() + timedelta(days=10),
+            stadium='Ibn Battuta - Tangier', match_type='CAN', price=50, available_tickets=100,
+        )
+        MatchTicket.objects.create(
+            match_name='Final', match_date=timezone.now() - timedelta(days=10),
+            stadium='Adrar - Agadir', match_type='CAN', price=80, available_tickets=0,
+        )
+        self.limiter = RateLimiter(rate=1000, burst=1000)
+        reset_dependencies()
+
+    def test_host_city(self):
+        self.assertEqual(host_city('Ibn Battuta - Tangier'), 'Tangier')
+        self.assertEqual(host_city('Grand Stade de Marrakech', ['Rabat', 'Marrakech']), 'Marrakech')
+
+    def test_rate_limiter_waits_for_tokens(self):
+        clock = FakeClock()
+        waits = []
+        limiter = RateLimiter(rate=2, burst=2, clock=clock, sleep=waits.append)
+        limiter.acquire(2)
+        limiter.acquire(2)
+        self.assertEqual(waits, [1.0])
+
+    def test_refresh_upserts_incrementally_and_clears_due_list(self):
+        self.assertEqual(due_cities(), ['Tangier'])
+        refresh_cities(due_cities(), client=FakeHotelClient(), limiter=self.limiter)
+
+        self.assertEqual(CoreHotel.objects.get(name='Tangier Palace').rating, 4)
+        self.assertEqual(Hotel.objects.filter(name='Tangier Palace').count(), 1)
+        self.assertEqual(due_cities(), [])
+        self.assertEqual(local_hotels('Tangier')[0]['name'], 'Tangier Palace')
+
+        version = catalog_version()
+        summary = refresh_cities(['Tangier'], client=FakeHotelClient(price=120), limiter=self.limiter)
+        self.assertEqual((summary['created'], summary['updated']), (0, 1))
+        self.assertEqual(CoreHotel.objects.get(name='Tangier Palace').price_per_night, 120)
+        self.assertGreater(catalog_version(), version)
+
+    def test_failed_city_stays_due(self):
+        refresh_cities(['Tangier'], client=FakeHotelClient(fail_for=['Tangier']), limiter=self.limiter)
+        refresh = HotelRefresh.objects.get(city='Tangier')
+        self.assertIsNone(refresh.refreshed_at)
+        self.assertIn('upstream down', refresh.last_error)
+        self.assertEqual(due_cities(), ['Tangier'])
+
+    def test_only_known_cities_are_requested_and_failed_requests_expire(self):
+        CoreActivity.objects.create(name='Medina walk', description='-', city='Chefchaouen', activity_type='TOUR',
+                                    activity_date=timezone.now() + timedelta(days=5), price=15, available_spots=10)
+        self.assertFalse(request_refresh('Show me hotels near'))
+        self.assertTrue(request_refresh('chefchaouen'))
+        self.assertTrue(request_refresh('TANGIER'))
+        self.assertEqual(sorted(HotelRefresh.objects.values_list('city', flat=True)), ['Chefchaouen', 'Tangier'])
+        self.assertEqual(due_cities(), ['Chefchaouen', 'Tangier'])
+
+        refresh_cities(due_cities(), client=FakeHotelClient(fail_for=['Chefchaouen', 'Tangier']), limiter=self.limiter)
+        self.assertEqual(due_cities(), ['Tangier'])  # still hosting a match
+
+
+class CatalogIndexTests(SimpleTestCase):
+    def test_ranking_updates_and_compaction(self):
+        index = CatalogIndex(compact_threshold=0)
+        index.add('hotel', 1, 'Riad Yasmine Marrakech medina rooftop')
+        index.add('hotel', 2, 'Hotel Atlas Casablanca business')
+        index.add('activity', 1, 'Medina food tour Marrakech')
+        index.compact()
+
+        self.assertEqual([key for key, _ in index.search('marrakech medina rooftop')][0], ('hotel', 1))
+        self.assertEqual([key for key, _ in index.search('marrakech', kinds=['activity'])], [('activity', 1)])
+
+        index.add('hotel', 2, 'Hotel Atlas Rabat business')  # re-indexed row lives in the delta
+        self.assertEqual(index.search('casablanca'), [])
+        self.assertEqual([key for key, _ in index.search('rabat')], [('hotel', 2)])
+
+        index.remove('hotel', 1)
+        index.compact()
+        self.assertEqual(len(index), 2)
+        self.assertEqual([key for key, _ in index.search('rooftop')], [])
+        self.assertEqual([key for key, _ in index.search('rabat')], [('hotel', 2)])
+
+
+class CatalogRetrievalTests(TestCase):
+    def setUp(self):
+        reset_index()
+        self.addCleanup(reset_index)
+
+    @override_settings(CATALOG_INDEX={'compact_threshold': 6})
+    def test_a_full_delta_starts_a_background_rebuild(self):
+        index = refresh_index()
+        with mock.patch('core.background.BackgroundBuild.start') as start:
+            CoreHotel.objects.create(name='Riad Yasmine', city='Fez', address='Medina', description='Patio',
+                                     price_per_night=60, available_rooms=3, rating=4)
+            start.assert_not_called()
+            CoreHotel.objects.create(name='Dar Bensouda', city='Fez', address='Medina', description='Rooftop',
+                                     price_per_night=80, available_rooms=2, rating=5)
+        start.assert_called_once_with()
+        self.assertTrue(index.compaction_due)  # not compacted in the request
+        self.assertEqual([obj.name for _, obj in find_catalog_rows('rooftop')], ['Dar Bensouda'])
+
+    def test_receivers_cover_the_indexed_models(self):
+        self.assertEqual(CATALOG_MODELS, tuple(label for label, _ in CATALOG_FIELDS.values()))
+
+    def test_index_follows_model_signals(self):
+        with mock.patch('core.background.BackgroundBuild.start') as start:
+            self.assertEqual(find_catalog_rows('casablanca'), [])  # not built yet: no grounding
+        start.assert_called_once_with()
+
+        refresh_index()
+        CoreHotel.objects.create(
+            name='Sofitel Tour Blanche', city='Casablanca', address='Rue Sidi Belyout',
+            description='Sea view', price_per_night=150, available_rooms=5, rating=5,
+        )
+        self.assertEqual([obj.name for _, obj in find_catalog_rows('casablanca sea view')], ['Sofitel Tour Blanche'])
+
+        ticket = MatchTicket.objects.create(
+            match_name='Morocco vs Senegal', match_date=timezone.now(), stadium='Stade Mohammed V - Casablanca',
+            match_type='CAN', price=40, available_tickets=1000,
+        )
+        self.assertIn(('match_ticket', ticket), find_catalog_rows('senegal'))
+        ticket.delete()
+        self.assertEqual(find_catalog_rows('senegal'), [])
@@ -6,4 +6,5 @@ app_name = 'chatbot'
 urlpatterns = [
     path('', views.chat_view, name='chat'),
     path('message/', views.ChatbotView.as_view(), name='message'),
+    path('prewarm/metrics/', views.prewarm_metrics, name='prewarm_metrics'),
 ] 
\ No newline at end of file
@@ -7,14 +7,23 @@ from rest_framework.permissions import AllowAny
 from rest_framework.decorators import permission_classes
 import json
 import logging
-from .services import ChatbotService
+from django.contrib.admin.views.decorators import staff_member_required
+from .prewarm import refresh_metrics
 
 logger = logging.getLogger(__name__)
 
+# Session key of the conversation state, so each user's chat keeps its context across requests
+CHAT_STATE_SESSION_KEY = 'chatbot_state'
+
 def chat_view(request):
     """Render the chat interface"""
     return render(request, 'chatbot/chat.html')
 
+@staff_member_required
+def prewarm_metrics(request):
+    """Staleness and refresh timings of prefetched hotel data"""
+    return JsonResponse({'cities': refresh_metrics()})
+
 @method_decorator(csrf_exempt, name='dispatch')
 @permission_classes([AllowAny])
 class ChatbotView(View):
@@ -29,8 +38,12 @@ class ChatbotView(View):
                 }, status=400)
             
             logger.info(f"Processing message: {user_message}")
+            # Imported here so that loading the URLconf does not pull in the chatbot stack.
+            from .services import ChatbotService
             chatbot = ChatbotService()
+            chatbot.load_state(request.session.get(CHAT_STATE_SESSION_KEY))
             response = chatbot.process_message(user_message)
+            request.session[CHAT_STATE_SESSION_KEY] = chatbot.dump_state()
             logger.info(f"Got response: {response}")
             
             return JsonResponse({
@@ -1,9 +1,37 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Flight, Hotel, MatchTicket, Activity, Booking, Package
+from django.db import transaction
+from django.utils import timezone
+from .admin_tools import EstimatedCountPaginator, cached_choices_filter
+from .availability import publish_availability, ticket_rows
+from .compression import bump_catalog_version
+from .metrics import record_booking
+from .price_calendar import calendar_keys, refresh_calendar
+from .models import User, Flight, Hotel, MatchTicket, Activity, Booking, Package, Task
+from .task_queue import retry_dead
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelists that neither count nor DISTINCT-scan the whole table on every load"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class CatalogAdmin(LargeTableAdmin):
+    availability_field = None
+    actions = ['mark_sold_out']
+
+    @admin.action(description='Mark selected items as sold out')
+    def mark_sold_out(self, request, queryset):
+        # update() skips auto_now and the save signals, so set both by hand
+        updated = queryset.update(**{self.availability_field: 0, 'updated_at': timezone.now()})
+        bump_catalog_version()
+        self.message_user(request, f'{updated} marked as sold out.')
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_display = ('username', 'email', 'role', 'phone_number', 'is_staff')
     list_filter = ('role', 'is_staff', 'is_superuser')
     fieldsets = (
@@ -14,18 +42,27 @@ class CustomUserAdmin(UserAdmin):
     )
 
 @admin.register(Flight)
-class FlightAdmin(admin.ModelAdmin):
+class FlightAdmin(CatalogAdmin):
     list_display = ('flight_number', 'departure_city', 'arrival_city', 'departure_time', 'price', 'available_seats', 'image_url')
     list_editable = ('departure_city', 'arrival_city', 'departure_time', 'price', 'available_seats', 'image_url')
-    list_filter = ('departure_city', 'arrival_city')
+    list_filter = (cached_choices_filter('departure_city', 'departure city'), cached_choices_filter('arrival_city', 'arrival city'))
     search_fields = ('flight_number', 'departure_city', 'arrival_city')
+    availability_field = 'available_seats'
+
+    @admin.action(description='Mark selected items as sold out')
+    def mark_sold_out(self, request, queryset):
+        # update() skips the save signals that keep the price calendar in step
+        keys = calendar_keys(queryset)
+        super().mark_sold_out(request, queryset)
+        refresh_calendar(keys, using=queryset.db)
 
 @admin.register(Hotel)
-class HotelAdmin(admin.ModelAdmin):
+class HotelAdmin(CatalogAdmin):
     list_display = ('name', 'city', 'price_per_night', 'available_rooms', 'rating', 'image_url', 'get_description')
     list_editable = ('city', 'price_per_night', 'available_rooms', 'rating', 'image_url')
-    list_filter = ('city', 'rating')
+    list_filter = (cached_choices_filter('city', 'city'), 'rating')
     search_fields = ('name', 'city', 'address')
+    availability_field = 'available_rooms'
     fields = ('name', 'city', 'address', 'description', 'price_per_night', 'available_rooms', 'rating', 'image_url')
 
     def get_description(self, obj):
@@ -33,11 +70,19 @@ class HotelAdmin(admin.ModelAdmin):
     get_description.short_description = 'Description'
 
 @admin.register(MatchTicket)
-class MatchTicketAdmin(admin.ModelAdmin):
+class MatchTicketAdmin(CatalogAdmin):
     list_display = ('match_name', 'stadium', 'match_date', 'price', 'available_tickets', 'image_url', 'match_type')
     list_editable = ('stadium', 'match_date', 'price', 'available_tickets', 'image_url', 'match_type')
-    list_filter = ('stadium', 'match_type')
+    list_filter = (cached_choices_filter('stadium', 'stadium'), 'match_type')
     search_fields = ('match_name', 'stadium')
+    availability_field = 'available_tickets'
+
+    @admin.action(description='Mark selected items as sold out')
+    def mark_sold_out(self, request, queryset):
+        # update() skips the save signal that pushes availability to watching fans
+        super().mark_sold_out(request, queryset)
+        rows = ticket_rows(queryset)
+        transaction.on_commit(lambda: publish_availability(rows), using=queryset.db)
 
     def formfield_for_choice_field(self, db_field, request, **kwargs):
         if db_field.name == 'match_type':
@@ -48,24 +93,51 @@ class MatchTicketAdmin(admin.ModelAdmin):
         return super().formfield_for_choice_field(db_field, request, **kwargs)
 
 @admin.register(Activity)
-class ActivityAdmin(admin.ModelAdmin):
+class ActivityAdmin(CatalogAdmin):
     list_display = ('name', 'city', 'price', 'available_spots', 'activity_date', 'image_url', 'activity_type', 'get_description')
     list_editable = ('city', 'price', 'available_spots', 'activity_date', 'image_url', 'activity_type')
-    list_filter = ('city', 'activity_type')
+    list_filter = (cached_choices_filter('city', 'city'), 'activity_type')
     search_fields = ('name', 'city', 'description')
+    availability_field = 'available_spots'
 
     def get_description(self, obj):
         return obj.description[:100] + '...' if len(obj.description) > 100 else obj.description
     get_description.short_description = 'Description'
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdmin):
     list_display = ('user', 'status', 'total_price', 'booking_date')
     list_filter = ('status', 'booking_date')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email')
+    autocomplete_fields = ('user', 'flight', 'hotel', 'match_ticket', 'activity')
+    actions = ['mark_confirmed', 'mark_cancelled']
+
+    @admin.action(description='Mark selected bookings as confirmed')
+    def mark_confirmed(self, request, queryset):
+        updated = queryset.exclude(status='confirmed').update(status='confirmed', updated_at=timezone.now())
+        self.message_user(request, f'{updated} bookings confirmed.')
+
+    @admin.action(description='Cancel selected bookings')
+    def mark_cancelled(self, request, queryset):
+        updated = queryset.exclude(status='cancelled').update(status='cancelled', updated_at=timezone.now())
+        record_booking('cancelled', updated)
+        self.message_user(request, f'{updated} bookings cancelled.')
 
 @admin.register(Package)
-class PackageAdmin(admin.ModelAdmin):
+class PackageAdmin(LargeTableAdmin):
     list_display = ('name', 'price', 'discount')
-    filter_horizontal = ('flights', 'hotels', 'match_tickets', 'activities')
+    autocomplete_fields = ('flights', 'hotels', 'match_tickets', 'activities')
     search_fields = ('name', 'description')
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'updated_at')
+    list_filter = ('status', cached_choices_filter('name', 'task'))
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'created_at', 'updated_at')
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected dead tasks')
+    def requeue(self, request, queryset):
+        requeued = retry_dead(using=queryset.db, ids=queryset.values_list('pk', flat=True))
+        self.message_user(request, f'{requeued} requeued.')
@@ -0,0 +1,98 @@
+"""
+Changelist helpers that keep the admin fast on tables with millions of rows.
+
+``EstimatedCountPaginator`` takes the row count of an unfiltered changelist
+from the database statistics (``pg_class.reltuples`` on PostgreSQL,
+``sqlite_stat1`` after ``ANALYZE`` on SQLite) instead of ``COUNT(*)`` once
+the table has more than ``estimate_threshold`` rows. Filtered changelists are
+still counted exactly. Use it together with ``show_full_result_count = False``.
+
+``cached_choices_filter`` builds a list filter for a free-text column whose
+choices, the ``DISTINCT`` values of the column, are computed once and cached
+until the next catalog write or ``filter_timeout`` seconds.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+from .compression import catalog_version
+
+DEFAULTS = {
+    'cache': 'default',
+    'estimate_threshold': 10000,  # rows; smaller tables are counted exactly
+    'filter_timeout': 600,  # seconds filter choices are cached
+    'filter_limit': 200,  # most choices shown in one filter
+}
+
+
+def admin_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'ADMIN_CHANGELIST', {}))
+    return config
+
+
+def estimated_count(model, using):
+    """Row count of ``model``'s table from planner statistics, or None when there are none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [connection.ops.quote_name(table)])
+            elif connection.vendor == 'sqlite':
+                # One row per index, led by the rows it covers; partial indexes cover fewer than the table
+                cursor.execute('SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s', [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 only exists once ANALYZE has run
+        return None
+    if row is None or row[0] is None:
+        return None
+    count = int(str(row[0]).split()[0])
+    return count if count >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the size of large unfiltered tables instead of counting them"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > admin_settings()['estimate_threshold']:
+                return estimate
+        return super().count
+
+
+def cached_choices_filter(field_name, title):
+    """A list filter on ``field_name`` whose choices come from the cache"""
+
+    class CachedChoicesFilter(admin.SimpleListFilter):
+        parameter_name = field_name
+
+        def lookups(self, request, model_admin):
+            config = admin_settings()
+            cache = caches[config['cache']]
+            model = model_admin.model
+            key = f'admin_filter:{catalog_version(cache)}:{model._meta.label_lower}:{field_name}'
+            values = cache.get(key)
+            if values is None:
+                values = list(model._default_manager.order_by(field_name)
+                              .values_list(field_name, flat=True).distinct()[:config['filter_limit']])
+                cache.set(key, values, config['filter_timeout'])
+            return [(value, value) for value in values if value not in (None, '')]
+
+        def queryset(self, request, queryset):
+            if self.value():
+                return queryset.filter(**{field_name: self.value()})
+            return queryset
+
+    CachedChoicesFilter.title = title
+    CachedChoicesFilter.__name__ = f'{field_name.title().replace("_", "")}Filter'
+    return CachedChoicesFilter
@@ -1,6 +1,50 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .autocomplete import BOOKED, SOURCES
+        from .background import BUILD_MODULES
+        from .lazy import LazyReceiver
+
+        # Receivers are imported on first use (core/lazy.py); the NumPy-backed
+        # schedule only follows flight changes once something has loaded it.
+        def connect(signal, path, uid, sender=None, if_loaded=False):
+            signal.connect(LazyReceiver(path, if_loaded), sender=sender, weak=False, dispatch_uid=uid)
+
+        BUILD_MODULES.extend(['core.autocomplete', 'core.routing'])
+        connect(connection_created, 'core.sqlite.apply_pragmas', 'sqlite_production_pragmas')
+        connect(connection_created, 'core.metrics.count_connection', 'metrics_count_connection')
+        connect(request_started, 'core.db_pool.count_request', 'db_pool_count_request')
+        user_model = self.get_model('User')
+        connect(post_save, 'core.authentication.forget_user_state', 'jwt_forget_user_state_save', user_model)
+        connect(post_delete, 'core.authentication.forget_user_state', 'jwt_forget_user_state_delete', user_model)
+        flight_model = self.get_model('Flight')
+        connect(post_save, 'core.routing.schedule_flight_saved', 'routing_flight_save', flight_model, if_loaded=True)
+        connect(post_delete, 'core.routing.schedule_flight_deleted', 'routing_flight_delete', flight_model, if_loaded=True)
+        connect(pre_save, 'core.price_calendar.flight_price_day_previous', 'price_calendar_flight_previous', flight_model)
+        connect(post_save, 'core.price_calendar.flight_price_day_saved', 'price_calendar_flight_save', flight_model)
+        connect(post_delete, 'core.price_calendar.flight_price_day_deleted', 'price_calendar_flight_delete', flight_model)
+        connect(post_save, 'core.availability.ticket_availability_saved', 'availability_push_ticket_save',
+                self.get_model('MatchTicket'))
+        for label in SOURCES:
+            model = self.apps.get_model(label)
+            connect(pre_save, 'core.autocomplete.autocomplete_previous', f'autocomplete_previous_{label}', model)
+            connect(post_save, 'core.autocomplete.autocomplete_saved', f'autocomplete_save_{label}', model)
+            connect(post_delete, 'core.autocomplete.autocomplete_deleted', f'autocomplete_delete_{label}', model)
+        for field in BOOKED:
+            connect(m2m_changed, 'core.autocomplete.autocomplete_booking_changed', f'autocomplete_booking_{field}',
+                    getattr(self.get_model('Booking'), field).through)
+        for name in ('Flight', 'Hotel', 'MatchTicket', 'Activity', 'Package'):
+            model = self.get_model(name)
+            connect(post_save, 'core.compression.bump_catalog_version', f'catalog_response_save_{name}', model)
+            connect(post_delete, 'core.compression.bump_catalog_version', f'catalog_response_delete_{name}', model)
+        for field in ('flights', 'hotels', 'match_tickets', 'activities'):
+            connect(m2m_changed, 'core.compression.bump_catalog_version', f'catalog_response_m2m_{field}',
+                    getattr(self.get_model('Package'), field).through)
@@ -0,0 +1,116 @@
+"""
+JWT authentication without a user query per request.
+
+``CachedJWTAuthentication`` takes the user id from the validated token and
+the authorization state (active flag, role, staff flags and the token
+revocation time) from a small per-user cache entry with a short TTL. It
+returns a ``User`` whose other fields are deferred: a view that reads one of
+them (email, phone number, ...) loads the rest of the row in a single query.
+Saving or deleting a user drops its cache entry, so deactivation, role
+changes and ``revoke_tokens`` apply immediately in the process that made the
+change and within ``JWT_USER_CACHE['timeout']`` seconds everywhere else.
+
+The state is cached rather than carried as token claims: the active flag and
+the revocation time have to be checked against current data on every
+request anyway, and the same entry then also gives the current role instead
+of the one at login. ``TokenRefreshSerializer`` applies the same checks to
+refresh tokens, so a revoked or deactivated user cannot mint new access
+tokens. ``iat`` has one-second resolution, so tokens issued in the same
+second as a revocation are rejected too, even when issued just after it.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .metrics import record_cache
+
+DEFAULTS = {
+    'cache': 'default',
+    'timeout': 60,
+}
+
+# Loaded with the authentication state; everything else on the user is deferred.
+STATE_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser', 'role', 'tokens_revoked_at')
+
+
+def user_cache_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'JWT_USER_CACHE', {}))
+    return config
+
+
+def user_state_key(user_id):
+    return f'jwt_user:{user_id}'
+
+
+def get_user_state(user_id):
+    """The cached STATE_FIELDS values of a user, or None if the user does not exist"""
+    config = user_cache_settings()
+    cache = caches[config['cache']]
+    key = user_state_key(user_id)
+    state = cache.get(key)
+    record_cache('jwt_user', state is not None)
+    if state is None:
+        state = get_user_model().objects.filter(pk=user_id).values(*STATE_FIELDS).first() or {}
+        cache.set(key, state, config['timeout'])
+    return state or None
+
+
+def forget_user_state(sender, instance, **kwargs):
+    """post_save/post_delete receiver for the user model"""
+    caches[user_cache_settings()['cache']].delete(user_state_key(instance.pk))
+
+
+def revoke_tokens(user):
+    """Reject every access and refresh token issued to ``user`` until now"""
+    user.tokens_revoked_at = timezone.now()
+    user.save(update_fields=['tokens_revoked_at'])
+
+
+def token_state(token):
+    """The cached state of the user of a validated access or refresh token, if it may still be used"""
+    try:
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    state = get_user_state(user_id)
+    if state is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if not state['is_active']:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    revoked_at = state['tokens_revoked_at']
+    issued_at = token.get('iat')
+    # iat is whole seconds: a token from the second of the revocation counts as revoked
+    if revoked_at and (issued_at is None or datetime.fromtimestamp(issued_at, dt_timezone.utc) <= revoked_at):
+        raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+    return state
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """Refuses refresh tokens of inactive users and tokens issued before ``revoke_tokens``"""
+
+    def validate(self, attrs):
+        token_state(RefreshToken(attrs['refresh']))
+        return super().validate(attrs)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        state = token_state(validated_token)
+
+        # from_db expects the values in field order, with the missing ones deferred.
+        fields = [f.attname for f in self.user_model._meta.concrete_fields if f.attname in state]
+        user = self.user_model.from_db(router.db_for_read(self.user_model), fields, [state[name] for name in fields])
+        user.from_token = True
+        return user
@@ -0,0 +1,420 @@
+"""
+Search-box suggestions for cities, hotels, stadiums, matches, activities and
+teams, served from an in-memory radix (compressed prefix) trie per kind.
+
+Every distinct value of an indexed field is one entry. It is reachable from
+each of its words, so "farah" suggests "Hotel Farah", and matching ignores
+case and accents. An entry's popularity is the number of rows carrying the
+value plus the number of bookings that include those rows. Each trie node
+keeps its ``limit`` most popular entries, so a lookup is one walk down the
+query's characters.
+
+The process-wide index is built from the database in a background thread
+(core/background.py); until the first build is done, there are no
+suggestions. Saves, deletes and booking changes in this process are applied
+when their transaction commits. The index is rebuilt in the background every
+``rebuild_interval`` seconds and swapped in, which picks up changes made by
+other processes and corrects the booking counts of deleted rows, which are
+not subtracted. Changes committed while a rebuild runs may be missing from
+the new index until the next one.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .background import BackgroundBuild
+from .db_router import use_replica
+from .models import Booking
+
+DEFAULTS = {
+    'limit': 10,  # suggestions kept per trie node; the most a query can return
+    'rebuild_interval': 3600,  # seconds between full rebuilds
+}
+
+# Model label: (kind, field) pairs indexed from it
+SOURCES = {
+    'core.Flight': (('city', 'departure_city'), ('city', 'arrival_city')),
+    'core.Hotel': (('hotel', 'name'), ('city', 'city')),
+    'core.MatchTicket': (('match', 'match_name'), ('stadium', 'stadium')),
+    'core.Activity': (('activity', 'name'),),
+    'chatbot.Match': (('team', 'home_team'), ('team', 'away_team')),
+}
+
+KINDS = ('city', 'hotel', 'stadium', 'match', 'activity', 'team')
+
+# Booking many-to-many field: model label of the booked items
+BOOKED = {
+    'flight': 'core.Flight',
+    'hotel': 'core.Hotel',
+    'match_ticket': 'core.MatchTicket',
+    'activity': 'core.Activity',
+}
+
+SEPARATORS_RE = re.compile(r'[\W_]+')
+
+
+def autocomplete_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'AUTOCOMPLETE', {}))
+    return config
+
+
+def normalize(text):
+    """Casefolded words without accents or punctuation, joined by single spaces"""
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+    return SEPARATORS_RE.sub(' ', text.casefold()).strip()
+
+
+def keys(text):
+    """The trie keys of ``text``: its normalized form from each word on"""
+    words = normalize(text).split(' ')
+    return list(dict.fromkeys(' '.join(words[i:]) for i in range(len(words)) if words[i]))
+
+
+class Node:
+    __slots__ = ('label', 'children', 'entries', 'top')
+
+    def __init__(self, label='', children=None, entries=None, top=()):
+        self.label = label
+        self.children = children  # first character of the child's label: child
+        self.entries = entries  # list of the entries whose key ends here
+        self.top = top  # most popular entries of this subtree, best first
+
+
+class PrefixTrie:
+    """Radix trie from the keys of text values to entries ranked by popularity"""
+
+    def __init__(self, limit=10):
+        self.limit = limit
+        self.root = Node()
+        self._lock = threading.RLock()
+        self.ids = {}
+        self.texts = []
+        self.rows = []
+        self.bookings = []
+        self._free = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_counts(cls, counts, limit=10):
+        """Build from {text: (rows, bookings)}"""
+        trie = cls(limit)
+        for text, (rows, bookings) in counts.items():
+            if rows > 0 and text:
+                entry = trie._new(text, rows, bookings)
+                for key in keys(text):
+                    trie._insert(key, entry)
+        trie._rank_all()
+        return trie
+
+    def rank(self, entry):
+        return -(self.rows[entry] + self.bookings[entry]), self.texts[entry]
+
+    def score(self, entry):
+        return self.rows[entry] + self.bookings[entry]
+
+    def search(self, prefix, limit=None):
+        """[(text, score)] of the most popular entries with a word starting with ``prefix``"""
+        rest = normalize(prefix)
+        with self._lock:
+            node = self.root
+            while rest:
+                child = node.children.get(rest[0]) if node.children else None
+                if child is None:
+                    return []
+                label = child.label
+                if rest.startswith(label):
+                    rest = rest[len(label):]
+                elif label.startswith(rest):
+                    rest = ''
+                else:
+                    return []
+                node = child
+            return [(self.texts[entry], self.score(entry)) for entry in node.top[:limit or self.limit]]
+
+    def adjust(self, text, rows=0, bookings=0):
+        """Add to the row and booking counts of ``text``; it is added with its first row and removed with its last"""
+        if not text:
+            return
+        with self._lock:
+            entry = self.ids.get(text)
+            if entry is None:
+                if rows <= 0:
+                    return
+                entry = self._new(text, rows, max(bookings, 0))
+                paths, improved = [self._insert(key, entry) for key in keys(text)], True
+            else:
+                before = self.rank(entry)
+                self.rows[entry] += rows
+                self.bookings[entry] = max(self.bookings[entry] + bookings, 0)
+                if self.rows[entry] > 0:
+                    paths, improved = [self._path(key) for key in keys(text)], self.rank(entry) < before
+                else:
+                    paths, improved = [self._remove(key, entry) for key in keys(text)], False
+            for path in paths:
+                self._refresh(path, entry, improved)
+            if self.rows[entry] <= 0:
+                del self.ids[text]
+                self._free.append(entry)
+
+    def _new(self, text, rows, bookings):
+        if self._free:
+            entry = self._free.pop()
+            self.texts[entry], self.rows[entry], self.bookings[entry] = text, rows, bookings
+        else:
+            entry = len(self.texts)
+            self.texts.append(text)
+            self.rows.append(rows)
+            self.bookings.append(bookings)
+        self.ids[text] = entry
+        return entry
+
+    def _insert(self, key, entry):
+        """Add ``entry`` under ``key``; returns the nodes from the root to the key's node"""
+        node, rest, path = self.root, key, [self.root]
+        while rest:
+            child = node.children.get(rest[0]) if node.children else None
+            if child is None:
+                child = Node(rest, entries=[entry], top=(entry,))
+                if node.children is None:
+                    node.children = {}
+                node.children[rest[0]] = child
+                path.append(child)
+                return path
+            label = child.label
+            if rest.startswith(label):
+                common = len(label)
+            else:
+                common = 1
+                while common < len(rest) and label[common] == rest[common]:
+                    common += 1
+                # Split the edge where the key leaves it
+                middle = Node(label[:common], children={label[common]: child}, top=child.top)
+                child.label = label[common:]
+                node.children[rest[0]] = middle
+                child = middle
+            path.append(child)
+            node, rest = child, rest[common:]
+        if node.entries:
+            node.entries.append(entry)
+        else:
+            node.entries = [entry]
+        return path
+
+    def _path(self, key):
+        node, rest, path = self.root, key, [self.root]
+        while rest:
+            node = node.children[rest[0]]
+            rest = rest[len(node.label):]
+            path.append(node)
+        return path
+
+    def _remove(self, key, entry):
+        """Drop ``entry`` from ``key``, pruning and merging nodes; returns the remaining path"""
+        path = self._path(key)
+        path[-1].entries.remove(entry)
+        while len(path) > 1 and not path[-1].entries and not path[-1].children:
+            leaf = path.pop()
+            del path[-1].children[leaf.label[0]]
+        node = path[-1]
+        if len(path) > 1 and not node.entries and node.children and len(node.children) == 1:
+            # A node left with one child and no entries of its own is folded into it
+            (child,) = node.children.values()
+            node.label += child.label
+            node.children, node.entries, node.top = child.children, child.entries, child.top
+        if node.children == {}:
+            node.children = None
+        return path
+
+    def _refresh(self, path, entry, improved):
+        """Update the tops along ``path`` after ``entry``, and nothing else below them, changed rank"""
+        for node in reversed(path):
+            if improved:
+                # The others kept their rank, so the new top is the old one plus the entry
+                node.top = tuple(heapq.nsmallest(self.limit, set(node.top) | {entry}, key=self.rank))
+            elif entry in node.top:
+                node.top = self._best(node, self.rank)
+
+    def _best(self, node, rank):
+        candidates = set(node.entries or ())
+        for child in (node.children or {}).values():
+            candidates.update(child.top)
+        return tuple(heapq.nsmallest(self.limit, candidates, key=rank))
+
+    def _rank_all(self):
+        ranks = [self.rank(entry) for entry in range(len(self.texts))]
+        # Children before parents, without recursion
+        stack, order = [self.root], []
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            if node.children:
+                stack.extend(node.children.values())
+        for node in reversed(order):
+            if node.children or len(node.entries or ()) > 1:
+                node.top = self._best(node, ranks.__getitem__)
+            else:
+                node.top = tuple(node.entries or ())
+
+
+class AutocompleteIndex:
+    """One ``PrefixTrie`` per kind"""
+
+    def __init__(self, tries):
+        self.tries = tries
+
+    def __len__(self):
+        return sum(len(trie) for trie in self.tries.values())
+
+    @classmethod
+    def from_counts(cls, counts, limit=10):
+        """Build from {(kind, text): (rows, bookings)}"""
+        by_kind = {kind: {} for kind in KINDS}
+        for (kind, text), value in counts.items():
+            by_kind[kind][text] = value
+        return cls({kind: PrefixTrie.from_counts(values, limit) for kind, values in by_kind.items()})
+
+    def search(self, prefix, kinds=None, limit=10):
+        """[{'text', 'kind', 'score'}] for ``prefix``, most popular first"""
+        results = [
+            (-score, text, kind)
+            for kind in (kinds or KINDS)
+            for text, score in self.tries[kind].search(prefix, limit)
+        ]
+        return [{'text': text, 'kind': kind, 'score': -score} for score, text, kind in heapq.nsmallest(limit, results)]
+
+    def apply(self, changes):
+        for kind, text, rows, bookings in changes:
+            self.tries[kind].adjust(text, rows, bookings)
+
+
+def source_counts():
+    """{(kind, text): [rows, bookings]} over every indexed field"""
+    counts = defaultdict(lambda: [0, 0])
+    for label, fields in SOURCES.items():
+        model = apps.get_model(label)
+        for kind, field in fields:
+            for value, rows in model.objects.order_by().values_list(field).annotate(rows=Count('pk')):
+                counts[kind, value][0] += rows
+    for booked, label in BOOKED.items():
+        m2m = Booking._meta.get_field(booked)
+        target = m2m.m2m_reverse_field_name()
+        for kind, field in SOURCES[label]:
+            for value, bookings in (m2m.remote_field.through.objects.order_by()
+                                    .values_list(f'{target}__{field}').annotate(bookings=Count('pk'))):
+                counts[kind, value][1] += bookings
+    return counts
+
+
+def build_index():
+    with use_replica():
+        return AutocompleteIndex.from_counts(source_counts(), autocomplete_settings()['limit'])
+
+
+_holder = BackgroundBuild('autocomplete index', build_index)
+
+
+def get_index():
+    """The process-wide index, or None until its first build is done; rebuilt in the background when old"""
+    return _holder.get(autocomplete_settings()['rebuild_interval'])
+
+
+def refresh_index():
+    """Build the index in this thread and swap it in"""
+    return _holder.refresh()
+
+
+def reset_index():
+    """Drop the process-wide index (used by tests)"""
+    _holder.reset()
+
+
+def apply_changes(changes):
+    index = _holder.value
+    if index is not None:
+        index.apply(changes)
+
+
+def on_commit(changes, using):
+    if changes:
+        transaction.on_commit(lambda: apply_changes(changes), using=using)
+
+
+def item_bookings(instance, using):
+    """Bookings that include ``instance``, for models in ``BOOKED``"""
+    if instance._meta.label not in BOOKED.values():
+        return 0
+    return instance.booking_set.using(using).count()
+
+
+def autocomplete_previous(sender, instance, raw=False, using=None, **kwargs):
+    """pre_save receiver: remember the indexed values the row is moving away from"""
+    instance._autocomplete_previous = None
+    if raw or _holder.value is None or instance.pk is None or instance._state.adding:
+        return
+    fields = [field for _, field in SOURCES[sender._meta.label]]
+    instance._autocomplete_previous = sender.objects.using(using).filter(pk=instance.pk).values_list(*fields).first()
+
+
+def autocomplete_saved(sender, instance, created=False, raw=False, using=None, **kwargs):
+    """post_save receiver, applied on commit"""
+    if raw or _holder.value is None:
+        return
+    previous = getattr(instance, '_autocomplete_previous', None)
+    sources = SOURCES[sender._meta.label]
+    if created or previous is None:
+        changes = [(kind, getattr(instance, field), 1, 0) for kind, field in sources]
+    else:
+        moved = [(kind, old, getattr(instance, field))
+                 for (kind, field), old in zip(sources, previous) if old != getattr(instance, field)]
+        bookings = item_bookings(instance, using) if moved else 0
+        changes = []
+        for kind, old, new in moved:
+            changes += [(kind, old, -1, -bookings), (kind, new, 1, bookings)]
+    on_commit(changes, using)
+
+
+def autocomplete_deleted(sender, instance, using=None, **kwargs):
+    """post_delete receiver, applied on commit"""
+    if _holder.value is not None:
+        on_commit([(kind, getattr(instance, field), -1, 0) for kind, field in SOURCES[sender._meta.label]], using)
+
+
+def autocomplete_booking_changed(sender, instance, action, reverse, model, pk_set, using=None, **kwargs):
+    """m2m_changed receiver for the items of a Booking, applied on commit"""
+    if _holder.value is None or action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    sign = 1 if action == 'post_add' else -1
+    if reverse:
+        # ``instance`` is the booked item and ``pk_set`` the bookings
+        item_model = type(instance)
+        booked = {instance.pk: len(pk_set) if pk_set is not None else item_bookings(instance, using)}
+    else:
+        item_model = model
+        if pk_set is None:
+            pk_set = set(getattr(instance, booked_field(sender)).using(using).values_list('pk', flat=True))
+        booked = dict.fromkeys(pk_set, 1)
+    sources = SOURCES[item_model._meta.label]
+    changes = []
+    for pk, *values in item_model.objects.using(using).filter(pk__in=booked).values_list(
+            'pk', *[field for _, field in sources]):
+        changes += [(kind, value, 0, sign * booked[pk]) for (kind, _), value in zip(sources, values)]
+    on_commit(changes, using)
+
+
+def booked_field(through):
+    """The Booking many-to-many field whose through model is ``through``"""
+    for name in BOOKED:
+        if Booking._meta.get_field(name).remote_field.through is through:
+            return name
@@ -0,0 +1,84 @@
+"""
+Availability push for match tickets: clients subscribe to tickets over a
+WebSocket and receive ``available_tickets`` as it changes, instead of
+re-polling ``GET /api/match-tickets/``.
+
+Writers publish ``(ticket id, available, changed at)`` rows on commit to the
+broadcaster channel with ``publish_availability``. The MatchTicket
+``post_save`` receiver below does this, and so does the sold-out admin
+action. The broadcaster process (``manage.py runworker
+availability-broadcaster``) keeps the latest value per ticket. Every
+``interval`` seconds it sends the changed tickets in one message to the
+fan-out group. Each ticket therefore gets at most ``1 / interval`` deltas a
+second, however fast it sells. Every server process has one hub in that
+group, and the hub writes each delta to the local sockets subscribed to the
+ticket. A flush therefore costs one channel-layer message per server process,
+not one per subscriber. The consumers and the hub are in
+``core/consumers.py``.
+
+The push needs a channel layer shared by every process, such as
+channels_redis. With the default ``InMemoryChannelLayer`` each process has
+its own queue that no broadcaster reads, so publishing is skipped unless
+``enabled`` is set.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'interval': 0.5,  # seconds between broadcasts; at most 1/interval deltas per ticket a second
+    'max_subscriptions': 50,  # tickets one socket may watch
+    'group_refresh': 3600,  # seconds between re-joins of the fan-out group, which memberships expire from
+    'enabled': None,  # None: only when the channel layer is shared between processes
+}
+
+BROADCASTER_CHANNEL = 'availability-broadcaster'
+FANOUT_GROUP = 'availability'
+
+
+def push_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'AVAILABILITY_PUSH', {}))
+    return config
+
+
+def push_enabled(layer):
+    enabled = push_settings()['enabled']
+    if enabled is None:
+        from channels.layers import InMemoryChannelLayer
+
+        return layer is not None and not isinstance(layer, InMemoryChannelLayer)
+    return bool(enabled) and layer is not None
+
+
+def publish_availability(rows):
+    """Send ``(ticket id, available, changed at timestamp)`` rows to the broadcaster"""
+    from channels.exceptions import ChannelFull
+    from channels.layers import get_channel_layer
+
+    layer = get_channel_layer()
+    rows = [[pk, available, changed_at] for pk, available, changed_at in rows]
+    if not rows or not push_enabled(layer):
+        return
+    try:
+        async_to_sync(layer.send)(BROADCASTER_CHANNEL, {'type': 'availability.changed', 'tickets': rows})
+    except ChannelFull:
+        # The broadcaster is behind; the next change of these tickets carries the latest value
+        logger.warning(f"Availability broadcaster channel is full; dropped {len(rows)} changes")
+
+
+def ticket_rows(queryset):
+    return [(pk, available, updated_at.timestamp())
+            for pk, available, updated_at in queryset.values_list('pk', 'available_tickets', 'updated_at')]
+
+
+def ticket_availability_saved(sender, instance, raw=False, **kwargs):
+    """post_save receiver for MatchTicket, published on commit"""
+    if raw:
+        return
+    row = (instance.pk, instance.available_tickets, instance.updated_at.timestamp())
+    transaction.on_commit(lambda: publish_availability([row]))
@@ -0,0 +1,92 @@
+"""
+Process-wide values that take seconds to build (the autocomplete tries, the
+flight schedule, the chatbot's catalog index), built off the request path.
+
+A ``BackgroundBuild`` builds its value in a daemon thread and swaps it in
+when done. Readers keep getting the previous value, or None before the first
+build, so they never wait. ``fanzone_backend/wsgi.py`` and ``asgi.py`` call
+``start_builds()`` when a server process loads: it imports the modules apps
+list in ``BUILD_MODULES`` and starts every build. Tests and management
+commands call ``refresh()`` to build in the calling thread.
+"""
+import logging
+import threading
+import time
+from importlib import import_module
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+RETRY_SECONDS = 30  # wait after a failed build before trying again
+
+BUILDS = []
+
+# Modules defining builds, imported by start_builds(); apps add theirs in ready()
+BUILD_MODULES = []
+
+
+class BackgroundBuild:
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+        self.value = None
+        self.built_at = 0.0
+        self.failed_at = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.generation = 0  # bumped by reset() so that a build already running is discarded
+        BUILDS.append(self)
+
+    def get(self, max_age):
+        """The current value, or None before the first build; starts a rebuild if missing or older than ``max_age`` seconds"""
+        if self.value is None or time.monotonic() - self.built_at > max_age:
+            self.start()
+        return self.value
+
+    def start(self):
+        """Start building in a background thread, unless a build is running or has just failed"""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            if self.failed_at is not None and time.monotonic() - self.failed_at < RETRY_SECONDS:
+                return
+            self.thread = threading.Thread(target=self._run, args=(self.generation,), name=f'build-{self.name}',
+                                           daemon=True)
+            self.thread.start()
+
+    def _run(self, generation):
+        try:
+            self.refresh(generation)
+        except Exception:
+            self.failed_at = time.monotonic()
+            logger.exception(f"Building the {self.name} failed")
+        finally:
+            connections.close_all()
+
+    def refresh(self, generation=None):
+        """Build in the calling thread and swap the result in; returns it"""
+        started = time.perf_counter()
+        value = self.build()
+        with self.lock:
+            current = generation is None or generation == self.generation
+            if current:
+                self.value, self.built_at, self.failed_at = value, time.monotonic(), None
+        if current:
+            logger.info(f"Built the {self.name} in {time.perf_counter() - started:.1f}s")
+        return value
+
+    def reset(self):
+        with self.lock:
+            self.value = None
+            self.built_at = 0.0
+            self.failed_at = None
+            self.generation += 1
+
+
+def start_builds():
+    """Start every registered build in the background, e.g. when a server process loads"""
+    for path in BUILD_MODULES:
+        import_module(path)
+    for build in BUILDS:
+        build.start()
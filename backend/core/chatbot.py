@@ -1,9 +1,11 @@
+from .db_router import replica_reads
 from .models import Package, Flight, Hotel, MatchTicket, Activity
 
 class Chatbot:
     def __init__(self):
         self.conversation_history = []
 
+    @replica_reads
     def process_message(self, message, user=None):
         message = message.lower()
         
@@ -0,0 +1,285 @@
+"""
+Negotiated response compression (brotli, zstd, gzip) and precompressed
+catalog responses.
+
+``CompressionMiddleware`` compresses JSON and CSV responses above
+``min_size`` bytes with the best encoding both sides support, and streaming
+responses (exports) chunk by chunk. HTML is left alone by default: pages
+carry CSRF tokens, which compression would expose to BREACH-style attacks.
+brotli and zstd are used when the ``brotli`` and ``zstandard`` packages are
+installed; gzip is always available.
+
+``CatalogResponseCacheMixin`` caches the rendered JSON of catalog list and
+detail responses together with one compressed body per encoding, each
+compressed once at a higher level, so hot responses are served without
+querying, rendering or compressing. Every catalog write bumps a version in
+the cache that is part of every key. With the default per-process
+local-memory cache other workers see the change only when their entries
+expire; configure a shared cache in CACHES to invalidate everywhere at once.
+"""
+import csv
+import gzip
+import io
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.decorators import action
+
+from .metrics import record_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULTS = {
+    'enabled': True,
+    'min_size': 1024,  # bytes; smaller bodies are sent as is
+    'encodings': ('br', 'zstd', 'gzip'),  # server preference among those the client accepts
+    'levels': {'br': 4, 'zstd': 3, 'gzip': 6},  # per-request compression
+    'cache_levels': {'br': 9, 'zstd': 12, 'gzip': 9},  # compressed once per cached response
+    'content_types': ('application/json', 'text/csv', 'application/x-ndjson'),
+    'cache': 'default',
+    'cache_timeout': 60,  # seconds catalog responses are cached; 0 disables the cache
+}
+
+CATALOG_VERSION_KEY = 'catalog_response_version'
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def compression_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'RESPONSE_COMPRESSION', {}))
+    return config
+
+
+def available_encodings(preference):
+    installed = {'gzip': True, 'br': brotli is not None, 'zstd': zstandard is not None}
+    return [encoding for encoding in preference if installed.get(encoding)]
+
+
+def negotiate(accept_encoding, supported):
+    """The first of ``supported`` the Accept-Encoding header allows with a non-zero q, or None"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class StreamCompressor:
+    """Incremental compressor that flushes after every chunk so clients receive data as it is produced"""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self._compressor.process(chunk) + self._compressor.flush()
+        if self.encoding == 'zstd':
+            return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_stream(chunks, encoding, level):
+    compressor = StreamCompressor(encoding, level)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk if isinstance(chunk, bytes) else bytes(chunk))
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding, level):
+    compressor = StreamCompressor(encoding, level)
+    async for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk if isinstance(chunk, bytes) else bytes(chunk))
+    yield compressor.finish()
+
+
+class CompressedVariants:
+    """A cached response body plus its compressed forms, each compressed on first request"""
+
+    def __init__(self, key, entry, cache, timeout, levels):
+        self.key = key
+        self.entry = entry
+        self.cache = cache
+        self.timeout = timeout
+        self.levels = levels
+
+    def get(self, encoding):
+        body = self.entry['bodies'].get(encoding)
+        if body is None:
+            body = compress(self.entry['bodies']['identity'], encoding, self.levels[encoding])
+            self.entry['bodies'][encoding] = body
+            self.cache.set(self.key, self.entry, self.timeout)
+        return body
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = compression_settings()
+        self.encodings = available_encodings(self.config['encodings'])
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.config['enabled'] or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in self.config['content_types']:
+            return response
+        if not response.streaming and len(response.content) < self.config['min_size']:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.encodings)
+        if encoding is None:
+            return response
+
+        level = self.config['levels'][encoding]
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding, level)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding, level)
+            del response.headers['Content-Length']
+        else:
+            variants = getattr(response, 'compressed_variants', None)
+            body = variants.get(encoding) if variants is not None else compress(response.content, encoding, level)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response.headers['Content-Length'] = str(len(body))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def catalog_version(cache=None):
+    """Current catalog version; bumped by every catalog write"""
+    cache = cache or caches[compression_settings()['cache']]
+    return cache.get(CATALOG_VERSION_KEY, 0)
+
+
+def bump_catalog_version(sender=None, **kwargs):
+    """post_save/post_delete/m2m_changed receiver for catalog models: invalidate every cached catalog response"""
+    if kwargs.get('action', 'post').startswith('pre'):
+        return
+    cache = caches[compression_settings()['cache']]
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 1, None)
+
+
+class CatalogResponseCacheMixin:
+    """Serve catalog list and detail JSON from a cache that also holds the compressed bodies"""
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        config = compression_settings()
+        if not config['cache_timeout'] or request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+
+        cache = caches[config['cache']]
+        key = f"catalog_response:{catalog_version(cache)}:{request.accepted_media_type}:{request.get_full_path()}"
+        entry = cache.get(key)
+        record_cache('catalog_response', entry is not None)
+        if entry is not None:
+            response = HttpResponse(entry['bodies']['identity'], content_type=entry['content_type'])
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = {'bodies': {}}
+
+            def store(rendered):
+                # dispatch() finalizes the response and Django renders it before the middleware runs
+                entry['content_type'] = rendered['Content-Type']
+                entry['bodies']['identity'] = rendered.content
+                cache.set(key, entry, config['cache_timeout'])
+
+            response.add_post_render_callback(store)
+        response.compressed_variants = CompressedVariants(key, entry, cache, config['cache_timeout'], config['cache_levels'])
+        return response
+
+
+class EchoBuffer:
+    def write(self, value):
+        return value
+
+
+class CatalogExportMixin:
+    """``export/`` streams the whole catalog table as CSV"""
+    export_fields = None
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = self.export_fields or [field.attname for field in queryset.model._meta.concrete_fields]
+        name = queryset.model._meta.model_name
+        response = StreamingHttpResponse(self.export_rows(queryset, fields), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{name}s.csv"'
+        return response
+
+    @staticmethod
+    def export_rows(queryset, fields):
+        writer = csv.writer(EchoBuffer())
+        buffer = io.StringIO()
+        buffer.write(writer.writerow(fields))
+        for row in queryset.values_list(*fields).iterator(chunk_size=2000):
+            buffer.write(writer.writerow(row))
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue().encode()
+                buffer = io.StringIO()
+        yield buffer.getvalue().encode()
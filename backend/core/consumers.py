@@ -0,0 +1,185 @@
+"""
+WebSocket consumer, per-process hub and broadcaster for the match ticket
+availability push described in ``core/availability.py``.
+
+A client connects to ``/ws/availability/`` and sends
+``{"action": "subscribe", "tickets": [12, 13]}``. It first gets the current
+values, then the changes:
+    {"type": "snapshot", "tickets": {"12": 340, "13": 0}}
+    {"type": "delta", "tickets": {"12": 338}}
+``{"action": "unsubscribe", ...}`` stops them.
+"""
+import asyncio
+import json
+import time
+import weakref
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.consumer import AsyncConsumer
+from channels.layers import get_channel_layer
+from django.urls import path
+
+from .availability import FANOUT_GROUP, push_settings
+from .models import MatchTicket
+
+
+class AvailabilityHub:
+    """The process's member of the fan-out group; writes each delta to the local subscribers of its ticket"""
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.subscribers = {}  # ticket id -> set of consumers
+        self.channel = None
+        self.task = None
+        self.joined_at = 0
+        self.starting = asyncio.Lock()
+
+    async def start(self):
+        async with self.starting:
+            if self.task is None:
+                self.channel = await self.layer.new_channel('availability-hub.')
+                await self.join()
+                self.task = asyncio.ensure_future(self.listen())
+
+    async def join(self):
+        await self.layer.group_add(FANOUT_GROUP, self.channel)
+        self.joined_at = time.monotonic()
+
+    async def listen(self):
+        refresh = push_settings()['group_refresh']
+        while True:
+            # Wake up to re-join even when no delta arrives, before the membership expires
+            try:
+                message = await asyncio.wait_for(self.layer.receive(self.channel),
+                                                 max(self.joined_at + refresh - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                message = None
+            if message is not None:
+                await self.dispatch(message['tickets'])
+            if time.monotonic() - self.joined_at >= refresh:
+                await self.join()
+
+    async def dispatch(self, tickets):
+        """Write ``{ticket id: available}`` to the subscribers of each ticket; returns the frames sent"""
+        sent = 0
+        for pk, available in tickets.items():
+            consumers = self.subscribers.get(int(pk))
+            if not consumers:
+                continue
+            # One encoding per ticket, shared by every subscriber
+            frame = json.dumps({'type': 'delta', 'tickets': {pk: available}})
+            for consumer in list(consumers):
+                await consumer.send(text_data=frame)
+            sent += len(consumers)
+        return sent
+
+    async def subscribe(self, consumer, tickets):
+        if self.task is None:
+            await self.start()
+        for pk in tickets:
+            self.subscribers.setdefault(pk, set()).add(consumer)
+
+    def unsubscribe(self, consumer, tickets):
+        for pk in tickets:
+            consumers = self.subscribers.get(pk)
+            if consumers is not None:
+                consumers.discard(consumer)
+                if not consumers:
+                    del self.subscribers[pk]
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await self.layer.group_discard(FANOUT_GROUP, self.channel)
+            self.task = None
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """The hub of the running event loop, one per server process"""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = AvailabilityHub(get_channel_layer())
+    return hub
+
+
+@database_sync_to_async
+def current_availability(tickets):
+    return {str(pk): available for pk, available in
+            MatchTicket.objects.filter(pk__in=tickets).values_list('pk', 'available_tickets')}
+
+
+class AvailabilityConsumer(AsyncJsonWebsocketConsumer):
+    """WebSocket that streams ``available_tickets`` of the match tickets the client subscribes to"""
+
+    async def connect(self):
+        self.tickets = set()
+        await self.accept()
+
+    async def disconnect(self, code):
+        get_hub().unsubscribe(self, self.tickets)
+        self.tickets = set()
+
+    async def receive_json(self, content):
+        tickets = content.get('tickets') if isinstance(content, dict) else None
+        action = content.get('action') if isinstance(content, dict) else None
+        if action not in ('subscribe', 'unsubscribe') or not isinstance(tickets, list) \
+                or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in tickets):
+            await self.send_json({'type': 'error', 'detail': 'Send {"action": "subscribe" or "unsubscribe", "tickets": [ids]}.'})
+            return
+        hub = get_hub()
+        if action == 'unsubscribe':
+            hub.unsubscribe(self, tickets)
+            self.tickets.difference_update(tickets)
+            return
+        new = set(tickets) - self.tickets
+        limit = push_settings()['max_subscriptions']
+        if len(self.tickets) + len(new) > limit:
+            await self.send_json({'type': 'error', 'detail': f'At most {limit} tickets per connection.'})
+            return
+        # Subscribe before reading, so no change between the two is missed
+        await hub.subscribe(self, new)
+        self.tickets |= new
+        await self.send_json({'type': 'snapshot', 'tickets': await current_availability(new)})
+
+
+class AvailabilityBroadcaster(AsyncConsumer):
+    """Coalesces availability changes and sends them to the fan-out group every ``interval`` seconds"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending = {}  # ticket id -> available, changed since the last broadcast
+        self.latest = {}  # ticket id -> changed-at of the newest value seen
+        self.flush = None
+
+    async def availability_changed(self, message):
+        for pk, available, changed_at in message['tickets']:
+            # Writers commit out of order; an older value must not overwrite a newer one
+            if changed_at < self.latest.get(pk, 0):
+                continue
+            self.latest[pk] = changed_at
+            self.pending[pk] = available
+        if self.pending and self.flush is None:
+            self.flush = asyncio.ensure_future(self.broadcast_after(push_settings()['interval']))
+
+    async def broadcast_after(self, delay):
+        await asyncio.sleep(delay)
+        await self.broadcast()
+
+    async def broadcast(self):
+        pending, self.pending, self.flush = self.pending, {}, None
+        if pending:
+            await self.channel_layer.group_send(FANOUT_GROUP, {
+                'type': 'availability.delta',
+                'tickets': {str(pk): available for pk, available in pending.items()},
+            })
+        return len(pending)
+
+
+websocket_urlpatterns = [
+    path('ws/availability/', AvailabilityConsumer.as_asgi(), name='availability'),
+]
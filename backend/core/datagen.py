@@ -0,0 +1,404 @@
+"""
+Deterministic synthetic data at production volume.
+
+``generate(scale, seed)`` fills the catalog, bookings, packages, the chatbot
+tables and conversation history with ``bulk_create`` in fixed-size chunks.
+Every table draws from its own generator seeded with ``(seed, table)``, so the
+same seed always produces the same rows and run time grows linearly with
+``scale``. Used by ``python manage.py generate_fixtures``.
+"""
+import random
+import time
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from chatbot import models as chatbot_models
+from .compression import bump_catalog_version
+from .models import Activity, ActivityType, Booking, Flight, Hotel, MatchTicket, MatchType, Package
+from .price_calendar import rebuild_calendar
+
+# Rows per unit of scale; scale=100 gives a million flights.
+VOLUMES = {
+    'flights': 10000,
+    'hotels_per_city': 50,
+    'activities_per_city': 50,
+    'users': 100,
+    'bookings': 500,
+    'packages': 20,
+    'conversations': 1000,
+}
+
+HOST_CITIES = ['Casablanca', 'Rabat', 'Marrakech', 'Tangier', 'Agadir', 'Fez']
+WORLD_CUP_CITIES = HOST_CITIES + ['Madrid', 'Barcelona', 'Seville', 'Bilbao', 'Lisbon', 'Porto']
+ORIGIN_CITIES = ['Paris', 'London', 'Brussels', 'Amsterdam', 'Frankfurt', 'Rome', 'Milan', 'Dakar', 'Abidjan',
+                 'Lagos', 'Cairo', 'Algiers', 'Tunis', 'Dubai', 'Doha', 'Istanbul', 'New York', 'Montreal']
+CITIES = WORLD_CUP_CITIES + ORIGIN_CITIES
+STADIUMS = {
+    'Casablanca': 'Stade Mohammed V', 'Rabat': 'Prince Moulay Abdellah', 'Marrakech': 'Grand Stade de Marrakech',
+    'Tangier': 'Ibn Battuta', 'Agadir': 'Adrar', 'Fez': 'Complexe Sportif de Fès', 'Madrid': 'Santiago Bernabeu',
+    'Barcelona': 'Camp Nou', 'Seville': 'La Cartuja', 'Bilbao': 'San Mames', 'Lisbon': 'Estadio da Luz',
+    'Porto': 'Estadio do Dragao',
+}
+AIRLINES = [('Royal Air Maroc', 'AT'), ('Air Arabia Maroc', '3O'), ('Ryanair', 'FR'), ('easyJet', 'U2'),
+            ('Air France', 'AF'), ('Iberia', 'IB'), ('TAP Air Portugal', 'TP'), ('Emirates', 'EK'), ('Qatar Airways', 'QR')]
+CAN_TEAMS = ['Morocco', 'Senegal', 'Egypt', 'Nigeria', 'Algeria', 'Tunisia', "Cote d'Ivoire", 'Cameroon', 'Ghana', 'Mali',
+             'Burkina Faso', 'South Africa', 'DR Congo', 'Guinea', 'Gabon', 'Zambia', 'Angola', 'Cape Verde', 'Uganda',
+             'Equatorial Guinea', 'Mozambique', 'Comoros', 'Benin', 'Sudan']
+WORLD_CUP_TEAMS = ['Morocco', 'Spain', 'Portugal', 'Argentina', 'Brazil', 'France', 'England', 'Germany', 'Netherlands',
+                   'Belgium', 'Croatia', 'Italy', 'Uruguay', 'Colombia', 'Mexico', 'USA', 'Canada', 'Japan', 'Korea Republic',
+                   'Australia', 'Senegal', 'Egypt', 'Nigeria', 'Algeria', 'Tunisia', "Cote d'Ivoire", 'Cameroon', 'Ghana',
+                   'Saudi Arabia', 'Iran', 'Qatar', 'Ecuador', 'Switzerland', 'Denmark', 'Poland', 'Serbia', 'Austria',
+                   'Ukraine', 'Sweden', 'Norway', 'Turkey', 'Paraguay', 'Chile', 'Peru', 'Costa Rica', 'Panama',
+                   'Jamaica', 'New Zealand']
+TICKET_CATEGORIES = [('Category 1', Decimal('3.0')), ('Category 2', Decimal('1.8')), ('Category 3', Decimal('1.0'))]
+HOTEL_WORDS = ['Riad', 'Palace', 'Suites', 'Kasbah', 'Grand Hotel', 'Residence', 'Boutique Hotel', 'Resort', 'Inn', 'Dar']
+ACTIVITY_WORDS = ['Medina Walk', 'Food Tour', 'Hammam', 'Fan Zone', 'Museum Pass', 'Desert Trip', 'Cooking Class',
+                  'Surf Lesson', 'Souk Tour', 'Concert', 'Football Clinic', 'Sunset Cruise']
+
+CAN_START = datetime(2025, 12, 21, tzinfo=dt_timezone.utc)
+WORLD_CUP_START = datetime(2030, 6, 13, tzinfo=dt_timezone.utc)
+CONVERSATIONS_START = CAN_START - timedelta(days=120)
+TRAVEL_WINDOWS = [(CAN_START - timedelta(days=10), 45), (WORLD_CUP_START - timedelta(days=10), 55)]
+
+TABLES = ['users', 'match_tickets', 'flights', 'hotels', 'activities', 'packages', 'bookings',
+          'chatbot', 'conversations']
+
+
+def table_random(seed, table):
+    return random.Random(f"{seed}:{table}")
+
+
+def money(value):
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+def travel_datetime(rng):
+    start, days = rng.choice(TRAVEL_WINDOWS)
+    return start + timedelta(minutes=rng.randrange(days * 24 * 60 // 5) * 5)
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Generator:
+    """Writes one synthetic dataset; ``ids`` keeps the primary keys later tables link to"""
+
+    def __init__(self, scale=1, seed=0, chunk_size=5000, log=None):
+        self.scale = scale
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+        self.ids = {}
+        self.counts = {}
+
+    def volume(self, name):
+        return max(1, round(VOLUMES[name] * self.scale))
+
+    def insert(self, table, model, objects):
+        """bulk_create ``objects`` chunk by chunk and remember their primary keys"""
+        started = time.perf_counter()
+        ids = self.ids.setdefault(table, array('q'))
+        count = 0
+        for chunk in chunked(objects, self.chunk_size):
+            with transaction.atomic():
+                created = model.objects.bulk_create(chunk)
+            ids.extend(obj.pk for obj in created)
+            count += len(chunk)
+        # bulk_create sends no post_save, so cached catalog responses are invalidated here
+        bump_catalog_version()
+        self.counts[table] = self.counts.get(table, 0) + count
+        self.log(f"{table}: {count} rows in {time.perf_counter() - started:.1f}s")
+
+    def link(self, table, through, rows):
+        """bulk_create M2M rows given as dicts of field values"""
+        started = time.perf_counter()
+        count = 0
+        for chunk in chunked((through(**row) for row in rows), self.chunk_size):
+            with transaction.atomic():
+                through.objects.bulk_create(chunk)
+            count += len(chunk)
+        bump_catalog_version()
+        self.counts[table] = self.counts.get(table, 0) + count
+        self.log(f"{table}: {count} links in {time.perf_counter() - started:.1f}s")
+
+    def sample(self, rng, table, k):
+        ids = self.ids[table]
+        return {ids[rng.randrange(len(ids))] for _ in range(k)}
+
+    def run(self):
+        for table in TABLES:
+            getattr(self, f'generate_{table}')()
+        return self.counts
+
+    def generate_users(self):
+        password = make_password(None)
+        self.insert('users', get_user_model(), (
+            get_user_model()(
+                username=f"fan_{self.seed}_{i}",
+                email=f"fan_{self.seed}_{i}@example.com",
+                password=password,
+            )
+            for i in range(self.volume('users'))
+        ))
+
+    def schedule(self):
+        """(match type, stage, home, away, kickoff, host city) for both tournaments"""
+        rng = table_random(self.seed, 'schedule')
+        matches = []
+        for number in range(52):
+            stage = MatchType.GROUP_STAGE if number < 36 else MatchType.ROUND_OF_16 if number < 44 else \
+                MatchType.QUARTER_FINALS if number < 48 else MatchType.SEMI_FINALS if number < 50 else MatchType.FINAL
+            home, away = rng.sample(CAN_TEAMS, 2)
+            kickoff = CAN_START + timedelta(days=number * 28 // 52, hours=rng.choice([14, 17, 20]))
+            city = 'Rabat' if stage == MatchType.FINAL else rng.choice(HOST_CITIES)
+            matches.append((MatchType.CAN, stage, home, away, kickoff, city))
+        for number in range(104):
+            stage = MatchType.GROUP_STAGE if number < 72 else MatchType.ROUND_OF_16 if number < 96 else \
+                MatchType.QUARTER_FINALS if number < 100 else MatchType.SEMI_FINALS if number < 102 else MatchType.FINAL
+            home, away = rng.sample(WORLD_CUP_TEAMS, 2)
+            kickoff = WORLD_CUP_START + timedelta(days=number * 38 // 104, hours=rng.choice([13, 16, 19, 22]))
+            city = 'Casablanca' if stage == MatchType.FINAL else rng.choice(WORLD_CUP_CITIES)
+            matches.append((MatchType.WORLD_CUP, stage, home, away, kickoff, city))
+        return matches
+
+    def generate_match_tickets(self):
+        rng = table_random(self.seed, 'match_tickets')
+
+        def tickets():
+            for tournament, stage, home, away, kickoff, city in self.schedule():
+                base = {MatchType.FINAL: 400, MatchType.SEMI_FINALS: 250}.get(stage, 90 if tournament == MatchType.CAN else 150)
+                for category, factor in TICKET_CATEGORIES:
+                    yield MatchTicket(
+                        match_name=f"{home} vs {away} - {category}",
+                        match_date=kickoff,
+                        stadium=f"{STADIUMS[city]} - {city}",
+                        match_type=stage if stage != MatchType.GROUP_STAGE else tournament,
+                        price=money(base * factor),
+                        available_tickets=rng.randint(0, 20000),
+                    )
+
+        self.insert('match_tickets', MatchTicket, tickets())
+
+    def generate_flights(self):
+        rng = table_random(self.seed, 'flights')
+        # Most traffic flies into the host cities; popular routes are weighted up.
+        destinations = WORLD_CUP_CITIES
+        destination_weights = [4 if city in HOST_CITIES else 1 for city in destinations]
+
+        def flights():
+            for i in range(self.volume('flights')):
+                arrival = rng.choices(destinations, destination_weights)[0]
+                departure = rng.choice([city for city in CITIES if city != arrival] if i % 8 else ORIGIN_CITIES)
+                airline, code = rng.choice(AIRLINES)
+                departs = travel_datetime(rng)
+                duration = timedelta(minutes=rng.randint(50, 480))
+                yield Flight(
+                    flight_number=f"{code}{rng.randint(100, 9999)}",
+                    airline=airline,
+                    departure_city=departure,
+                    arrival_city=arrival,
+                    departure_time=departs,
+                    arrival_time=departs + duration,
+                    price=money(40 + duration.total_seconds() / 60 * rng.uniform(0.4, 1.6)),
+                    available_seats=rng.randint(0, 220),
+                )
+
+        self.insert('flights', Flight, flights())
+        # bulk_create skips the receivers that maintain the price calendar
+        started = time.perf_counter()
+        days = rebuild_calendar()
+        self.log(f"price calendar: {days} route days in {time.perf_counter() - started:.1f}s")
+
+    def generate_hotels(self):
+        rng = table_random(self.seed, 'hotels')
+
+        def hotels():
+            for city in WORLD_CUP_CITIES:
+                for i in range(self.volume('hotels_per_city')):
+                    rating = rng.choices([1, 2, 3, 4, 5], [1, 3, 6, 5, 2])[0]
+                    name = f"{rng.choice(HOTEL_WORDS)} {city} {i + 1}"
+                    yield Hotel(
+                        name=name,
+                        city=city,
+                        address=f"{rng.randint(1, 250)} Avenue {rng.choice(CAN_TEAMS)}, {city}",
+                        description=f"{name} is a {rating}-star stay in {city}",
+                        price_per_night=money(rating * rng.uniform(25, 70)),
+                        available_rooms=rng.randint(0, 120),
+                        rating=rating,
+                    )
+
+        self.insert('hotels', Hotel, hotels())
+
+    def generate_activities(self):
+        rng = table_random(self.seed, 'activities')
+        types = [choice for choice, _ in ActivityType.choices]
+
+        def activities():
+            for city in WORLD_CUP_CITIES:
+                for i in range(self.volume('activities_per_city')):
+                    name = f"{city} {rng.choice(ACTIVITY_WORDS)} {i + 1}"
+                    yield Activity(
+                        name=name,
+                        description=f"{name} for visiting fans",
+                        city=city,
+                        activity_date=travel_datetime(rng),
+                        activity_type=rng.choice(types),
+                        price=money(rng.uniform(5, 150)),
+                        available_spots=rng.randint(0, 60),
+                    )
+
+        self.insert('activities', Activity, activities())
+
+    def generate_packages(self):
+        rng = table_random(self.seed, 'packages')
+        count = self.volume('packages')
+        self.insert('packages', Package, (
+            Package(
+                name=f"Fan Package {i + 1}",
+                description=f"Flights, hotel, match and activities bundle {i + 1}",
+                price=money(rng.uniform(600, 4000)),
+                discount=money(rng.choice([0, 5, 10, 15, 20])),
+            )
+            for i in range(count)
+        ))
+        for field in ['flights', 'hotels', 'match_tickets', 'activities']:
+            m2m = Package._meta.get_field(field)
+            self.link(f"package_{field}", m2m.remote_field.through, (
+                {m2m.m2m_column_name(): package_id, m2m.m2m_reverse_name(): target}
+                for package_id in self.ids['packages']
+                for target in self.sample(rng, field, rng.randint(1, 3))
+            ))
+
+    def generate_bookings(self):
+        rng = table_random(self.seed, 'bookings')
+        statuses = ['pending', 'confirmed', 'cancelled']
+        users = self.ids['users']
+        self.insert('bookings', Booking, (
+            Booking(
+                user_id=users[rng.randrange(len(users))],
+                status=rng.choices(statuses, [2, 7, 1])[0],
+                total_price=money(rng.uniform(80, 5000)),
+            )
+            for _ in range(self.volume('bookings'))
+        ))
+        for field, table, chance in [('flight', 'flights', 0.9), ('hotel', 'hotels', 0.7),
+                                     ('match_ticket', 'match_tickets', 0.8), ('activity', 'activities', 0.4)]:
+            m2m = Booking._meta.get_field(field)
+            self.link(f"booking_{field}", m2m.remote_field.through, (
+                {m2m.m2m_column_name(): booking_id, m2m.m2m_reverse_name(): target}
+                for booking_id in self.ids['bookings'] if rng.random() < chance
+                for target in self.sample(rng, table, rng.randint(1, 2))
+            ))
+
+    def generate_chatbot(self):
+        rng = table_random(self.seed, 'chatbot')
+        per_city = max(1, self.volume('hotels_per_city') // 10)
+        self.insert('chatbot_hotels', chatbot_models.Hotel, (
+            chatbot_models.Hotel(
+                name=f"{rng.choice(HOTEL_WORDS)} {city} Chat {i + 1}",
+                location=city,
+                rating=rng.randint(2, 5),
+                price_per_night=money(rng.uniform(50, 350)),
+                description=f"Suggested stay in {city}",
+                is_ai_suggested=rng.random() < 0.3,
+            )
+            for city in WORLD_CUP_CITIES for i in range(per_city)
+        ))
+        self.insert('chatbot_flights', chatbot_models.Flight, (
+            chatbot_models.Flight(
+                departure_city=rng.choice(ORIGIN_CITIES),
+                arrival_city=city,
+                airline=rng.choice(AIRLINES)[0],
+                departure_time=(departs := travel_datetime(rng)),
+                arrival_time=departs + timedelta(minutes=rng.randint(60, 420)),
+                price=money(rng.uniform(60, 900)),
+                is_ai_suggested=rng.random() < 0.3,
+            )
+            for city in WORLD_CUP_CITIES for _ in range(per_city)
+        ))
+        self.insert('chatbot_activities', chatbot_models.Activity, (
+            chatbot_models.Activity(
+                name=f"{city} {rng.choice(ACTIVITY_WORDS)}",
+                location=city,
+                duration=timedelta(minutes=rng.choice([60, 90, 120, 180, 240])),
+                price=money(rng.uniform(10, 120)),
+                description=f"Popular with fans in {city}",
+                is_ai_suggested=rng.random() < 0.3,
+            )
+            for city in WORLD_CUP_CITIES for _ in range(per_city)
+        ))
+        self.insert('chatbot_matches', chatbot_models.Match, (
+            chatbot_models.Match(
+                home_team=home,
+                away_team=away,
+                date=kickoff,
+                venue=f"{STADIUMS[city]} - {city}",
+                ticket_price=money(rng.uniform(60, 500)),
+            )
+            for _, _, home, away, kickoff, city in self.schedule()
+        ))
+
+        def packages():
+            for i in range(self.volume('packages')):
+                total = money(rng.uniform(500, 3500))
+                discount = money(rng.choice([0, 5, 10, 15]))
+                yield chatbot_models.Package(
+                    name=f"Chat Package {i + 1}",
+                    hotel_id=rng.choice(self.ids['chatbot_hotels']),
+                    flight_id=rng.choice(self.ids['chatbot_flights']),
+                    match_id=rng.choice(self.ids['chatbot_matches']),
+                    total_price=total,
+                    discount_percentage=discount,
+                    final_price=money(total * (1 - discount / 100)),
+                    is_ai_suggested=True,
+                    status=rng.choice(['suggested', 'approved', 'active', 'inactive']),
+                )
+
+        self.insert('chatbot_packages', chatbot_models.Package, packages())
+        through = chatbot_models.Package.activities.through
+        self.link('chatbot_package_activities', through, (
+            {'package_id': package_id, 'activity_id': activity_id}
+            for package_id in self.ids['chatbot_packages']
+            for activity_id in self.sample(rng, 'chatbot_activities', rng.randint(1, 3))
+        ))
+
+    def generate_conversations(self):
+        rng = table_random(self.seed, 'conversations')
+        questions = ["Show me hotels in {city}", "Any flights to {city} for the final?", "What can I do in {city}?",
+                     "Where is the match in {city}?", "Are there packages for {city}?"]
+        self.insert('conversations', chatbot_models.Conversation, (
+            chatbot_models.Conversation(
+                user_message=rng.choice(questions).format(city=(city := rng.choice(HOST_CITIES))),
+                bot_message=f"Here is what I found in {city}.",
+            )
+            for _ in range(self.volume('conversations'))
+        ))
+        # created_at is auto_now_add, so the spread timestamps are written after the insert,
+        # evenly from CONVERSATIONS_START to the World Cup with jitter and in primary key order
+        rng = table_random(self.seed, 'conversation_dates')
+        ids = self.ids['conversations']
+        step = (WORLD_CUP_START - CONVERSATIONS_START) / len(ids)
+        for start in range(0, len(ids), self.chunk_size):
+            with transaction.atomic():
+                chatbot_models.Conversation.objects.bulk_update([
+                    chatbot_models.Conversation(pk=pk, created_at=CONVERSATIONS_START + step * (start + i + rng.random()))
+                    for i, pk in enumerate(ids[start:start + self.chunk_size])
+                ], ['created_at'])
+
+
+def generate(scale=1, seed=0, chunk_size=5000, log=None):
+    """Generate a dataset and return the number of rows written per table"""
+    return Generator(scale=scale, seed=seed, chunk_size=chunk_size, log=log).run()
@@ -0,0 +1,85 @@
+"""
+Connection reuse and pool metrics for every configured database.
+
+Compares the connections Django creates per alias (the
+``fanzone_db_connections_opened_total`` counter of core/metrics.py; with a
+pool that is one per checkout) with the requests served, and reads psycopg 3
+pool statistics, including physical connections, wait time and utilization,
+when ``OPTIONS['pool']`` is set.
+"""
+import threading
+from collections import Counter
+
+from django.db import connections
+
+from .metrics import connections_opened
+
+_lock = threading.Lock()
+_opened_before = Counter()  # connections_opened() per alias at the last reset
+_requests = 0
+
+
+def count_request(sender, **kwargs):
+    """request_started receiver"""
+    global _requests
+    with _lock:
+        _requests += 1
+
+
+def reset_connection_counts():
+    global _requests
+    with _lock:
+        _opened_before.clear()
+        _opened_before.update({alias: connections_opened(alias) for alias in connections})
+        _requests = 0
+
+
+def pool_stats(pool):
+    """Wait time and utilization from a psycopg_pool ConnectionPool"""
+    stats = pool.get_stats()
+    in_use = stats.get('pool_size', 0) - stats.get('pool_available', 0)
+    requests = stats.get('requests_num', 0)
+    queued = stats.get('requests_queued', 0)
+    return {
+        'min_size': stats.get('pool_min'),
+        'max_size': stats.get('pool_max'),
+        'size': stats.get('pool_size', 0),
+        'available': stats.get('pool_available', 0),
+        'in_use': in_use,
+        'utilization': round(in_use / stats['pool_max'], 3) if stats.get('pool_max') else None,
+        'waiting': stats.get('requests_waiting', 0),
+        'requests': requests,
+        'requests_queued': queued,
+        'wait_ms_total': stats.get('requests_wait_ms', 0),
+        'wait_ms_avg': round(stats.get('requests_wait_ms', 0) / requests, 3) if requests else 0.0,
+        'wait_ms_avg_queued': round(stats.get('requests_wait_ms', 0) / queued, 3) if queued else 0.0,
+        'timeouts': stats.get('requests_errors', 0),
+        'connections_opened': stats.get('connections_num', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+    }
+
+
+def connection_metrics():
+    """Per-alias connection settings, reuse counts and pool statistics"""
+    with _lock:
+        opened_before, requests = dict(_opened_before), _requests
+    opened = {alias: connections_opened(alias) - opened_before.get(alias, 0) for alias in connections}
+    metrics = {}
+    for alias in connections:
+        connection = connections[alias]
+        settings_dict = connection.settings_dict
+        entry = {
+            'vendor': connection.vendor,
+            'conn_max_age': settings_dict['CONN_MAX_AGE'],
+            'health_checks': settings_dict['CONN_HEALTH_CHECKS'],
+            'connections_opened': opened.get(alias, 0),
+            'requests': requests,
+            'pool': None,
+        }
+        if requests:
+            entry['connections_per_request'] = round(opened.get(alias, 0) / requests, 3)
+        pool = getattr(connection, 'pool', None) if settings_dict.get('OPTIONS', {}).get('pool') else None
+        if pool is not None:
+            entry['pool'] = pool_stats(pool)
+        metrics[alias] = entry
+    return metrics
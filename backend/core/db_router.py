@@ -0,0 +1,221 @@
+"""
+Read-replica database routing.
+
+Catalog reads go to a replica only inside a replica-read scope (``use_replica``
+or the ``replica_reads`` decorator), which the catalog list/retrieve actions,
+the catalog template views and the chatbots open. Everything else, including
+every write and all booking reads, stays on the primary. After a client writes
+catalog rows it is pinned to the primary for ``REPLICA_STICKY_SECONDS`` so it
+reads its own writes (see ReplicaStickinessMiddleware).
+
+Replicas are listed in ``settings.DATABASE_REPLICAS`` ({alias: {'weight': n}});
+each alias must also be configured in ``DATABASES``.
+"""
+import contextvars
+import functools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+CATALOG_MODELS = frozenset({
+    'core.flight', 'core.hotel', 'core.matchticket', 'core.activity', 'core.package',
+    'chatbot.hotel', 'chatbot.flight', 'chatbot.activity', 'chatbot.match', 'chatbot.package',
+})
+
+_replica_scope = contextvars.ContextVar('replica_scope', default=False)
+_pinned = contextvars.ContextVar('pinned_to_primary', default=False)
+# Holds a per-request set of written catalog models; a mutable set so writes made
+# through the SQLite write lane (which runs in a copy of the context) are seen too.
+_catalog_writes = contextvars.ContextVar('catalog_writes', default=None)
+
+
+@contextmanager
+def use_replica():
+    """Allow catalog reads in this block to be served by a replica"""
+    token = _replica_scope.set(True)
+    try:
+        yield
+    finally:
+        _replica_scope.reset(token)
+
+
+def replica_reads(func):
+    """Decorator form of use_replica() for read-only views and helpers"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def pin_to_primary():
+    """Send the rest of this request's reads to the primary"""
+    _pinned.set(True)
+
+
+def user_pin_key(user_id):
+    return f"primary_pin:user:{user_id}"
+
+
+def is_user_pinned(user_id):
+    return bool(cache.get(user_pin_key(user_id)))
+
+
+def pin_user(user_id):
+    cache.set(user_pin_key(user_id), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
+
+
+class ReplicaPool:
+    """Weighted replica choice that skips replicas failing their health check"""
+
+    def __init__(self, replicas, check_interval=5.0, slow_check_ms=50.0, clock=time.monotonic, check=None):
+        self.check_interval = check_interval
+        self.slow_check_ms = slow_check_ms
+        self.clock = clock
+        self.check = check or self.ping
+        self._lock = threading.Lock()
+        self._state = {
+            alias: {'weight': config.get('weight', 1), 'healthy': True, 'latency_ms': 0.0, 'checked_at': None}
+            for alias, config in replicas.items()
+        }
+
+    @staticmethod
+    def ping(alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def _refresh(self, alias, state):
+        now = self.clock()
+        if not self.check_interval or (state['checked_at'] is not None and now - state['checked_at'] < self.check_interval):
+            return
+        state['checked_at'] = now
+        started = time.perf_counter()
+        try:
+            self.check(alias)
+        except Exception as e:
+            if state['healthy']:
+                logger.warning(f"Replica {alias} failed its health check: {str(e)}")
+            state['healthy'] = False
+            return
+        state['healthy'] = True
+        state['latency_ms'] = (time.perf_counter() - started) * 1000
+
+    def effective_weight(self, alias):
+        state = self._state[alias]
+        if not state['healthy']:
+            return 0.0
+        # Replicas that answer health checks slowly get proportionally less traffic.
+        return state['weight'] * min(1.0, self.slow_check_ms / max(state['latency_ms'], 1e-3))
+
+    def mark_down(self, alias):
+        with self._lock:
+            self._state[alias]['healthy'] = False
+            self._state[alias]['checked_at'] = self.clock()
+
+    def choose(self):
+        with self._lock:
+            for alias, state in self._state.items():
+                self._refresh(alias, state)
+            weights = {alias: self.effective_weight(alias) for alias in self._state}
+        candidates = [alias for alias, weight in weights.items() if weight > 0]
+        if not candidates:
+            return None
+        return random.choices(candidates, weights=[weights[alias] for alias in candidates])[0]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_replica_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ReplicaPool(
+                getattr(settings, 'DATABASE_REPLICAS', {}),
+                check_interval=getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 5.0),
+            )
+        return _pool
+
+
+def reset_replica_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_scope.get() or _pinned.get() or model._meta.label_lower not in CATALOG_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a write transaction must see the primary's state.
+            return None
+        return get_replica_pool().choose()
+
+    def db_for_write(self, model, **hints):
+        writes = _catalog_writes.get()
+        if writes is not None and model._meta.label_lower in CATALOG_MODELS:
+            writes.add(model._meta.label_lower)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_REPLICAS', {})}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, 'DATABASE_REPLICAS', {}):
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve a ViewSet's read-only actions from a replica unless the user was pinned"""
+    replica_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.action_map.get(request.method.lower()) in self.replica_actions:
+            with use_replica():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Token-authenticated clients have no pin cookie, so check the user pin too.
+        if _replica_scope.get() and request.user.is_authenticated and is_user_pinned(request.user.pk):
+            pin_to_primary()
+
+
+class ReplicaStickinessMiddleware:
+    """Pin clients that wrote catalog rows to the primary for REPLICA_STICKY_SECONDS"""
+    cookie_name = 'primary_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+        pinned = request.get_signed_cookie(self.cookie_name, default=None, max_age=sticky_seconds) is not None
+        pin_token = _pinned.set(pinned)
+        writes_token = _catalog_writes.set(set())
+        try:
+            response = self.get_response(request)
+            if _catalog_writes.get():
+                response.set_signed_cookie(self.cookie_name, '1', max_age=sticky_seconds, httponly=True, samesite='Lax')
+                user = getattr(request, 'user', None)
+                if user is not None and user.is_authenticated:
+                    pin_user(user.pk)
+            return response
+        finally:
+            _catalog_writes.reset(writes_token)
+            _pinned.reset(pin_token)
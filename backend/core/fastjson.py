@@ -0,0 +1,70 @@
+"""
+orjson-backed DRF renderer and parser.
+
+``ORJSONRenderer`` produces the same bytes as DRF's ``JSONRenderer`` with the
+default compact, unicode and strict settings: UTC datetimes end in ``Z``,
+Decimals that reach the renderer become numbers through DRF's encoder, and
+U+2028/U+2029 are escaped. Two edge cases differ. Floats that need an
+exponent are written in orjson's shortest form (``1e16`` rather than
+``1e+16``). NaN and infinite floats become ``null`` instead of raising.
+Indented output (the browsable API, ``; indent=`` in Accept), non-default
+JSON settings and values orjson cannot encode, such as integers wider than
+64 bits, go through the stdlib renderer.
+
+``ORJSONParser`` parses UTF-8 bodies with orjson, and bodies in other
+encodings or with digit runs long enough to overflow 64 bits (which orjson
+would read as floats) with the stdlib. Without orjson installed both classes behave exactly like DRF's.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+UTF8 = ('utf-8', 'utf8')
+# Maps digits to b'0' and everything else to b' ', so long digit runs can be found with a substring search
+DIGITS_TABLE = bytes(ord('0') if ord('0') <= i <= ord('9') else ord(' ') for i in range(256))
+LONG_DIGITS = b'0' * 20
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower() not in UTF8:
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if LONG_DIGITS not in body.translate(DIGITS_TABLE):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        # The stdlib either parses the body or produces DRF's usual error message.
+        try:
+            return json.loads(body.decode(encoding))
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,32 @@
+"""
+Signal receivers named by dotted path, so that connecting them in
+``AppConfig.ready()`` does not import their modules.
+
+``LazyReceiver('core.price_calendar.flight_price_day_saved')`` imports the
+function on the first signal. With ``if_loaded=True`` it does nothing until
+something else has imported the module: the in-memory indexes of
+core/routing.py and chatbot/retrieval.py only exist once their module is in
+use, so a management command that saves a flight never loads NumPy.
+Connect them with ``weak=False``; nothing else holds a reference.
+"""
+import sys
+
+from django.utils.module_loading import import_string
+
+
+class LazyReceiver:
+    def __init__(self, path, if_loaded=False):
+        self.path = path
+        self.module = path.rpartition('.')[0]
+        self.if_loaded = if_loaded
+        self.func = None
+
+    def __call__(self, *args, **kwargs):
+        if self.func is None:
+            if self.if_loaded and self.module not in sys.modules:
+                return None
+            self.func = import_string(self.path)
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<LazyReceiver {self.path}>'
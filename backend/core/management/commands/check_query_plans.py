@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.query_plans import hot_querysets, plan_problems
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot querysets and fail if any of them scans or sorts a whole table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not only the failing ones')
+
+    def handle(self, *args, **options):
+        failing = []
+        for name, queryset in hot_querysets().items():
+            problems = plan_problems(queryset)
+            if problems:
+                failing.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: {'; '.join(problems)}"))
+            elif options['verbose_plans']:
+                self.stdout.write(f"{name}: {queryset.explain()}")
+        if failing:
+            raise CommandError(f"{len(failing)} querysets scan or sort a whole table: {', '.join(failing)}")
+        self.stdout.write(self.style.SUCCESS('All hot querysets use an index'))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core.price_calendar import rebuild_calendar
+
+
+class Command(BaseCommand):
+    help = 'Recompute the lowest fare per route and day from the flights table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database to rebuild the calendar in')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Calendar rows written per INSERT')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_calendar(using=options['database'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {count} route days in {time.perf_counter() - started:.1f}s"))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replication import replicate, sqlite_replicas
+
+
+class Command(BaseCommand):
+    help = 'Keep local SQLite read replicas in sync with the primary database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Copy once and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between copies')
+
+    def handle(self, *args, **options):
+        if not sqlite_replicas():
+            raise CommandError('No SQLite replicas configured; set SQLITE_REPLICAS or DATABASE_REPLICAS')
+
+        while True:
+            timings = replicate()
+            self.stdout.write(', '.join(f"{alias} {seconds * 1000:.0f}ms" for alias, seconds in timings.items()) or 'No replica updated')
+            if options['once']:
+                return
+            time.sleep(options['interval'])
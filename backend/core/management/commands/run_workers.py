@@ -0,0 +1,78 @@
+import json
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.task_queue import queue_settings, queue_status, retry_dead, run_worker
+
+
+def work(stop, config):
+    # The parent turns Ctrl-C and SIGTERM into ``stop``; children finish their current task
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        run_worker(stop=stop, config=config)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of background task workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, help='Worker processes')
+        parser.add_argument('--batch-size', type=int, help='Tasks claimed at once by one worker')
+        parser.add_argument('--poll-interval', type=float, help='Seconds an idle worker waits before looking again')
+        parser.add_argument('--once', action='store_true', help='Run the due tasks in this process and exit')
+        parser.add_argument('--status', action='store_true', help='Print task counts by name and status as JSON and exit')
+        parser.add_argument('--retry-dead', nargs='*', metavar='TASK', help='Requeue dead tasks (all, or of the given names) and exit')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.stdout.write(json.dumps(queue_status(), indent=2))
+            return
+        if options['retry_dead'] is not None:
+            self.stdout.write(f"Requeued {retry_dead(options['retry_dead'])} dead tasks")
+            return
+
+        config = queue_settings()
+        for option in ('processes', 'batch_size', 'poll_interval'):
+            if options[option] is not None:
+                config[option] = options[option]
+
+        if options['once']:
+            counts = run_worker(once=True, config=config)
+            self.stdout.write(f"Ran {sum(counts.values())} tasks: {counts['done']} done, "
+                              f"{counts['retried']} retried, {counts['dead']} dead")
+            return
+
+        # Children must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        # The handler only records the signal: setting ``stop`` from it could deadlock on the event's own lock
+        signalled = []
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: signalled.append(signum))
+
+        def start(number):
+            process = context.Process(target=work, args=(stop, config), name=f'task-worker-{number}', daemon=True)
+            process.start()
+            return process
+
+        workers = [start(number) for number in range(config['processes'])]
+        self.stdout.write(f"Started {len(workers)} task workers")
+        while not signalled:
+            for number, process in enumerate(workers):
+                if not process.is_alive():
+                    self.stderr.write(f"{process.name} exited with {process.exitcode}; restarting")
+                    workers[number] = start(number)
+            time.sleep(1.0)
+        stop.set()
+        started = time.perf_counter()
+        for process in workers:
+            process.join(config['poll_interval'] + 30)
+        self.stdout.write(f"Stopped {len(workers)} task workers in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,229 @@
+"""
+Prometheus metrics for requests, queries, caches, bookings, guarded
+dependencies, background tasks and database pools, served at ``/metrics``.
+
+Request metrics are labelled with the resolved URL name (``flight-list``,
+``booking-list``, ``chat_message``), never the raw path, so label cardinality
+stays bounded. Under several gunicorn or daphne workers set
+``PROMETHEUS_MULTIPROC_DIR`` to an empty directory shared by the workers
+before they start: every process then writes its samples to memory-mapped
+files in it and ``/metrics`` aggregates all of them, whichever worker serves
+the scrape. Gauges for pool state are summed over live processes.
+"""
+import hmac
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+DEFAULTS = {
+    'enabled': True,
+    'token': None,  # bearer token required to scrape /metrics; without one it is only served with DEBUG on
+    'pool_sample_interval': 1.0,  # seconds between pool gauge updates per process
+}
+
+UNRESOLVED = '<unresolved>'
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+REQUESTS = Counter(
+    'fanzone_http_requests_total', 'Requests served, by URL name, method and status',
+    ['view', 'method', 'status'])
+REQUEST_LATENCY = Histogram(
+    'fanzone_http_request_duration_seconds', 'Request latency by URL name and method',
+    ['view', 'method'], buckets=LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram(
+    'fanzone_http_request_db_queries', 'Database queries per request by URL name',
+    ['view'], buckets=QUERY_COUNT_BUCKETS)
+DB_QUERIES = Counter(
+    'fanzone_db_queries_total', 'Database queries executed while serving requests',
+    ['alias', 'view'])
+DB_QUERY_LATENCY = Histogram(
+    'fanzone_db_query_duration_seconds', 'Database query latency',
+    ['alias'], buckets=QUERY_BUCKETS)
+DB_CONNECTIONS = Counter(
+    'fanzone_db_connections_opened_total', 'Database connections opened (pool checkouts with a pool)',
+    ['alias'])
+DB_POOL_CONNECTIONS = Gauge(
+    'fanzone_db_pool_connections', 'Pooled connections by state, summed over live processes',
+    ['alias', 'state'], multiprocess_mode='livesum')
+DB_POOL_WAITING = Gauge(
+    'fanzone_db_pool_requests_waiting', 'Requests waiting for a pooled connection',
+    ['alias'], multiprocess_mode='livesum')
+DB_POOL_WAIT = Gauge(
+    'fanzone_db_pool_wait_seconds', 'Time spent waiting for pooled connections since each process started',
+    ['alias'], multiprocess_mode='livesum')
+DB_POOL_TIMEOUTS = Gauge(
+    'fanzone_db_pool_timeouts', 'Pool checkouts that timed out since each process started',
+    ['alias'], multiprocess_mode='livesum')
+CACHE = Counter(
+    'fanzone_cache_requests_total', 'Cache lookups by cache and result',
+    ['cache', 'result'])
+BOOKINGS = Counter(
+    'fanzone_bookings_total', 'Booking outcomes (created, cancelled)',
+    ['outcome'])
+DEPENDENCY_LATENCY = Histogram(
+    'fanzone_dependency_call_duration_seconds', 'Guarded outbound call latency (Gemini, RapidAPI)',
+    ['dependency', 'outcome'], buckets=LATENCY_BUCKETS)
+DEPENDENCY_ERRORS = Counter(
+    'fanzone_dependency_errors_total', 'Guarded outbound calls that failed or were rejected',
+    ['dependency', 'reason'])
+TASKS = Counter(
+    'fanzone_tasks_total', 'Background task runs by task and outcome (done, retried, dead)',
+    ['task', 'outcome'])
+TASK_DURATION = Histogram(
+    'fanzone_task_duration_seconds', 'Background task run time',
+    ['task'], buckets=LATENCY_BUCKETS)
+
+_pool_sampled_at = 0.0
+_pool_lock = threading.Lock()
+
+
+def metrics_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'METRICS', {}))
+    return config
+
+
+def record_cache(cache, hit):
+    CACHE.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_booking(outcome, count=1):
+    BOOKINGS.labels(outcome).inc(count)
+
+
+def record_task(task, outcome, seconds):
+    TASKS.labels(task, outcome).inc()
+    TASK_DURATION.labels(task).observe(seconds)
+
+
+def record_dependency(dependency, seconds, error=None):
+    """Latency of one guarded call and, when it failed, the exception class as the reason"""
+    DEPENDENCY_LATENCY.labels(dependency, 'ok' if error is None else 'error').observe(seconds)
+    if error is not None:
+        DEPENDENCY_ERRORS.labels(dependency, type(error).__name__).inc()
+
+
+def count_connection(sender, connection, **kwargs):
+    """connection_created receiver"""
+    DB_CONNECTIONS.labels(connection.alias).inc()
+
+
+def connections_opened(alias):
+    """Connections this process has opened on ``alias``"""
+    return REGISTRY.get_sample_value('fanzone_db_connections_opened_total', {'alias': alias}) or 0
+
+
+class QueryRecorder:
+    """execute_wrapper counting and timing the queries of one request on one alias"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            DB_QUERY_LATENCY.labels(self.alias).observe(time.perf_counter() - started)
+            self.count += 1
+
+
+def sample_pools(interval=0.0):
+    """Copy psycopg pool statistics into the pool gauges, at most once per interval"""
+    global _pool_sampled_at
+    from .db_pool import pool_stats
+
+    now = time.monotonic()
+    with _pool_lock:
+        if now - _pool_sampled_at < interval:
+            return
+        _pool_sampled_at = now
+    for alias in connections:
+        connection = connections[alias]
+        pool = getattr(connection, 'pool', None) if connection.settings_dict.get('OPTIONS', {}).get('pool') else None
+        if pool is None:
+            continue
+        stats = pool_stats(pool)
+        for state in ('size', 'available', 'in_use', 'max_size'):
+            DB_POOL_CONNECTIONS.labels(alias, state).set(stats[state] or 0)
+        DB_POOL_WAITING.labels(alias).set(stats['waiting'])
+        DB_POOL_WAIT.labels(alias).set(stats['wait_ms_total'] / 1000)
+        DB_POOL_TIMEOUTS.labels(alias).set(stats['timeouts'])
+
+
+class PrometheusMetricsMiddleware:
+    """Request count, latency and query metrics per URL name; keep it first in MIDDLEWARE"""
+
+    def __init__(self, get_response):
+        self.config = metrics_settings()
+        if not self.config['enabled']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorders = [QueryRecorder(alias) for alias in connections]
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for recorder in recorders:
+                stack.enter_context(connections[recorder.alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED
+        if view == 'metrics':
+            return response
+        method = request.method if request.method in METHODS else 'other'
+
+        REQUESTS.labels(view, method, str(response.status_code)).inc()
+        REQUEST_LATENCY.labels(view, method).observe(elapsed)
+        REQUEST_QUERIES.labels(view).observe(sum(recorder.count for recorder in recorders))
+        for recorder in recorders:
+            if recorder.count:
+                DB_QUERIES.labels(recorder.alias, view).inc(recorder.count)
+        sample_pools(self.config['pool_sample_interval'])
+        return response
+
+
+def registry():
+    """The registry to scrape: every worker's samples in multiprocess mode, this process's otherwise"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        collector_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry)
+        return collector_registry
+    return REGISTRY
+
+
+def metrics_view(request):
+    """Prometheus text exposition of all metrics"""
+    config = metrics_settings()
+    if not config['enabled']:
+        raise Http404
+    token = config['token']
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        # Not public by default: production scrapers must authenticate
+        raise Http404
+    sample_pools()
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges; call from gunicorn's ``child_exit`` hook"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
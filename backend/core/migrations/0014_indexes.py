@@ -0,0 +1,73 @@
+# Generated by Django 5.2 on 2026-10-19 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_user_tokens_revoked_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['activity_date'], name='activity_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['activity_type', 'activity_date'], name='activity_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['city', 'activity_date'], name='activity_city_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(condition=models.Q(('available_spots__gt', 0)), fields=['activity_date'], name='activity_open_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-booking_date', '-id'], name='booking_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'status'], name='booking_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure_time'], name='flight_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure_city', 'arrival_city', 'departure_time'], name='flight_route_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(condition=models.Q(('available_seats__gt', 0)), fields=['departure_city', 'arrival_city', 'departure_time'], name='flight_open_route_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(fields=['city', 'price_per_night'], name='hotel_city_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(condition=models.Q(('available_rooms__gt', 0)), fields=['city', 'price_per_night'], name='hotel_open_city_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchticket',
+            index=models.Index(fields=['match_date'], name='ticket_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchticket',
+            index=models.Index(fields=['match_type', 'match_date'], name='ticket_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchticket',
+            index=models.Index(fields=['stadium', 'match_date'], name='ticket_stadium_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchticket',
+            index=models.Index(condition=models.Q(('available_tickets__gt', 0)), fields=['match_date'], name='ticket_open_date_idx'),
+        ),
+    ]
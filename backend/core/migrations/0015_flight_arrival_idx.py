@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['arrival_city', 'arrival_time'], name='flight_arrival_idx'),
+        ),
+    ]
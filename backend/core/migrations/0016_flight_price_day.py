@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-19 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_flight_arrival_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightPriceDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departure_city', models.CharField(max_length=100)),
+                ('arrival_city', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('available_seats', models.IntegerField(default=0)),
+                ('flights', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('departure_city', 'arrival_city', 'date'), name='flight_price_day_route_date')],
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class User(AbstractUser):
@@ -13,6 +15,14 @@ class User(AbstractUser):
     address = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Access tokens issued before this time are rejected (see core/authentication.py)
+    tokens_revoked_at = models.DateTimeField(null=True, blank=True)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Users built from a token load the rest of their row in one query on first access
+        if fields is not None and getattr(self, 'from_token', False):
+            fields = set(fields) | self.get_deferred_fields()
+        super().refresh_from_db(using, fields, from_queryset)
 
 class MatchType(models.TextChoices):
     CAN = 'CAN', _('CAN 2025')
@@ -51,9 +61,39 @@ class Flight(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['departure_time'], name='flight_departure_idx'),
+            models.Index(fields=['departure_city', 'arrival_city', 'departure_time'], name='flight_route_idx'),
+            models.Index(fields=['arrival_city', 'arrival_time'], name='flight_arrival_idx'),
+            # Routes with seats left
+            models.Index(fields=['departure_city', 'arrival_city', 'departure_time'], name='flight_open_route_idx',
+                         condition=models.Q(available_seats__gt=0)),
+        ]
+
     def __str__(self):
         return f"{self.airline or 'Unknown'} - {self.flight_number}"
 
+class FlightPriceDay(models.Model):
+    """Lowest fare and seats left on one route for one departure date (see core/price_calendar.py)"""
+    departure_city = models.CharField(max_length=100)
+    arrival_city = models.CharField(max_length=100)
+    date = models.DateField()
+    # Cheapest flight with seats left; null when every flight that day is sold out
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    available_seats = models.IntegerField(default=0)
+    flights = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also the index a month of one route is read from
+            models.UniqueConstraint(fields=['departure_city', 'arrival_city', 'date'], name='flight_price_day_route_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.departure_city} - {self.arrival_city} on {self.date}"
+
 class Hotel(models.Model):
     name = models.CharField(max_length=200)
     city = models.CharField(max_length=100)
@@ -66,6 +106,14 @@ class Hotel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['city', 'price_per_night'], name='hotel_city_price_idx'),
+            # Hotels with rooms left, cheapest first
+            models.Index(fields=['city', 'price_per_night'], name='hotel_open_city_price_idx',
+                         condition=models.Q(available_rooms__gt=0)),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.city}"
 
@@ -80,6 +128,15 @@ class MatchTicket(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['match_date'], name='ticket_date_idx'),
+            models.Index(fields=['match_type', 'match_date'], name='ticket_type_date_idx'),
+            models.Index(fields=['stadium', 'match_date'], name='ticket_stadium_date_idx'),
+            # Matches with tickets left
+            models.Index(fields=['match_date'], name='ticket_open_date_idx', condition=models.Q(available_tickets__gt=0)),
+        ]
+
     def __str__(self):
         return self.match_name
 
@@ -95,6 +152,15 @@ class Activity(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['activity_date'], name='activity_date_idx'),
+            models.Index(fields=['activity_type', 'activity_date'], name='activity_type_date_idx'),
+            models.Index(fields=['city', 'activity_date'], name='activity_city_date_idx'),
+            # Activities with spots left
+            models.Index(fields=['activity_date'], name='activity_open_date_idx', condition=models.Q(available_spots__gt=0)),
+        ]
+
     def __str__(self):
         return f"{self.name} in {self.city}"
 
@@ -114,6 +180,13 @@ class Booking(models.Model):
     booking_date = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # A user's bookings, newest first, and filtered by status
+            models.Index(fields=['user', '-booking_date', '-id'], name='booking_user_date_idx'),
+            models.Index(fields=['user', 'status'], name='booking_user_status_idx'),
+        ]
+
     def __str__(self):
         return f"Booking {self.id} - {self.user.username}"
 
@@ -132,3 +205,36 @@ class Package(models.Model):
 
     def __str__(self):
         return self.name
+
+class Task(models.Model):
+    """A unit of background work run by ``manage.py run_workers`` (see core/task_queue.py)"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DEAD = 'dead'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DEAD, 'Dead'),
+    )
+    name = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    priority = models.IntegerField(default=0)  # higher runs first
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Due tasks in claim order, and tasks whose worker may have died
+            models.Index(fields=['-priority', 'run_at', 'id'], name='task_queued_idx', condition=models.Q(status='queued')),
+            models.Index(fields=['locked_at'], name='task_running_idx', condition=models.Q(status='running')),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
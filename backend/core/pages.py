@@ -0,0 +1,105 @@
+"""
+Pagination and caching for the server-rendered site.
+
+``paginate`` splits a queryset into pages of ``page_size`` rows. For catalog
+tables the row count is cached per catalog version (see
+``core.compression.bump_catalog_version``) and per query, so paging through
+a large table runs one ``LIMIT/OFFSET`` query per page instead of a
+``COUNT(*)`` as well. The list templates wrap each card in a ``{% cache %}``
+fragment keyed by the row's primary key and ``updated_at``: an edited row
+gets a new fragment, untouched rows are rendered from the cache, and stale
+fragments expire after ``fragment_timeout`` seconds.
+
+``cache_anonymous_page`` caches whole pages for anonymous visitors. Signed-in
+users, visitors with pending messages and pages that set a cookie or use a
+CSRF token are always rendered.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db import router
+from django.http import HttpResponse
+from django.utils.functional import cached_property
+
+from .compression import catalog_version
+from .metrics import record_cache
+
+DEFAULTS = {
+    'page_size': 24,
+    'cache': 'default',
+    'count_timeout': 300,  # seconds a catalog row count is reused within one catalog version
+    'fragment_timeout': 3600,  # seconds a rendered card is kept
+    'page_timeout': 300,  # seconds an anonymous page is kept; 0 disables full-page caching
+}
+
+
+def page_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SITE_PAGES', {}))
+    return config
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator whose row count is cached for the current catalog version"""
+
+    @cached_property
+    def count(self):
+        config = page_settings()
+        queryset = self.object_list
+        cache = caches[config['cache']]
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{router.db_for_read(queryset.model)}:{sql}:{params}'.encode()).hexdigest()
+        key = f'page_count:{catalog_version()}:{digest}'
+        count = cache.get(key)
+        record_cache('page_count', count is not None)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, config['count_timeout'])
+        return count
+
+
+def paginate(request, queryset, catalog=True):
+    """The requested page of ``queryset``; out-of-range and invalid page numbers give the nearest page"""
+    paginator_class = CachedCountPaginator if catalog else Paginator
+    paginator = paginator_class(queryset, page_settings()['page_size'])
+    return paginator.get_page(request.GET.get('page'))
+
+
+def page_context(request, queryset, name, catalog=True):
+    """Template context for a paginated list: the page's rows under ``name`` plus paging data"""
+    page = paginate(request, queryset, catalog)
+    return {
+        name: page.object_list,
+        'page_obj': page,
+        'fragment_timeout': page_settings()['fragment_timeout'],
+    }
+
+
+def cache_anonymous_page(view):
+    """Serve ``view`` from the cache to anonymous visitors"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        config = page_settings()
+        messages = getattr(request, '_messages', None)
+        if (not config['page_timeout'] or request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated or (messages is not None and len(messages))):
+            return view(request, *args, **kwargs)
+
+        cache = caches[config['cache']]
+        key = f'anonymous_page:{request.get_full_path()}'
+        entry = cache.get(key)
+        record_cache('anonymous_page', entry is not None)
+        if entry is not None:
+            return HttpResponse(entry['content'], content_type=entry['content_type'])
+
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if (response.status_code == 200 and not response.streaming and not response.cookies
+                and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+            cache.set(key, {'content': response.content, 'content_type': response['Content-Type']}, config['page_timeout'])
+        return response
+    return wrapper
@@ -0,0 +1,157 @@
+"""
+Lowest fare per day for every route, kept in the ``FlightPriceDay`` table.
+
+Each row covers one (departure_city, arrival_city, date) with three values:
+- the cheapest flight with seats left;
+- the seats left that day;
+- the number of flights that day.
+
+Dates are departure dates in the current time zone. A month of one route is
+then one range read on the table's unique index. Computing it from
+``Flight`` would need a ``GROUP BY`` over the route's flights.
+
+Flight receivers keep the rows in step with the flights table:
+``flight_price_day_previous`` remembers where a flight was before a save, and
+``flight_price_day_saved`` / ``flight_price_day_deleted`` call
+``refresh_calendar`` for the old and new days in the writing transaction.
+Bulk writes that skip the signals (``bulk_create``, ``QuerySet.update``) call
+``refresh_calendar(calendar_keys(flights))`` themselves. Large imports call
+``rebuild_calendar`` instead. ``manage.py rebuild_price_calendar`` runs the
+same full rebuild.
+"""
+from datetime import datetime, time, timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Flight, FlightPriceDay
+
+UPDATE_FIELDS = ['min_price', 'available_seats', 'flights', 'updated_at']
+OPEN = Q(available_seats__gt=0)
+
+
+def day_of(moment):
+    # Flights may be saved with a string departure_time
+    moment = Flight._meta.get_field('departure_time').to_python(moment)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return timezone.localtime(moment).date()
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def calendar_key(departure_city, arrival_city, departure_time):
+    return (departure_city, arrival_city, day_of(departure_time))
+
+
+def calendar_keys(flights):
+    """Calendar keys of a Flight queryset or iterable of flights"""
+    if hasattr(flights, 'values_list'):
+        flights = flights.values_list('departure_city', 'arrival_city', 'departure_time')
+    else:
+        flights = ((flight.departure_city, flight.arrival_city, flight.departure_time) for flight in flights)
+    return {calendar_key(*row) for row in flights}
+
+
+def day_totals(flights):
+    """Calendar rows of ``flights`` as dicts, one per route and departure date"""
+    return (
+        flights.order_by()
+        .values('departure_city', 'arrival_city', date=TruncDate('departure_time'))
+        .annotate(
+            min_price=Min('price', filter=OPEN),
+            available_seats=Coalesce(Sum('available_seats', filter=OPEN), 0),
+            flights=Count('id'),
+        )
+    )
+
+
+def save_days(rows, using):
+    FlightPriceDay.objects.using(using).bulk_create(
+        [FlightPriceDay(**row) for row in rows], update_conflicts=True,
+        unique_fields=['departure_city', 'arrival_city', 'date'], update_fields=UPDATE_FIELDS,
+    )
+
+
+def refresh_calendar(keys, using='default'):
+    """Recompute the calendar rows of ``keys``, (departure_city, arrival_city, date) tuples, from the flights table"""
+    keys = set(keys)
+    if not keys:
+        return 0
+    days = [day for _, _, day in keys]
+    flights = Flight.objects.using(using).filter(
+        departure_city__in={key[0] for key in keys},
+        arrival_city__in={key[1] for key in keys},
+        departure_time__gte=day_start(min(days)),
+        departure_time__lt=day_start(max(days) + timedelta(days=1)),
+    )
+    rows = {}
+    for row in day_totals(flights):
+        key = (row['departure_city'], row['arrival_city'], row['date'])
+        if key in keys:
+            rows[key] = row
+    with transaction.atomic(using=using):
+        save_days(rows.values(), using)
+        gone = keys - rows.keys()
+        if gone:
+            FlightPriceDay.objects.using(using).filter(reduce(or_, (
+                Q(departure_city=departure, arrival_city=arrival, date=day) for departure, arrival, day in gone
+            ))).delete()
+    return len(keys)
+
+
+def rebuild_calendar(using='default', chunk_size=5000):
+    """Replace the whole calendar with one computed from the flights table; returns the row count"""
+    count = 0
+    with transaction.atomic(using=using):
+        FlightPriceDay.objects.using(using).all().delete()
+        chunk = []
+        for row in day_totals(Flight.objects.using(using)).iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                save_days(chunk, using)
+                count += len(chunk)
+                chunk = []
+        save_days(chunk, using)
+        count += len(chunk)
+    return count
+
+
+def month_calendar(departure_city, arrival_city, month):
+    """The route's calendar rows for the month starting on ``month``, by date"""
+    end = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return FlightPriceDay.objects.filter(
+        departure_city=departure_city, arrival_city=arrival_city, date__gte=month, date__lt=end,
+    ).order_by('date')
+
+
+def flight_price_day_previous(sender, instance, raw=False, using=None, **kwargs):
+    """pre_save receiver for Flight: remember the day the flight is moving away from"""
+    instance._price_day_previous = None
+    if raw or instance.pk is None or instance._state.adding:
+        return
+    previous = Flight.objects.using(using).filter(pk=instance.pk).values_list(
+        'departure_city', 'arrival_city', 'departure_time').first()
+    if previous is not None:
+        instance._price_day_previous = calendar_key(*previous)
+
+
+def flight_price_day_saved(sender, instance, raw=False, using=None, **kwargs):
+    """post_save receiver for Flight"""
+    if raw:
+        return
+    keys = {calendar_key(instance.departure_city, instance.arrival_city, instance.departure_time)}
+    if getattr(instance, '_price_day_previous', None):
+        keys.add(instance._price_day_previous)
+    refresh_calendar(keys, using=using)
+
+
+def flight_price_day_deleted(sender, instance, using=None, **kwargs):
+    """post_delete receiver for Flight"""
+    refresh_calendar({calendar_key(instance.departure_city, instance.arrival_city, instance.departure_time)}, using=using)
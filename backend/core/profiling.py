@@ -0,0 +1,241 @@
+"""
+Per-request phase timing, Server-Timing headers and on-demand profiles.
+
+With ``settings.REQUEST_TIMING['enabled']`` the RequestTimingMiddleware times
+SQL (via ``connection.execute_wrapper``), DRF serialization and rendering,
+template rendering, outbound ``requests`` calls and guarded dependencies
+(Gemini, RapidAPI), then adds a ``Server-Timing`` header and logs one JSON line
+per request. Phases can overlap: queries run while a serializer walks a lazy
+queryset count towards both. Staff users can send ``X-Profile: sample`` (stack
+sampling) or ``X-Profile: cprofile`` to have a profile written for the request.
+
+When disabled the middleware removes itself (MiddlewareNotUsed) and no hooks
+are installed; ``timed()`` then costs a single context variable lookup.
+"""
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'enabled': False,
+    'header': True,
+    'log': True,
+    'profile_header': 'HTTP_X_PROFILE',
+    'profile_dir': os.path.join(tempfile.gettempdir(), 'fanzone-profiles'),
+    'sample_interval': 0.001,
+}
+
+_timings = contextvars.ContextVar('request_timings', default=None)
+_installed = False
+_install_lock = threading.Lock()
+
+
+def timing_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'REQUEST_TIMING', {}))
+    return config
+
+
+class Timings:
+    """Accumulated milliseconds and call counts per phase for one request"""
+
+    def __init__(self):
+        self.phases = {}
+        self._depth = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, phase, ms):
+        with self._lock:
+            total, count = self.phases.get(phase, (0.0, 0))
+            self.phases[phase] = (total + ms, count + 1)
+
+    def server_timing(self, total_ms):
+        entries = [f'{phase};dur={ms:.1f};desc="{count}x"' for phase, (ms, count) in self.phases.items()]
+        entries.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def timed(phase):
+    """Add the block's duration to ``phase`` for the current request, if one is being timed"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    # Only the outermost block of a phase counts, so recursive calls are not double counted.
+    timings._depth[phase] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._depth[phase] -= 1
+        if not timings._depth[phase]:
+            timings.add(phase, (time.perf_counter() - started) * 1000)
+
+
+def timed_call(phase, func):
+    def wrapper(*args, **kwargs):
+        with timed(phase):
+            return func(*args, **kwargs)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def timed_property(phase, prop):
+    return property(timed_call(phase, prop.fget), prop.fset, prop.fdel, prop.__doc__)
+
+
+def db_wrapper(execute, sql, params, many, context):
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+def install_hooks():
+    """Wrap DRF serializers and renderers, Django templates and requests once per process"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        from django.template.backends.django import Template
+        from rest_framework.response import Response
+        from rest_framework.serializers import BaseSerializer
+
+        BaseSerializer.data = timed_property('serialize', BaseSerializer.data)
+        Response.rendered_content = timed_property('render', Response.rendered_content)
+        Template.render = timed_call('template', Template.render)
+        try:
+            import requests
+        except ImportError:
+            pass
+        else:
+            requests.Session.send = timed_call('http', requests.Session.send)
+        _installed = True
+
+
+class StackSampler:
+    """Pyinstrument-style sampling profiler for one thread, writing collapsed stacks"""
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def profile_mode(request, header):
+    """'sample' or 'cprofile' when a staff user asked for a profile, otherwise None"""
+    mode = request.META.get(header, '').strip().lower()
+    if mode not in ('1', 'sample', 'cprofile'):
+        return None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        # API clients authenticate with JWT, which DRF only checks inside the view.
+        from .authentication import CachedJWTAuthentication
+        try:
+            authenticated = CachedJWTAuthentication().authenticate(request)
+        except Exception:
+            authenticated = None
+        user = authenticated[0] if authenticated else None
+    if user is None or not user.is_staff:
+        return None
+    return 'cprofile' if mode == 'cprofile' else 'sample'
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        self.config = timing_settings()
+        if not self.config['enabled']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_hooks()
+
+    def __call__(self, request):
+        mode = profile_mode(request, self.config['profile_header'])
+        timings = Timings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(db_wrapper))
+                if mode is None:
+                    response = self.get_response(request)
+                else:
+                    response = self.profile(request, mode)
+        finally:
+            _timings.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        if self.config['header']:
+            response['Server-Timing'] = timings.server_timing(total_ms)
+        if self.config['log']:
+            match = getattr(request, 'resolver_match', None)
+            logger.info(json.dumps({
+                'event': 'request_timing',
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 2),
+                'phases': {phase: {'ms': round(ms, 2), 'count': count} for phase, (ms, count) in timings.phases.items()},
+            }))
+        return response
+
+    def profile(self, request, mode):
+        os.makedirs(self.config['profile_dir'], exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{uuid.uuid4().hex[:6]}"
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            name += '.prof'
+            profiler.dump_stats(os.path.join(self.config['profile_dir'], name))
+        else:
+            with StackSampler(threading.get_ident(), self.config['sample_interval']) as sampler:
+                response = self.get_response(request)
+            name += '.collapsed'
+            sampler.write(os.path.join(self.config['profile_dir'], name))
+        logger.info(f"Wrote {mode} profile of {request.path} to {name}")
+        response['X-Profile-File'] = name
+        return response
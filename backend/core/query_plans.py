@@ -0,0 +1,86 @@
+"""
+Query-plan checks for the hot querysets of the site, the API and the chatbot.
+
+``hot_querysets`` lists the querysets that run on every page, list, trip
+search or chat request, built the same way the code builds them.
+``plan_problems`` runs ``EXPLAIN`` on one and returns the plan lines that
+read a whole table: SQLite ``SCAN <table>`` without an index, or PostgreSQL
+``Seq Scan``. On SQLite it also returns sorts that follow any scan, because
+walking a whole index and then sorting it is a full scan as well. A sort of
+the rows an index range search returned is fine. The test suite fails on any
+such line. ``manage.py check_query_plans`` runs the same check against a
+real database.
+"""
+import re
+from datetime import timedelta
+
+from django.db import connections
+from django.utils import timezone
+
+from chatbot.models import Conversation, Match
+from .models import Activity, Booking, Flight, Hotel, MatchTicket
+from .price_calendar import month_calendar
+
+# Plan lines that read a whole table, per database vendor
+PROBLEMS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING (COVERING )?INDEX\b)'),
+    'postgresql': re.compile(r'\bSeq Scan\b'),
+}
+SQLITE_SCAN = re.compile(r'\bSCAN\b')
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY')
+
+
+def hot_querysets(now=None):
+    """{name: queryset} for the queries the app runs most"""
+    now = now or timezone.now()
+    month = now + timedelta(days=30)
+    return {
+        'flight_page': Flight.objects.order_by('departure_time', 'id')[:24],
+        'flight_route': Flight.objects.filter(
+            departure_city='Paris', arrival_city='Rabat', departure_time__gte=now).order_by('departure_time'),
+        'open_flight_route': Flight.objects.filter(
+            departure_city='Paris', arrival_city='Rabat', departure_time__gte=now, available_seats__gt=0,
+        ).order_by('departure_time'),
+        'hotels_by_city': Hotel.objects.filter(city='Rabat').order_by('price_per_night')[:10],
+        'open_hotels_by_city': Hotel.objects.filter(city='Rabat', available_rooms__gt=0).order_by('price_per_night')[:10],
+        'ticket_page': MatchTicket.objects.order_by('match_date', 'id')[:24],
+        'tickets_by_type': MatchTicket.objects.filter(match_type='CAN').order_by('match_date', 'id')[:24],
+        'upcoming_venues': MatchTicket.objects.filter(match_date__range=(now, month)).values_list('stadium', flat=True),
+        'open_upcoming_tickets': MatchTicket.objects.filter(
+            available_tickets__gt=0, match_date__gte=now).order_by('match_date')[:24],
+        'tickets_at_stadium': MatchTicket.objects.filter(stadium='Stade Mohammed V', match_date__gte=now).order_by('match_date'),
+        'activity_page': Activity.objects.order_by('activity_date', 'id')[:24],
+        'activities_by_type': Activity.objects.filter(activity_type='SPORT').order_by('activity_date', 'id')[:24],
+        'activities_in_city': Activity.objects.filter(city='Rabat', activity_date__gte=now).order_by('activity_date'),
+        'open_upcoming_activities': Activity.objects.filter(
+            available_spots__gt=0, activity_date__gte=now).order_by('activity_date')[:24],
+        # core/trip_finder.py, with and without a departure city
+        'trip_flights': Flight.objects.filter(
+            arrival_city='Rabat', arrival_time__range=(now, month), departure_time__range=(now, month), available_seats__gte=1,
+        ).order_by('price', 'id')[:5],
+        'trip_flights_from_origin': Flight.objects.filter(
+            departure_city='Paris', arrival_city='Rabat', arrival_time__range=(now, month),
+            departure_time__range=(now, month), available_seats__gte=1,
+        ).order_by('price', 'id')[:5],
+        'trip_hotels': Hotel.objects.filter(
+            city='Rabat', available_rooms__gt=0, available_rooms__gte=1).order_by('price_per_night', 'id')[:5],
+        'trip_activities': Activity.objects.filter(
+            city='Rabat', activity_date__range=(now, month), available_spots__gte=1).order_by('price', 'id')[:5],
+        'price_calendar_month': month_calendar('Paris', 'Rabat', now.date().replace(day=1)),
+        'user_bookings': Booking.objects.filter(user_id=1).order_by('-booking_date', '-id')[:24],
+        'user_bookings_by_status': Booking.objects.filter(user_id=1, status='confirmed'),
+        'upcoming_matches': Match.objects.filter(date__gte=now).order_by('date')[:3],
+        'recent_conversations': Conversation.objects.filter(created_at__gte=now - timedelta(days=1)),
+    }
+
+
+def plan_problems(queryset):
+    """Lines of the queryset's plan that scan or sort a whole table"""
+    pattern = PROBLEMS.get(connections[queryset.db].vendor)
+    if pattern is None:
+        raise ValueError(f"No plan check for {connections[queryset.db].vendor}")
+    lines = [line.strip() for line in queryset.explain().splitlines()]
+    problems = [line for line in lines if pattern.search(line)]
+    if connections[queryset.db].vendor == 'sqlite' and any(SQLITE_SCAN.search(line) for line in lines):
+        problems += [line for line in lines if SQLITE_SORT.search(line)]
+    return problems
@@ -0,0 +1,53 @@
+"""
+Local stand-in for database replication.
+
+Copies the primary SQLite file into every SQLite replica listed in
+``settings.DATABASE_REPLICAS`` using SQLite's online backup API, so the
+replica router can be exercised on a laptop. Run it with
+``python manage.py replicate_sqlite``.
+"""
+import logging
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+logger = logging.getLogger(__name__)
+
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+
+
+def sqlite_replicas():
+    """(alias, path) of every configured replica that is a SQLite file"""
+    return [
+        (alias, str(settings.DATABASES[alias]['NAME']))
+        for alias in getattr(settings, 'DATABASE_REPLICAS', {})
+        if settings.DATABASES.get(alias, {}).get('ENGINE') == SQLITE_ENGINE
+    ]
+
+
+def copy_database(source_path, target_path, pages=256):
+    """Copy one SQLite database onto another without blocking writers for the whole copy"""
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages)
+    finally:
+        target.close()
+        source.close()
+
+
+def replicate(replicas=None):
+    """Bring every SQLite replica up to date with the primary; returns {alias: seconds taken}"""
+    primary = str(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'])
+    timings = {}
+    for alias, path in sqlite_replicas() if replicas is None else replicas:
+        started = time.perf_counter()
+        try:
+            copy_database(primary, path)
+        except sqlite3.Error as e:
+            logger.error(f"Could not replicate to {alias}: {str(e)}", exc_info=True)
+            continue
+        timings[alias] = time.perf_counter() - started
+    return timings
@@ -0,0 +1,379 @@
+"""
+Multi-leg flight routing over the ``Flight`` table.
+
+``FlightSchedule`` keeps every flight as a row of NumPy columns (cities as
+integers, times as epoch seconds, prices in cents, seats), and for every city
+the flights leaving it sorted by departure time. Together these form a
+time-expanded graph: each flight is a node, and an edge joins a flight to
+every flight leaving its arrival city between ``min_connection`` and
+``max_connection`` minutes after it lands. Searches run Dijkstra over that
+graph and expand a city's departures with one ``searchsorted`` per
+connection:
+- ``earliest``: ordered by arrival time, so the first flight popped into the
+  destination gives the earliest arrival;
+- ``cheapest``: ordered by total price.
+
+Both honour the party size, a maximum number of legs and a maximum trip
+length.
+
+The process-wide schedule is built from the database in a background thread
+(core/background.py). Flight saves and deletes in this process are applied
+when their transaction commits. Changes made elsewhere (other workers,
+``QuerySet.update`` that sets ``updated_at``) are picked up every
+``refresh_interval`` seconds by reading the rows whose ``updated_at`` moved.
+The schedule is rebuilt in the background every ``rebuild_interval``
+seconds and swapped in, which also drops flights deleted by other
+processes.
+"""
+import heapq
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .background import BackgroundBuild
+from .db_router import use_replica
+from .models import Flight
+
+DEFAULTS = {
+    'min_connection_minutes': 60,
+    'max_connection_minutes': 720,
+    'max_legs': 3,
+    'departure_window_hours': 24,  # first flight leaves within this long after the requested time
+    'max_trip_hours': 48,  # last flight lands within this long after the requested time
+    'refresh_interval': 30,  # seconds between reads of recently updated flights
+    'rebuild_interval': 3600,  # seconds between full rebuilds
+}
+
+ROW_FIELDS = ('id', 'departure_city', 'arrival_city', 'departure_time', 'arrival_time', 'price', 'available_seats')
+
+
+def routing_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'ROUTING', {}))
+    return config
+
+
+def epoch(value):
+    return int(value.timestamp()) if isinstance(value, datetime) else int(value)
+
+
+def from_epoch(seconds):
+    return datetime.fromtimestamp(seconds, dt_timezone.utc)
+
+
+class FlightSchedule:
+    def __init__(self, capacity=1024):
+        self._lock = threading.RLock()
+        self.city_ids = {}
+        self.city_names = []
+        self._n = 0
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._dep_city = np.zeros(capacity, dtype=np.int32)
+        self._arr_city = np.zeros(capacity, dtype=np.int32)
+        self._dep = np.zeros(capacity, dtype=np.int64)
+        self._arr = np.zeros(capacity, dtype=np.int64)
+        self._price = np.zeros(capacity, dtype=np.int64)  # cents
+        self._seats = np.zeros(capacity, dtype=np.int32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        # Slots 0.._sorted_n - 1 hold ids in ascending order; later slots are looked up in _extra.
+        self._sorted_n = 0
+        self._extra = {}
+        # Per departure city: departure times and slots, sorted by departure time
+        self._city_dep = []
+        self._city_slots = []
+
+    def __len__(self):
+        return int(self._alive[:self._n].sum())
+
+    @property
+    def nbytes(self):
+        columns = (self._ids, self._dep_city, self._arr_city, self._dep, self._arr, self._price, self._seats, self._alive)
+        return sum(c.nbytes for c in columns) + sum(a.nbytes for a in self._city_dep) + sum(a.nbytes for a in self._city_slots)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (id, departure_city, arrival_city, departure, arrival, price, seats) rows"""
+        schedule = cls(capacity=1)
+        city = schedule.city
+        columns = ([], [], [], [], [], [], [])
+        ids, dep_city, arr_city, dep, arr, price, seats = columns
+        for pk, departure_city, arrival_city, departure, arrival, fare, available in rows:
+            ids.append(pk)
+            dep_city.append(city(departure_city))
+            arr_city.append(city(arrival_city))
+            dep.append(epoch(departure))
+            arr.append(epoch(arrival))
+            price.append(round(fare * 100))
+            seats.append(available)
+        order = np.argsort(np.asarray(ids, dtype=np.int64), kind='stable')
+        for name, values, dtype in zip(('_ids', '_dep_city', '_arr_city', '_dep', '_arr', '_price', '_seats'),
+                                       columns, (np.int64, np.int32, np.int32, np.int64, np.int64, np.int64, np.int32)):
+            column = np.zeros(max(len(ids), 1), dtype=dtype)
+            column[:len(ids)] = np.asarray(values, dtype=dtype)[order]
+            setattr(schedule, name, column)
+        schedule._alive = np.zeros(max(len(ids), 1), dtype=bool)
+        schedule._alive[:len(ids)] = True
+        schedule._n = schedule._sorted_n = len(ids)
+        schedule._index_cities()
+        return schedule
+
+    def city(self, name):
+        city = self.city_ids.get(name)
+        if city is None:
+            city = self.city_ids[name] = len(self.city_names)
+            self.city_names.append(name)
+            self._city_dep.append(np.zeros(0, dtype=np.int64))
+            self._city_slots.append(np.zeros(0, dtype=np.int32))
+        return city
+
+    def _grow(self):
+        capacity = len(self._ids) * 2
+        for column in ('_ids', '_dep_city', '_arr_city', '_dep', '_arr', '_price', '_seats', '_alive'):
+            values = getattr(self, column)
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[:len(values)] = values
+            setattr(self, column, grown)
+
+    def _write(self, slot, row):
+        pk, departure_city, arrival_city, departure, arrival, price, seats = row
+        self._ids[slot] = pk
+        self._dep_city[slot] = self.city(departure_city)
+        self._arr_city[slot] = self.city(arrival_city)
+        self._dep[slot] = epoch(departure)
+        self._arr[slot] = epoch(arrival)
+        self._price[slot] = round(price * 100)
+        self._seats[slot] = seats
+        self._alive[slot] = True
+
+    def _append(self, row):
+        if self._n == len(self._ids):
+            self._grow()
+        slot = self._n
+        self._write(slot, row)
+        self._n += 1
+        return slot
+
+    def _index_cities(self):
+        slots = np.arange(self._n, dtype=np.int32)[self._alive[:self._n]]
+        order = np.lexsort((self._dep[slots], self._dep_city[slots]))
+        slots = slots[order]
+        cities = self._dep_city[slots]
+        bounds = np.searchsorted(cities, np.arange(len(self.city_names) + 1))
+        self._city_slots = [slots[bounds[c]:bounds[c + 1]] for c in range(len(self.city_names))]
+        self._city_dep = [self._dep[s] for s in self._city_slots]
+
+    def slot_of(self, pk):
+        if pk in self._extra:
+            return self._extra[pk]
+        i = int(np.searchsorted(self._ids[:self._sorted_n], pk))
+        if i < self._sorted_n and self._ids[i] == pk:
+            return i
+        return None
+
+    def _unlink(self, slot):
+        city = self._dep_city[slot]
+        dep, slots = self._city_dep[city], self._city_slots[city]
+        lo, hi = np.searchsorted(dep, self._dep[slot], 'left'), np.searchsorted(dep, self._dep[slot], 'right')
+        position = lo + int(np.flatnonzero(slots[lo:hi] == slot)[0])
+        self._city_dep[city] = np.delete(dep, position)
+        self._city_slots[city] = np.delete(slots, position)
+
+    def _link(self, slot):
+        city = self._dep_city[slot]
+        position = np.searchsorted(self._city_dep[city], self._dep[slot], 'right')
+        self._city_dep[city] = np.insert(self._city_dep[city], position, self._dep[slot])
+        self._city_slots[city] = np.insert(self._city_slots[city], position, slot)
+
+    def upsert(self, row):
+        """Add a flight or replace the one with the same id"""
+        with self._lock:
+            slot = self.slot_of(row[0])
+            if slot is None:
+                slot = self._append(row)
+                self._extra[row[0]] = slot
+            else:
+                if self._alive[slot]:
+                    self._unlink(slot)
+                self._write(slot, row)
+            self._link(slot)
+
+    def remove(self, pk):
+        with self._lock:
+            slot = self.slot_of(pk)
+            if slot is not None and self._alive[slot]:
+                self._unlink(slot)
+                self._alive[slot] = False
+
+    def departures(self, city, start, end):
+        """Slots of the flights leaving ``city`` in [start, end]"""
+        dep = self._city_dep[city]
+        lo, hi = np.searchsorted(dep, start, 'left'), np.searchsorted(dep, end, 'right')
+        return self._city_slots[city][lo:hi]
+
+    def search(self, origin, destination, departure, optimize='earliest', travellers=1, min_connection=None,
+               max_connection=None, max_legs=None, departure_window=None, max_trip=None):
+        """The earliest-arriving or cheapest itinerary as a dict, or None if there is none"""
+        config = routing_settings()
+        min_connection = (config['min_connection_minutes'] if min_connection is None else min_connection) * 60
+        max_connection = (config['max_connection_minutes'] if max_connection is None else max_connection) * 60
+        max_legs = config['max_legs'] if max_legs is None else max_legs
+        window = (config['departure_window_hours'] if departure_window is None else departure_window) * 3600
+        max_trip = (config['max_trip_hours'] if max_trip is None else max_trip) * 3600
+        cheapest = optimize == 'cheapest'
+
+        with self._lock:
+            origin, destination = self.city_ids.get(origin), self.city_ids.get(destination)
+            if origin is None or destination is None or origin == destination:
+                return None
+            start = epoch(departure)
+            horizon = start + max_trip
+
+            def viable(slots):
+                slots = slots[(self._seats[slots] >= travellers) & (self._arr[slots] <= horizon)]
+                return slots[self._arr_city[slots] != origin]
+
+            heap = []
+            best = {}
+            parent = {}
+            for slot in viable(self.departures(origin, start, start + window)).tolist():
+                key = int(self._price[slot] if cheapest else self._arr[slot])
+                best[(slot, 1)] = key
+                parent[(slot, 1)] = None
+                heap.append((key, 1, slot))
+            heapq.heapify(heap)
+
+            settled = {}
+            while heap:
+                key, legs, slot = heapq.heappop(heap)
+                if best.get((slot, legs)) != key or settled.get(slot, max_legs + 1) <= legs:
+                    continue
+                settled[slot] = legs
+                city = self._arr_city[slot]
+                if city == destination:
+                    return self._itinerary(slot, legs, parent)
+                if legs == max_legs:
+                    continue
+                landed = self._arr[slot]
+                following = viable(self.departures(city, landed + min_connection, min(landed + max_connection, horizon)))
+                if cheapest:
+                    keys = key + self._price[following]
+                else:
+                    keys = self._arr[following]
+                for next_slot, next_key in zip(following.tolist(), keys.tolist()):
+                    state = (next_slot, legs + 1)
+                    if next_key < best.get(state, next_key + 1) and settled.get(next_slot, max_legs + 1) > legs + 1:
+                        best[state] = next_key
+                        parent[state] = slot
+                        heapq.heappush(heap, (next_key, legs + 1, next_slot))
+            return None
+
+    def _itinerary(self, slot, legs, parent):
+        slots = []
+        while slot is not None:
+            slots.append(slot)
+            slot, legs = parent[(slot, legs)], legs - 1
+        slots.reverse()
+        return {
+            'flight_ids': [int(self._ids[s]) for s in slots],
+            'departure': from_epoch(int(self._dep[slots[0]])),
+            'arrival': from_epoch(int(self._arr[slots[-1]])),
+            'price_cents': int(sum(int(self._price[s]) for s in slots)),
+        }
+
+
+def flight_rows(queryset=None):
+    queryset = Flight.objects.all() if queryset is None else queryset
+    return queryset.order_by('id').values_list(*ROW_FIELDS).iterator(chunk_size=10000)
+
+
+def build_schedule():
+    with use_replica():
+        last_updated = Flight.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+        schedule = FlightSchedule.from_rows(flight_rows())
+    # Read before the rows, so the first sync also catches flights changed while this build ran
+    schedule.last_updated = last_updated
+    schedule.synced_at = time.monotonic()
+    return schedule
+
+
+class ScheduleHolder:
+    def __init__(self):
+        self.builds = BackgroundBuild('flight schedule', build_schedule)
+        self.lock = threading.Lock()
+
+    @property
+    def schedule(self):
+        return self.builds.value
+
+    def get(self):
+        config = routing_settings()
+        schedule = self.builds.get(config['rebuild_interval'])
+        if schedule is not None and time.monotonic() - schedule.synced_at > config['refresh_interval']:
+            with self.lock:
+                if time.monotonic() - schedule.synced_at > config['refresh_interval']:
+                    self.sync(schedule)
+        return schedule
+
+    def sync(self, schedule):
+        """Apply flights updated since the last build or sync"""
+        if schedule.last_updated is not None:
+            with use_replica():
+                changed = list(Flight.objects.filter(updated_at__gte=schedule.last_updated)
+                               .values_list(*ROW_FIELDS, 'updated_at'))
+            for *row, updated_at in changed:
+                schedule.upsert(row)
+                schedule.last_updated = max(schedule.last_updated, updated_at)
+        schedule.synced_at = time.monotonic()
+
+    def apply(self, method, value):
+        schedule = self.schedule
+        if schedule is not None:
+            getattr(schedule, method)(value)
+
+
+_holder = ScheduleHolder()
+
+
+def get_schedule():
+    """The process-wide schedule, or None until its first build is done; synced, and rebuilt in the background"""
+    return _holder.get()
+
+
+def refresh_schedule():
+    """Build the schedule in this thread and swap it in"""
+    return _holder.builds.refresh()
+
+
+def reset_schedule():
+    """Drop the process-wide schedule (used by tests)"""
+    _holder.builds.reset()
+
+
+def instance_row(instance):
+    """The schedule row of a saved Flight, whose fields may still hold the strings they were assigned"""
+    row = []
+    for name in ROW_FIELDS:
+        value = Flight._meta.get_field(name).to_python(getattr(instance, name))
+        if isinstance(value, datetime) and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        row.append(value)
+    return tuple(row)
+
+
+def schedule_flight_saved(sender, instance, **kwargs):
+    """post_save receiver for Flight, applied on commit"""
+    if _holder.schedule is not None:
+        row = instance_row(instance)
+        transaction.on_commit(lambda: _holder.apply('upsert', row))
+
+
+def schedule_flight_deleted(sender, instance, **kwargs):
+    """post_delete receiver for Flight, applied on commit"""
+    if _holder.schedule is not None:
+        pk = instance.pk
+        transaction.on_commit(lambda: _holder.apply('remove', pk))
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Flight, Hotel, MatchTicket, Activity, Booking, Package
+from .models import Flight, FlightPriceDay, Hotel, MatchTicket, Activity, Booking, Package
+from .autocomplete import KINDS, autocomplete_settings
+from .trip_finder import trip_settings
 
 User = get_user_model()
 
@@ -167,4 +169,56 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             phone_number=validated_data.get('phone_number', ''),
             address=validated_data.get('address', '')
         )
-        return user 
\ No newline at end of file
+        return user
+
+class TripFinderQuerySerializer(serializers.Serializer):
+    ticket = serializers.PrimaryKeyRelatedField(queryset=MatchTicket.objects.all())
+    origin = serializers.CharField(max_length=100, required=False)
+    city = serializers.CharField(max_length=100, required=False)
+    travellers = serializers.IntegerField(min_value=1, max_value=20, default=1)
+    rooms = serializers.IntegerField(min_value=1, max_value=10, default=1)
+    nights = serializers.IntegerField(min_value=1, max_value=30, required=False)
+    days_before = serializers.IntegerField(min_value=0, max_value=14, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=20, required=False)
+
+    def validate(self, data):
+        config = trip_settings()
+        data.setdefault('nights', config['nights'])
+        data.setdefault('days_before', config['days_before'])
+        data.setdefault('limit', config['limit'])
+        if data['nights'] <= data['days_before']:
+            raise serializers.ValidationError('The stay must include the match day: nights must be greater than days_before.')
+        return data
+
+class RouteQuerySerializer(serializers.Serializer):
+    origin = serializers.CharField(max_length=100)
+    destination = serializers.CharField(max_length=100)
+    departure = serializers.DateTimeField()
+    optimize = serializers.ChoiceField(choices=['earliest', 'cheapest'], required=False)
+    travellers = serializers.IntegerField(min_value=1, max_value=20, default=1)
+    min_connection = serializers.IntegerField(min_value=0, max_value=24 * 60, required=False)
+    max_connection = serializers.IntegerField(min_value=1, max_value=48 * 60, required=False)
+    max_legs = serializers.IntegerField(min_value=1, max_value=4, required=False)
+
+    def validate(self, data):
+        if data.get('min_connection', 0) > data.get('max_connection', data.get('min_connection', 0)):
+            raise serializers.ValidationError('min_connection must not exceed max_connection.')
+        return data
+
+class PriceCalendarQuerySerializer(serializers.Serializer):
+    origin = serializers.CharField(max_length=100)
+    destination = serializers.CharField(max_length=100)
+    month = serializers.DateField(input_formats=['%Y-%m'])
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100)
+    kind = serializers.MultipleChoiceField(choices=KINDS, required=False)
+    limit = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_limit(self, value):
+        return min(value, autocomplete_settings()['limit'])
+
+class FlightPriceDaySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FlightPriceDay
+        fields = ('date', 'min_price', 'available_seats', 'flights')
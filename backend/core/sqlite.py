@@ -0,0 +1,217 @@
+"""
+SQLite production profile and serialized write lane.
+
+With ``settings.SQLITE_PROFILE['enabled']`` every new SQLite connection gets
+WAL journaling, a busy timeout, memory-mapped reads and relaxed fsyncs. Writes
+sent through ``run_write`` are funneled through one thread with its own
+connection, so there is only ever one writer and readers never see "database
+is locked". The lane commits queued writes in small batches (each write in its
+own savepoint) and checkpoints the WAL when it goes idle.
+"""
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'enabled': False,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout_ms': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'write_lane': True,
+    'max_batch': 32,
+    'checkpoint_interval': 30.0,
+}
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+CHECKPOINT_MODES = {'PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'}
+
+
+def sqlite_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SQLITE_PROFILE', {}))
+    return config
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """connection_created receiver applying the production PRAGMAs"""
+    config = sqlite_settings()
+    if connection.vendor != 'sqlite' or not config['enabled']:
+        return
+    journal_mode = config['journal_mode'].upper()
+    synchronous = config['synchronous'].upper()
+    if journal_mode not in JOURNAL_MODES or synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError(f"Invalid SQLITE_PROFILE journal_mode {journal_mode!r} or synchronous {synchronous!r}")
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA busy_timeout={int(config['busy_timeout_ms'])}")
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(config['mmap_size'])}")
+
+
+def checkpoint(using=DEFAULT_DB_ALIAS, mode='PASSIVE'):
+    """Copy WAL pages back into the database; returns (busy, wal pages, checkpointed pages)"""
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Invalid checkpoint mode {mode!r}")
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"PRAGMA wal_checkpoint({mode})")
+        return cursor.fetchone()
+
+
+class WriteLane:
+    """A dedicated thread and connection that performs every funneled write"""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, max_batch=32, checkpoint_interval=30.0):
+        self.using = using
+        self.max_batch = max_batch
+        self.checkpoint_interval = checkpoint_interval
+        self.stats = {'writes': 0, 'errors': 0, 'batches': 0, 'checkpoints': 0}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f'write-lane-{self.using}', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)``; the Future resolves once its batch is committed"""
+        future = Future()
+        if threading.current_thread() is self._thread:
+            # A write issued from inside the lane would wait on itself; it joins the open batch.
+            try:
+                with transaction.atomic(using=self.using):
+                    future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self.start()
+        # The job runs in the caller's context so request-scoped state (e.g. replica pins) follows it.
+        self._queue.put((future, contextvars.copy_context(), func, args, kwargs))
+        return future
+
+    def run(self, func, *args, timeout=None, **kwargs):
+        return self.submit(func, *args, **kwargs).result(timeout)
+
+    def _run(self):
+        last_checkpoint, dirty = time.monotonic(), False
+        try:
+            while True:
+                try:
+                    job = self._queue.get(timeout=self.checkpoint_interval or None)
+                except queue.Empty:
+                    if dirty:
+                        self._checkpoint()
+                        last_checkpoint, dirty = time.monotonic(), False
+                    continue
+                batch, stopping = [], job is None
+                while job is not None:
+                    batch.append(job)
+                    if len(batch) >= self.max_batch:
+                        break
+                    try:
+                        job = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    stopping = job is None
+                if batch:
+                    self._commit(batch)
+                    dirty = True
+                if stopping:
+                    return
+                if dirty and self.checkpoint_interval and time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                    self._checkpoint()
+                    last_checkpoint, dirty = time.monotonic(), False
+        finally:
+            connections[self.using].close()
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.using):
+                for future, context, func, args, kwargs in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append((future, context.run(func, *args, **kwargs), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            logger.error(f"Write lane commit failed: {str(e)}", exc_info=True)
+            connections[self.using].close_if_unusable_or_obsolete()
+            self.stats['errors'] += len(batch)
+            for future, *_ in batch:
+                future.set_exception(e)
+            return
+
+        self.stats['batches'] += 1
+        for future, result, error in outcomes:
+            if error is None:
+                self.stats['writes'] += 1
+                future.set_result(result)
+            else:
+                self.stats['errors'] += 1
+                future.set_exception(error)
+
+    def _checkpoint(self):
+        try:
+            checkpoint(self.using)
+            self.stats['checkpoints'] += 1
+        except Exception as e:
+            logger.warning(f"WAL checkpoint failed: {str(e)}")
+
+
+_lanes = {}
+_lanes_lock = threading.Lock()
+
+
+def lane_enabled(using=DEFAULT_DB_ALIAS):
+    config = sqlite_settings()
+    return config['enabled'] and config['write_lane'] and connections[using].vendor == 'sqlite'
+
+
+def get_write_lane(using=DEFAULT_DB_ALIAS):
+    with _lanes_lock:
+        if using not in _lanes:
+            config = sqlite_settings()
+            _lanes[using] = WriteLane(using, max_batch=config['max_batch'], checkpoint_interval=config['checkpoint_interval'])
+        return _lanes[using]
+
+
+def reset_write_lanes():
+    with _lanes_lock:
+        lanes = list(_lanes.values())
+        _lanes.clear()
+    for lane in lanes:
+        lane.stop()
+
+
+def run_write(func, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Run a write through the write lane, or inline in a transaction when the lane is off"""
+    # A caller already inside a transaction keeps its writes in that transaction.
+    if lane_enabled(using) and not connections[using].in_atomic_block:
+        return get_write_lane(using).run(func, *args, **kwargs)
+    with transaction.atomic(using=using):
+        return func(*args, **kwargs)
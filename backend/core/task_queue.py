@@ -0,0 +1,215 @@
+"""
+Durable background tasks stored in the app's own database.
+
+Declare work with ``@task`` in an app's ``tasks.py`` module, and queue it
+from a request with ``func.enqueue(**kwargs)``. The task row is written in
+the caller's transaction, so a rolled-back request queues nothing. Payloads
+go through ``DjangoJSONEncoder``: datetimes and Decimals arrive in the task
+as strings.
+
+``python manage.py run_workers`` starts a pool of worker processes. Each one
+claims a batch of due tasks, highest ``priority`` first:
+- on PostgreSQL, with ``SELECT ... FOR UPDATE SKIP LOCKED``, so workers
+  never wait on each other's rows;
+- on SQLite, which has no row locks, with a conditional ``UPDATE ... WHERE
+  status = 'queued'``. It runs as one statement, so only one worker can win
+  a given row.
+
+A task runs in a transaction together with the deletion of its row. A
+failure puts it back in the queue after an exponential backoff. Once it has
+used ``max_attempts`` attempts it stays in the table as ``dead`` with its
+last traceback, for ``run_workers --retry-dead`` or the admin to requeue.
+A task left ``running`` for ``timeout`` seconds by a worker that died counts
+as a failed attempt.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .metrics import record_task
+from .models import Task
+from .sqlite import run_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'processes': 2,
+    'batch_size': 10,  # tasks claimed at once by one worker
+    'poll_interval': 1.0,  # seconds an idle worker waits before looking again
+    'max_attempts': 5,
+    'backoff': 5.0,  # seconds before the first retry; doubles with each attempt
+    'max_backoff': 3600.0,
+    'timeout': 300,  # seconds after which a running task is presumed lost
+}
+
+TASKS = {}
+
+
+def queue_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'TASK_QUEUE', {}))
+    return config
+
+
+def task(func=None, *, name=None, priority=0, max_attempts=None):
+    """Register ``func`` as a background task and give it an ``enqueue(**kwargs)`` method"""
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        TASKS[task_name] = func
+
+        def enqueue(*, _priority=priority, _delay=0, **payload):
+            return enqueue_task(task_name, payload, priority=_priority, delay=_delay, max_attempts=max_attempts)
+
+        func.task_name = task_name
+        func.enqueue = enqueue
+        return func
+
+    return register(func) if func is not None else register
+
+
+def enqueue_task(name, payload, priority=0, delay=0, max_attempts=None):
+    return run_write(
+        Task.objects.create, name=name, payload=payload, priority=priority,
+        max_attempts=max_attempts or queue_settings()['max_attempts'],
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def load_tasks():
+    """Import every installed app's ``tasks`` module so its tasks are registered"""
+    autodiscover_modules('tasks')
+    return TASKS
+
+
+def backoff(attempts, config=None):
+    config = config or queue_settings()
+    return min(config['backoff'] * 2 ** max(attempts - 1, 0), config['max_backoff'])
+
+
+def due_tasks(now):
+    return Task.objects.filter(status=Task.QUEUED, run_at__lte=now).order_by('-priority', 'run_at', 'id')
+
+
+def claim(worker, limit, using=DEFAULT_DB_ALIAS):
+    """Mark up to ``limit`` due tasks as running for ``worker`` and return them"""
+    now = timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'
+    claimed = {'status': Task.RUNNING, 'locked_by': token, 'locked_at': now, 'attempts': F('attempts') + 1}
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            ids = list(due_tasks(now).using(using).select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            Task.objects.using(using).filter(pk__in=ids).update(**claimed)
+    else:
+        # Read outside a transaction: a stale SQLite read snapshot could not be upgraded to a write.
+        ids = list(due_tasks(now).using(using).values_list('pk', flat=True)[:limit])
+        if ids:
+            run_write(Task.objects.using(using).filter(pk__in=ids, status=Task.QUEUED).update, using=using, **claimed)
+    if not ids:
+        return []
+    return list(Task.objects.using(using).filter(pk__in=ids, locked_by=token).order_by('-priority', 'run_at', 'id'))
+
+
+def fail(task, error, config=None, using=DEFAULT_DB_ALIAS):
+    """Requeue ``task`` after a backoff, or dead-letter it once its attempts are used up; returns the outcome"""
+    config = config or queue_settings()
+    if task.attempts >= task.max_attempts:
+        changes, outcome = {'status': Task.DEAD}, 'dead'
+    else:
+        changes = {'status': Task.QUEUED, 'run_at': timezone.now() + timedelta(seconds=backoff(task.attempts, config))}
+        outcome = 'retried'
+    # Only the claim holder may change the row; a reclaimed task belongs to another worker now
+    run_write(Task.objects.using(using).filter(pk=task.pk, locked_by=task.locked_by).update,
+              locked_by='', last_error=error, updated_at=timezone.now(), using=using, **changes)
+    return outcome
+
+
+def execute(task, config=None, using=DEFAULT_DB_ALIAS):
+    """Run one claimed task; returns 'done', 'retried' or 'dead'"""
+    func = TASKS.get(task.name)
+    started = time.perf_counter()
+    if func is None:
+        task.attempts = task.max_attempts
+        outcome = fail(task, f'Unknown task {task.name!r}', config, using)
+    else:
+        try:
+            with transaction.atomic(using=using):
+                func(**task.payload)
+                Task.objects.using(using).filter(pk=task.pk, locked_by=task.locked_by).delete()
+            outcome = 'done'
+        except Exception:
+            logger.warning(f"Task {task.name} #{task.pk} failed on attempt {task.attempts}", exc_info=True)
+            outcome = fail(task, traceback.format_exc(), config, using)
+    record_task(task.name, outcome, time.perf_counter() - started)
+    return outcome
+
+
+def requeue_stale(config=None, using=DEFAULT_DB_ALIAS):
+    """Fail the tasks whose worker has held them longer than ``timeout``; returns how many"""
+    config = config or queue_settings()
+    cutoff = timezone.now() - timedelta(seconds=config['timeout'])
+    stale = list(Task.objects.using(using).filter(status=Task.RUNNING, locked_at__lt=cutoff))
+    for task in stale:
+        fail(task, f"Worker {task.locked_by} did not finish within {config['timeout']}s", config, using)
+    return len(stale)
+
+
+def retry_dead(names=None, using=DEFAULT_DB_ALIAS, ids=None):
+    """Put dead-lettered tasks back in the queue with fresh attempts; returns how many"""
+    dead = Task.objects.using(using).filter(status=Task.DEAD)
+    if names:
+        dead = dead.filter(name__in=names)
+    if ids is not None:
+        dead = dead.filter(pk__in=list(ids))
+    return run_write(dead.update, status=Task.QUEUED, attempts=0, run_at=timezone.now(),
+                     updated_at=timezone.now(), using=using)
+
+
+def queue_status(using=DEFAULT_DB_ALIAS):
+    """{task name: {status: count}} for every task in the table"""
+    status = {}
+    for row in Task.objects.using(using).order_by().values('name', 'status').annotate(count=Count('id')):
+        status.setdefault(row['name'], {})[row['status']] = row['count']
+    return status
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def run_worker(stop=None, once=False, config=None, using=DEFAULT_DB_ALIAS):
+    """Claim and run tasks until ``stop`` is set, or until the queue is drained when ``once``; returns outcome counts"""
+    config = config or queue_settings()
+    load_tasks()
+    name = worker_name()
+    counts = {'done': 0, 'retried': 0, 'dead': 0}
+    checked_stale = 0.0
+    while stop is None or not stop.is_set():
+        if time.monotonic() - checked_stale > config['timeout'] / 2:
+            requeue_stale(config, using)
+            checked_stale = time.monotonic()
+        tasks = claim(name, config['batch_size'], using)
+        for claimed in tasks:
+            counts[execute(claimed, config, using)] += 1
+        if not tasks:
+            if once:
+                break
+            if stop is not None:
+                stop.wait(config['poll_interval'])
+            else:
+                time.sleep(config['poll_interval'])
+    return counts
+
+
+def run_pending(using=DEFAULT_DB_ALIAS):
+    """Run every due task in this process, e.g. from tests or a cron job; returns outcome counts"""
+    return run_worker(once=True, using=using)
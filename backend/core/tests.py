@@ -1,3 +1,1226 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.shortcuts import render
+from django.http import HttpResponse
+from django.db import connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from chatbot.backends import reset_fakes
+from chatbot.loadtest import run_load
+from chatbot.models import Conversation, Match
+from chatbot.resilience import reset_dependencies
+from chatbot.retrieval import refresh_index as refresh_catalog_index, reset_index as reset_catalog_index
+from .admin_tools import estimated_count
+from .availability import BROADCASTER_CHANNEL
+from .authentication import CachedJWTAuthentication, revoke_tokens
+from .autocomplete import PrefixTrie, refresh_index, reset_index
+from .background import BUILDS, BackgroundBuild
+from .compression import compress, negotiate
+from .consumers import AvailabilityBroadcaster, AvailabilityHub, get_hub
+from .datagen import Generator
+from .db_pool import connection_metrics, pool_stats
+from .db_router import ReadReplicaRouter, ReplicaPool, ReplicaStickinessMiddleware, reset_replica_pool, use_replica
+from .fastjson import ORJSONParser, ORJSONRenderer
+from .metrics import REGISTRY
+from .query_plans import PROBLEMS as PLAN_PROBLEMS, hot_querysets, plan_problems
+from .models import Activity, Booking, Flight, FlightPriceDay, Hotel, MatchTicket, Task
+from .price_calendar import rebuild_calendar
+from .replication import copy_database
+from .routing import FlightSchedule, refresh_schedule, reset_schedule
+from .sqlite import WriteLane
+from .trip_finder import find_trip
+from .task_queue import backoff, claim, queue_status, requeue_stale, retry_dead, run_pending, task
+from .views import BookingViewSet
+
+User = get_user_model()
+
+FAKE_BACKENDS = {
+    'llm': {'BACKEND': 'chatbot.backends.FakeLLMBackend', 'OPTIONS': {}},
+    'hotels': {'BACKEND': 'chatbot.backends.FakeHotelAPI', 'OPTIONS': {}},
+}
+
+
+class CoreChatTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fan', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_requires_message(self):
+        response = self.client.post(reverse('chat_message'), {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_lists_hotels(self):
+        Hotel.objects.create(
+            name='Riad Dar Anika', city='Marrakech', address='Kasbah', description='Quiet riad',
+            price_per_night=90, available_rooms=4, rating=5,
+        )
+        response = self.client.post(reverse('chat_message'), {'message': 'Any hotel?'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Riad Dar Anika', response.data['response'])
+
+
+@override_settings(CHATBOT_BACKENDS=FAKE_BACKENDS)
+class ChatbotServiceTests(TestCase):
+    def setUp(self):
+        reset_dependencies()
+        reset_fakes()
+        refresh_catalog_index()
+        self.addCleanup(reset_catalog_index)
+
+    def post(self, message):
+        return self.client.post(reverse('chatbot:message'), {'message': message}, content_type='application/json')
+
+    def test_general_question_uses_llm_backend(self):
+        response = self.post('What should I pack for the final?')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('You asked', response.json()['response'])
+        # Logged by the task queue, off the request path
+        self.assertEqual(Conversation.objects.count(), 0)
+        self.assertEqual(run_pending()['done'], 1)
+        self.assertEqual(Conversation.objects.get().bot_message, response.json()['response'])
+
+    def test_conversation_context_is_kept_per_session(self):
+        with mock.patch('chatbot.backends.FakeLLMBackend.generate', autospec=True, return_value='Light clothes.') as generate:
+            self.post('What should I pack for the final?')
+            self.post('And for the group stage?')
+            contents = generate.call_args.args[1]
+            self.assertEqual(contents[0], {'role': 'user', 'parts': ['What should I pack for the final?']})
+            self.assertEqual(contents[1], {'role': 'model', 'parts': ['Light clothes.']})
+
+            self.client = Client()  # another visitor starts a new conversation
+            self.post('What should I pack for the final?')
+            self.assertEqual(len(generate.call_args.args[1]), 1)
+
+    def test_hotel_question_answers_from_local_data(self):
+        Hotel.objects.create(
+            name='Hotel Farah', city='Rabat', address='Avenue Chellah', description='Near the stadium',
+            price_per_night=120, available_rooms=10, rating=4,
+        )
+        response = self.post('I need a hotel in Rabat')
+        self.assertIn('Hotel Farah', response.json()['response'])
+
+    @override_settings(CHATBOT_BACKENDS={
+        'llm': {'BACKEND': 'chatbot.backends.FakeLLMBackend', 'OPTIONS': {'error_rate': 1.0}},
+        'hotels': FAKE_BACKENDS['hotels'],
+    })
+    def test_failing_llm_degrades_to_local_answer(self):
+        response = self.post('What should I pack for the final?')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('temporarily busy', response.json()['response'])
+
+
+@override_settings(CHATBOT_BACKENDS=FAKE_BACKENDS)
+class ChatLoadTestHarnessTests(TestCase):
+    def setUp(self):
+        reset_dependencies()
+        refresh_catalog_index()
+        self.addCleanup(reset_catalog_index)
+        self.user = User.objects.create_user(username='loadtest')
+
+    def test_reports_latency_and_queries(self):
+        for endpoint in ('chatbot', 'core'):
+            report = run_load(endpoint, total_requests=8, concurrency=1, user=self.user)
+            self.assertEqual(report['requests'], 8)
+            self.assertEqual(report['errors'], 0)
+            self.assertGreater(report['queries_per_request_avg'], 0)
+            self.assertLessEqual(report['latency_ms_p50'], report['latency_ms_p99'])
+
+
+@override_settings(DATABASE_REPLICAS={'replica1': {'weight': 1}}, REPLICA_HEALTH_CHECK_INTERVAL=0)
+class ReadReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        reset_replica_pool()
+        self.addCleanup(reset_replica_pool)
+        self.router = ReadReplicaRouter()
+
+    def test_only_catalog_reads_in_replica_scope_use_replica(self):
+        self.assertIsNone(self.router.db_for_read(Flight))
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Flight), 'replica1')
+            self.assertIsNone(self.router.db_for_read(Booking))
+        self.assertEqual(self.router.db_for_write(Flight), 'default')
+
+    def test_client_that_wrote_catalog_rows_is_pinned_to_primary(self):
+        seen = []
+
+        def view(request):
+            with use_replica():
+                seen.append(self.router.db_for_read(Flight))
+            if request.method == 'POST':
+                self.router.db_for_write(Flight)
+            return HttpResponse()
+
+        middleware = ReplicaStickinessMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.post('/'))
+        cookie = response.cookies[ReplicaStickinessMiddleware.cookie_name]
+
+        request = factory.get('/')
+        request.COOKIES[cookie.key] = cookie.value
+        middleware(request)
+        middleware(factory.get('/'))
+        self.assertEqual(seen, ['replica1', None, 'replica1'])
+
+    def test_pool_weights_replicas_by_health(self):
+        latency = {'fast': 0, 'slow': 0.2}
+
+        def check(alias):
+            if alias == 'down':
+                raise ConnectionError('replica unreachable')
+            time.sleep(latency[alias])
+
+        pool = ReplicaPool({'fast': {}, 'slow': {}, 'down': {}}, check_interval=60, check=check)
+        pool.choose()
+        self.assertEqual(pool.effective_weight('down'), 0)
+        self.assertGreater(pool.effective_weight('fast'), 4 * pool.effective_weight('slow'))
+
+        pool.mark_down('fast')
+        pool.mark_down('slow')
+        self.assertIsNone(pool.choose())
+
+
+class SQLiteReplicationTests(SimpleTestCase):
+    def test_copy_database_brings_replica_up_to_date(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            primary, replica = os.path.join(tmp, 'primary.sqlite3'), os.path.join(tmp, 'replica.sqlite3')
+            with sqlite3.connect(primary) as conn:
+                conn.execute('CREATE TABLE flight (id INTEGER PRIMARY KEY)')
+                conn.execute('INSERT INTO flight VALUES (1)')
+            conn.close()
+            copy_database(primary, replica)
+
+            conn = sqlite3.connect(replica)
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM flight').fetchone(), (1,))
+            conn.close()
+
+
+@override_settings(SQLITE_PROFILE={'enabled': True})
+class SQLiteProfileTests(SimpleTestCase):
+    def test_new_connections_get_production_pragmas(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            settings_dict = dict(connections['default'].settings_dict, NAME=os.path.join(tmp, 'profile.sqlite3'))
+            connection = DatabaseWrapper(settings_dict, alias='profile')
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone(), ('wal',))
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone(), (5000,))
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone(), (1,))
+            finally:
+                connection.close()
+
+
+class WriteLaneTests(TransactionTestCase):
+    def setUp(self):
+        self.lane = WriteLane(checkpoint_interval=0)
+        self.addCleanup(self.lane.stop)
+
+    def test_writes_from_many_threads_go_through_one_thread(self):
+        writers = set()
+
+        def write(i):
+            writers.add(threading.current_thread().name)
+            return Conversation.objects.create(user_message=f"message {i}").pk
+
+        futures = [self.lane.submit(write, i) for i in range(20)]
+        pks = [future.result(timeout=5) for future in futures]
+        self.assertEqual(len(set(pks)), 20)
+        self.assertEqual(writers, {'write-lane-default'})
+        self.assertEqual(Conversation.objects.count(), 20)
+
+    def test_failed_write_only_rolls_back_itself(self):
+        def fail():
+            Conversation.objects.create(user_message='lost')
+            raise ValueError('bad booking')
+
+        futures = [
+            self.lane.submit(Conversation.objects.create, user_message='kept'),
+            self.lane.submit(fail),
+        ]
+        self.assertIsNotNone(futures[0].result(timeout=5))
+        with self.assertRaises(ValueError):
+            futures[1].result(timeout=5)
+        self.assertEqual(list(Conversation.objects.values_list('user_message', flat=True)), ['kept'])
+
+
+class DBConnectionPoolTests(SimpleTestCase):
+    def test_pool_stats_report_wait_time_and_utilization(self):
+        class FakePool:
+            def get_stats(self):
+                return {'pool_min': 2, 'pool_max': 4, 'pool_size': 4, 'pool_available': 1, 'requests_num': 10,
+                        'requests_queued': 4, 'requests_wait_ms': 80, 'requests_errors': 1, 'connections_num': 4}
+
+        stats = pool_stats(FakePool())
+        self.assertEqual(stats['in_use'], 3)
+        self.assertEqual(stats['utilization'], 0.75)
+        self.assertEqual(stats['wait_ms_avg'], 8.0)
+        self.assertEqual(stats['wait_ms_avg_queued'], 20.0)
+        self.assertEqual(stats['timeouts'], 1)
+
+    def test_default_database_closes_connections_and_health_checks_them(self):
+        # Persistent connections leak under ASGI; DB_CONN_MAX_AGE opts in under WSGI
+        metrics = connection_metrics()['default']
+        self.assertEqual(metrics['conn_max_age'], 0)
+        self.assertTrue(metrics['health_checks'])
+        self.assertIsNone(metrics['pool'])
+
+
+class GenerateFixturesTests(TestCase):
+    def test_command_fills_every_table_with_linked_rows(self):
+        call_command('generate_fixtures', scale=0.01, seed=5, stdout=io.StringIO())
+
+        self.assertEqual(Flight.objects.count(), 100)
+        self.assertEqual(MatchTicket.objects.count(), 156 * 3)
+        self.assertEqual(Booking.objects.count(), 5)
+        self.assertTrue(Booking.flight.through.objects.exists())
+        self.assertEqual(Conversation.objects.count(), 10)
+        created = list(Conversation.objects.order_by('pk').values_list('created_at', flat=True))
+        self.assertEqual(created, sorted(created))
+        self.assertGreater(created[-1] - created[0], timedelta(days=365))
+        self.assertEqual(User.objects.filter(username__startswith='fan_5_').count(), 1)
+
+    def test_same_seed_generates_the_same_rows(self):
+        def flights(seed):
+            Flight.objects.all().delete()
+            Generator(scale=0.01, seed=seed).generate_flights()
+            return list(Flight.objects.order_by('pk').values_list('flight_number', 'arrival_city', 'departure_time', 'price'))
+
+        self.assertEqual(flights(1), flights(1))
+        self.assertNotEqual(flights(1), flights(2))
+
+
+class BenchmarkSuiteTests(SimpleTestCase):
+    def test_compare_flags_only_regressions_past_their_threshold(self):
+        from benchmarks.suite import DEFAULT_THRESHOLDS, compare
+
+        baseline = {'scenarios': {'flight_list': {'latency_ms_p95': 10.0, 'queries_avg': 2.0, 'peak_memory_kib': 100.0},
+                                  'hotel_list': {'latency_ms_p95': 0.5, 'queries_avg': 2.0}}}
+        results = {'scenarios': {'flight_list': {'latency_ms_p95': 20.0, 'queries_avg': 3.0, 'peak_memory_kib': 110.0},
+                                 'hotel_list': {'latency_ms_p95': 1.2, 'queries_avg': 2.0},
+                                 'new_scenario': {'latency_ms_p95': 99.0}}}
+        regressions = compare(results, baseline, DEFAULT_THRESHOLDS)
+        self.assertEqual(
+            [(name, metric) for name, metric, *_ in regressions],
+            [('flight_list', 'latency_ms_p95'), ('flight_list', 'queries_avg')],
+        )
+
+
+class StartupTimeTests(SimpleTestCase):
+    def test_setup_and_urlconf_stay_within_budget(self):
+        from benchmarks.startup import BUDGET_SECONDS, measure
+
+        report = measure()
+        self.assertEqual(report['lazy_modules_loaded'], [])
+        self.assertLess(report['total_seconds'], BUDGET_SECONDS)
+
+    def test_importtime_output_is_parsed(self):
+        from benchmarks.startup import parse_importtime
+
+        modules = parse_importtime("import time: self [us] | cumulative | imported package\n"
+                                   "import time:       120 |        120 |   json.decoder\n"
+                                   "import time:       300 |       1420 | json\n")
+        self.assertEqual(modules[0], {'module': 'json.decoder', 'self_ms': 0.12, 'cumulative_ms': 0.12, 'depth': 1})
+        self.assertEqual(modules[1]['cumulative_ms'], 1.42)
+
+
+class RequestTimingTests(TestCase):
+    def setUp(self):
+        Flight.objects.create(flight_number='AT200', departure_city='Paris', arrival_city='Rabat',
+                              departure_time='2025-12-20T10:00:00Z', arrival_time='2025-12-20T13:00:00Z',
+                              price=120, available_seats=10)
+        self.admin = User.objects.create_user(username='ops', password='pass', is_staff=True)
+
+    def test_disabled_timing_adds_no_header(self):
+        response = Client(HTTP_HOST='localhost').get('/api/api/flights/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_server_timing_header_and_log_line(self):
+        with override_settings(REQUEST_TIMING={'enabled': True}), self.assertLogs('core.profiling', 'INFO') as logs:
+            response = Client(HTTP_HOST='localhost').get('/api/api/flights/')
+
+        phases = {entry.split(';')[0] for entry in response['Server-Timing'].split(', ')}
+        self.assertTrue({'db', 'serialize', 'render', 'total'} <= phases)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'flight-list')
+        self.assertEqual(record['phases']['db']['count'], 1)
+
+    def test_profile_header_is_honoured_for_staff_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with override_settings(REQUEST_TIMING={'enabled': True, 'log': False, 'profile_dir': tmp}):
+                client = Client(HTTP_HOST='localhost')
+                anonymous = client.get('/api/api/flights/', headers={'X-Profile': 'cprofile'})
+                token = AccessToken.for_user(self.admin)
+                staff = client.get('/api/api/flights/', headers={'X-Profile': 'cprofile', 'Authorization': f"Bearer {token}"})
+
+            self.assertNotIn('X-Profile-File', anonymous)
+            self.assertTrue(os.path.exists(os.path.join(tmp, staff['X-Profile-File'])))
+
+
+MULTIPROCESS_SCRIPT = """
+import os, django
+django.setup()
+from core.metrics import generate_latest, record_booking, registry
+record_booking('created')
+pid = os.fork()
+if pid == 0:
+    record_booking('created')
+    os._exit(0)
+os.waitpid(pid, 0)
+print(generate_latest(registry()).decode())
+"""
+
+
+class PrometheusMetricsTests(TestCase):
+    def setUp(self):
+        self.flight = Flight.objects.create(flight_number='AT300', departure_city='Paris', arrival_city='Rabat',
+                                            departure_time='2025-12-20T10:00:00Z', arrival_time='2025-12-20T13:00:00Z',
+                                            price=120, available_seats=10)
+        self.user = User.objects.create_user(username='metrics', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_and_queries_are_labelled_by_url_name(self):
+        requests = self.sample('fanzone_http_requests_total', view='flight-list', method='GET', status='200')
+        queries = self.sample('fanzone_db_queries_total', alias='default', view='flight-list')
+
+        Client(HTTP_HOST='localhost').get('/api/api/flights/')
+        Client(HTTP_HOST='localhost').get('/no/such/page/')
+
+        self.assertEqual(self.sample('fanzone_http_requests_total', view='flight-list', method='GET', status='200'), requests + 1)
+        self.assertEqual(self.sample('fanzone_db_queries_total', alias='default', view='flight-list'), queries + 1)
+        self.assertGreater(self.sample('fanzone_http_requests_total', view='<unresolved>', method='GET', status='404'), 0)
+        with override_settings(DEBUG=True):
+            body = Client(HTTP_HOST='localhost').get('/metrics').content.decode()
+        self.assertIn('fanzone_http_request_duration_seconds_bucket{le="0.005",method="GET",view="flight-list"}', body)
+
+    def test_booking_outcomes(self):
+        created = self.sample('fanzone_bookings_total', outcome='created')
+        cancelled = self.sample('fanzone_bookings_total', outcome='cancelled')
+
+        response = self.client.post('/api/api/bookings/', {'flight_ids': [self.flight.pk], 'total_price': '120.00'}, format='json')
+        self.client.patch(f"/api/api/bookings/{response.data['id']}/", {'status': 'cancelled'}, format='json')
+
+        self.assertEqual(self.sample('fanzone_bookings_total', outcome='created'), created + 1)
+        self.assertEqual(self.sample('fanzone_bookings_total', outcome='cancelled'), cancelled + 1)
+
+    def test_dependency_errors_are_counted(self):
+        from chatbot.resilience import Dependency
+
+        def fail():
+            raise ValueError('boom')
+
+        dependency = Dependency('metrics-test', timeout=1)
+        with self.assertRaises(ValueError):
+            dependency.call(fail)
+        dependency.call(lambda: 'ok')
+
+        self.assertEqual(self.sample('fanzone_dependency_errors_total', dependency='metrics-test', reason='ValueError'), 1)
+        self.assertEqual(self.sample('fanzone_dependency_call_duration_seconds_count', dependency='metrics-test', outcome='ok'), 1)
+
+    def test_token_protects_the_endpoint(self):
+        with override_settings(METRICS={'token': 'scrape'}):
+            client = Client(HTTP_HOST='localhost')
+            self.assertEqual(client.get('/metrics').status_code, 403)
+            self.assertEqual(client.get('/metrics', headers={'Authorization': 'Bearer scrape'}).status_code, 200)
+        with override_settings(METRICS={}):
+            self.assertEqual(client.get('/metrics').status_code, 404)
+
+    def test_multiprocess_mode_aggregates_workers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory, DJANGO_SETTINGS_MODULE='fanzone_backend.settings')
+            result = subprocess.run([sys.executable, '-W', 'ignore', '-c', MULTIPROCESS_SCRIPT], env=env,
+                                    capture_output=True, text=True, check=True)
+
+        self.assertIn('fanzone_bookings_total{outcome="created"} 2.0', result.stdout)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='jwt', password='pass', email='jwt@example.com')
+        self.client = Client(HTTP_HOST='localhost')
+
+    def get_bookings(self, token=None):
+        token = token or AccessToken.for_user(self.user)
+        return self.client.get('/api/api/bookings/', headers={'Authorization': f"Bearer {token}"})
+
+    def test_cached_state_saves_the_user_query(self):
+        self.get_bookings()
+        with CaptureQueriesContext(connection) as cached:
+            self.assertEqual(self.get_bookings().status_code, 200)
+        with mock.patch.object(BookingViewSet, 'authentication_classes', [JWTAuthentication]):
+            with CaptureQueriesContext(connection) as uncached:
+                self.assertEqual(self.get_bookings().status_code, 200)
+        self.assertEqual(len(cached), len(uncached) - 1)
+
+    def test_deactivation_and_revocation_apply_immediately(self):
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(self.get_bookings(token).status_code, 200)
+
+        revoke_tokens(self.user)
+        self.assertEqual(self.get_bookings(token).status_code, 401)
+        User.objects.filter(pk=self.user.pk).update(tokens_revoked_at=timezone.now() - timedelta(minutes=1))
+        cache.clear()
+        self.assertEqual(self.get_bookings().status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_bookings().status_code, 401)
+
+    def test_refresh_tokens_are_revoked_too(self):
+        refresh = RefreshToken.for_user(self.user)
+        response = self.client.post('/api/token/refresh/', {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_bookings(response.json()['access']).status_code, 200)
+
+        revoke_tokens(self.user)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': str(refresh)}).status_code, 401)
+        User.objects.filter(pk=self.user.pk).update(tokens_revoked_at=timezone.now() - timedelta(minutes=1))
+        cache.clear()
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': str(refresh)}).status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': str(refresh)}).status_code, 401)
+
+    def test_deferred_fields_load_in_one_query(self):
+        user = CachedJWTAuthentication().get_user(AccessToken.for_user(self.user))
+        self.assertEqual(user.role, 'user')
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'jwt@example.com')
+            self.assertEqual(user.phone_number, '')
+
+
+class FastJSONTests(SimpleTestCase):
+    payload = {
+        'flights': [{'id': 1, 'price': Decimal('120.50'), 'departure_time': datetime(2025, 12, 20, 10, 0, 0, 123456, dt_timezone.utc),
+                     'arrival_time': datetime(2025, 12, 20, 13, 0, tzinfo=dt_timezone(timedelta(hours=1))),
+                     'city': 'Fès \u2028 Marrakech', 'airline': None, 'seats': 0, 'ratio': 0.5}],
+        'count': 1,
+    }
+
+    def test_output_matches_the_stdlib_renderer(self):
+        self.assertEqual(ORJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        indented = 'application/json; indent=4'
+        self.assertEqual(ORJSONRenderer().render(self.payload, indented), JSONRenderer().render(self.payload, indented))
+        with mock.patch('core.fastjson.orjson', None):
+            self.assertEqual(ORJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_parser(self):
+        def parse(body):
+            return ORJSONParser().parse(io.BytesIO(body), parser_context={'encoding': 'utf-8'})
+
+        self.assertEqual(parse(b'{"flight_ids": [1, 2], "total_price": "120.00"}'), {'flight_ids': [1, 2], 'total_price': '120.00'})
+        self.assertEqual(parse(b'{"id": 123456789012345678901234567890}'), {'id': 123456789012345678901234567890})
+        for body in (b'{"price": NaN}', b'{"price": '):
+            with self.assertRaises(ParseError):
+                parse(body)
+
+
+class ResponseCompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(30):
+            Flight.objects.create(flight_number=f'AT{i:03}', departure_city='Paris', arrival_city='Rabat',
+                                  departure_time='2025-12-20T10:00:00Z', arrival_time='2025-12-20T13:00:00Z',
+                                  price=120, available_seats=10)
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_negotiation(self):
+        supported = ['br', 'zstd', 'gzip']
+        self.assertEqual(negotiate('gzip, deflate, br', supported), 'br')
+        self.assertEqual(negotiate('gzip, br;q=0.5', supported), 'gzip')
+        self.assertEqual(negotiate('gzip;q=0, *', supported), 'br')
+        self.assertIsNone(negotiate('identity', supported))
+        self.assertIsNone(negotiate('', supported))
+
+    def test_catalog_responses_are_compressed_once_and_cached(self):
+        plain = self.client.get('/api/api/flights/')
+        self.assertNotIn('Content-Encoding', plain)
+
+        with mock.patch('core.compression.compress', wraps=compress) as compressor:
+            first = self.client.get('/api/api/flights/', headers={'Accept-Encoding': 'gzip'})
+            with self.assertNumQueries(0):
+                second = self.client.get('/api/api/flights/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressor.call_count, 1)
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', second['Vary'])
+        self.assertEqual(gzip.decompress(second.content), plain.content)
+        self.assertEqual(first.content, second.content)
+
+        Flight.objects.filter(flight_number='AT000').get().delete()
+        self.assertEqual(len(self.client.get('/api/api/flights/').json()), 29)
+
+    def test_cached_responses_are_finalized_once_and_dropped_after_bulk_writes(self):
+        from rest_framework.views import APIView
+
+        with mock.patch.object(APIView, 'finalize_response', autospec=True,
+                               side_effect=APIView.finalize_response) as finalize:
+            self.assertEqual(len(self.client.get('/api/api/flights/').json()), 30)
+        self.assertEqual(finalize.call_count, 1)
+
+        Generator(scale=0.001, seed=1).generate_flights()
+        self.assertEqual(len(self.client.get('/api/api/flights/').json()), 40)
+
+    def test_small_and_html_responses_are_left_alone(self):
+        flight = Flight.objects.first()
+        detail = self.client.get(f'/api/api/flights/{flight.pk}/', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', detail)
+        page = self.client.get('/api/login/', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', page)
+
+    def test_export_streams_compressed_csv(self):
+        user = User.objects.create_user(username='exporter', password='pass')
+        response = self.client.get('/api/api/flights/export/', headers={
+            'Accept-Encoding': 'gzip', 'Authorization': f"Bearer {AccessToken.for_user(user)}"})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = list(csv.reader(io.StringIO(gzip.decompress(b''.join(response.streaming_content)).decode())))
+        self.assertEqual(rows[0][:2], ['id', 'flight_number'])
+        self.assertEqual(len(rows), 31)
+
+
+
+@override_settings(SITE_PAGES={'page_size': 10})
+class SitePagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(25):
+            Flight.objects.create(flight_number=f'AT{i:03}', departure_city='Paris', arrival_city='Rabat',
+                                  departure_time=datetime(2025, 12, 1 + i, tzinfo=dt_timezone.utc),
+                                  arrival_time=datetime(2025, 12, 1 + i, 3, tzinfo=dt_timezone.utc),
+                                  price=120, available_seats=10)
+        self.user = User.objects.create_user(username='browser', password='pass')
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_lists_are_paginated_and_the_count_is_cached(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/flights/', {'page': 3})
+        self.assertEqual(response.context['page_obj'].number, 3)
+        self.assertEqual([f.flight_number for f in response.context['flights']], ['AT020', 'AT021', 'AT022', 'AT023', 'AT024'])
+        self.assertContains(response, 'Page 3 of 3')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/flights/', {'page': 99})
+        self.assertEqual(response.context['page_obj'].number, 3)
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql']])
+
+        Flight.objects.first().delete()
+        self.assertContains(self.client.get('/api/flights/', {'page': 3}), 'Page 3 of 3')
+        self.assertEqual(len(self.client.get('/api/flights/', {'page': 3}).context['flights']), 4)
+
+    def test_cards_are_cached_until_the_row_changes(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get('/api/flights/'), '$120.00', count=10)
+
+        # update() leaves updated_at alone, so the cached cards are reused
+        Flight.objects.update(price=99)
+        self.assertContains(self.client.get('/api/flights/'), '$120.00', count=10)
+
+        flight = Flight.objects.get(flight_number='AT000')
+        flight.price = 150
+        flight.save()
+        response = self.client.get('/api/flights/')
+        self.assertContains(response, '$150.00', count=1)
+        self.assertContains(response, '$120.00', count=9)
+
+    def test_home_is_cached_for_anonymous_visitors_only(self):
+        with mock.patch('core.views.render', wraps=render) as renderer:
+            first = self.client.get('/api/')
+            second = self.client.get('/api/')
+            self.assertEqual(renderer.call_count, 1)
+            self.assertEqual(first.content, second.content)
+            self.assertContains(second, 'Register')
+
+            self.client.force_login(self.user)
+            self.assertContains(self.client.get('/api/'), 'Logout')
+            self.assertEqual(renderer.call_count, 2)
+
+
+class AdminScalingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i, city in enumerate(['Paris', 'Madrid', 'Paris', 'Lyon']):
+            Flight.objects.create(flight_number=f'AT{i:03}', departure_city=city, arrival_city='Rabat',
+                                  departure_time='2025-12-20T10:00:00Z', arrival_time='2025-12-20T13:00:00Z',
+                                  price=120, available_seats=10)
+        self.admin = User.objects.create_superuser(username='boss', password='pass', email='boss@example.com')
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.admin)
+
+    def add_bookings(self, count):
+        for i in range(count):
+            user = User.objects.create_user(username=f'fan{User.objects.count()}', password='pass')
+            Booking.objects.create(user=user, total_price=100)
+
+    def test_booking_changelist_queries_do_not_grow_with_rows(self):
+        self.add_bookings(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/admin/core/booking/')
+        self.add_bookings(6)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get('/admin/core/booking/')
+        self.assertContains(response, 'fan7')
+        self.assertEqual(len(few), len(many))
+
+    def test_large_unfiltered_tables_use_the_estimate(self):
+        with mock.patch('core.admin_tools.estimated_count', return_value=2_000_000):
+            response = self.client.get('/admin/core/flight/')
+            self.assertEqual(response.context['cl'].result_count, 2_000_000)
+            filtered = self.client.get('/admin/core/flight/', {'departure_city': 'Paris'})
+            self.assertEqual(filtered.context['cl'].result_count, 2)
+        self.assertEqual(self.client.get('/admin/core/flight/').context['cl'].result_count, 4)
+
+        Flight.objects.filter(pk=Flight.objects.order_by('pk')[0].pk).update(available_seats=0)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_flight')
+            # Put the partial index of flights with seats left first
+            cursor.execute("SELECT tbl, idx, stat FROM sqlite_stat1 WHERE tbl = 'core_flight'")
+            stats = sorted(cursor.fetchall(), key=lambda row: int(row[2].split()[0]))
+            cursor.execute("DELETE FROM sqlite_stat1 WHERE tbl = 'core_flight'")
+            cursor.executemany('INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (%s, %s, %s)', stats)
+        self.assertEqual(stats[0][2].split()[0], '3')
+        self.assertEqual(estimated_count(Flight, 'default'), 4)
+
+    def test_filter_choices_are_cached_until_a_catalog_write(self):
+        self.client.get('/admin/core/flight/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/core/flight/')
+        self.assertFalse([q for q in queries if 'DISTINCT' in q['sql']])
+        self.assertContains(response, '?departure_city=Madrid')
+
+        Flight.objects.filter(departure_city='Madrid').get().delete()
+        self.assertNotContains(self.client.get('/admin/core/flight/'), '?departure_city=Madrid')
+
+    def test_bulk_actions_update_in_one_query(self):
+        self.add_bookings(3)
+        bookings = list(Booking.objects.values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/admin/core/booking/', {'action': 'mark_cancelled', '_selected_action': bookings})
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "core_booking"')]), 1)
+        self.assertEqual(Booking.objects.filter(status='cancelled').count(), 3)
+
+        flights = list(Flight.objects.values_list('pk', flat=True)[:2])
+        self.client.post('/admin/core/flight/', {'action': 'mark_sold_out', '_selected_action': flights})
+        self.assertEqual(sorted(Flight.objects.values_list('available_seats', flat=True)), [0, 0, 10, 10])
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_querysets_use_indexes(self):
+        for name, queryset in hot_querysets().items():
+            with self.subTest(name):
+                self.assertEqual(plan_problems(queryset), [])
+
+    def test_full_scans_and_sorts_are_reported(self):
+        self.assertTrue(plan_problems(Hotel.objects.filter(description='Sea view')))
+        self.assertTrue(plan_problems(Flight.objects.order_by('price')))
+        postgres_plan = ('Limit  (cost=0.29..1.02 rows=24 width=90)\n'
+                         '  ->  Sort  (cost=12.1..12.3 rows=80 width=90)\n'
+                         '        ->  Seq Scan on core_flight  (cost=0.00..10.80 rows=80 width=90)')
+        self.assertEqual(len([line for line in postgres_plan.splitlines() if PLAN_PROBLEMS['postgresql'].search(line)]), 1)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('All hot querysets use an index', out.getvalue())
+
+
+class TripFinderTests(TestCase):
+    def setUp(self):
+        self.ticket = MatchTicket.objects.create(
+            match_name='Morocco vs Spain', match_date=datetime(2030, 6, 20, 20, tzinfo=dt_timezone.utc),
+            stadium='Prince Moulay Abdellah - Rabat', match_type='WORLD_CUP', price=150, available_tickets=100)
+
+        def flight(number, origin, city, lands, price, seats=10):
+            return Flight.objects.create(flight_number=number, departure_city=origin, arrival_city=city,
+                                         departure_time=lands - timedelta(hours=3), arrival_time=lands,
+                                         price=price, available_seats=seats)
+        self.direct = flight('AT1', 'Paris', 'Rabat', datetime(2030, 6, 19, 22, tzinfo=dt_timezone.utc), 300)
+        self.madrid = flight('AT2', 'Madrid', 'Rabat', datetime(2030, 6, 20, 9, tzinfo=dt_timezone.utc), 200)
+        flight('AT3', 'Paris', 'Rabat', datetime(2030, 6, 20, 19, tzinfo=dt_timezone.utc), 50)  # lands too late
+        flight('AT4', 'Paris', 'Rabat', datetime(2030, 6, 18, 12, tzinfo=dt_timezone.utc), 60)  # before the stay
+        flight('AT5', 'Paris', 'Fez', datetime(2030, 6, 19, 12, tzinfo=dt_timezone.utc), 40)
+        self.last_seat = flight('AT6', 'Paris', 'Rabat', datetime(2030, 6, 19, 21, tzinfo=dt_timezone.utc), 70, seats=1)
+
+        def hotel(name, city, price, rooms):
+            return Hotel.objects.create(name=name, city=city, address='-', description='-', price_per_night=price,
+                                        available_rooms=rooms, rating=4)
+        self.hotel = hotel('Riad', 'Rabat', 100, 5)
+        hotel('Full', 'Rabat', 80, 0)
+        hotel('Elsewhere', 'Fez', 50, 5)
+
+        def activity(name, when, price):
+            return Activity.objects.create(name=name, description='-', city='Rabat', activity_date=when,
+                                           activity_type='TOUR', price=price, available_spots=10)
+        self.tour = activity('Kasbah tour', datetime(2030, 6, 21, 10, tzinfo=dt_timezone.utc), 20)
+        activity('Too late', datetime(2030, 6, 25, 10, tzinfo=dt_timezone.utc), 5)
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_finds_and_ranks_options_for_the_match(self):
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/api/trip-finder/', {'ticket': self.ticket.pk, 'travellers': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['city'], 'Rabat')
+        self.assertEqual([f['id'] for f in data['flights']], [self.madrid.pk, self.direct.pk])
+        self.assertEqual([h['id'] for h in data['hotels']], [self.hotel.pk])
+        self.assertEqual([a['id'] for a in data['activities']], [self.tour.pk])
+        self.assertEqual(Decimal(data['flights'][0]['total_price']), 400)
+        self.assertEqual(Decimal(data['hotels'][0]['total_price']), 200)
+        self.assertEqual(Decimal(data['cheapest_total']), 300 + 400 + 200)
+
+        from_paris = self.client.get('/api/api/trip-finder/', {'ticket': self.ticket.pk, 'origin': 'Paris'}).json()
+        self.assertEqual([f['id'] for f in from_paris['flights']], [self.last_seat.pk, self.direct.pk])
+
+    def test_all_queries_run_on_one_alias(self):
+        # A replica router returns another alias on the next call; only the first may be used
+        with mock.patch('core.trip_finder.router.db_for_read', side_effect=['default', 'missing']):
+            trip = find_trip(self.ticket)
+        self.assertEqual(len(trip['flights']), 3)
+
+    def test_invalid_queries(self):
+        self.assertEqual(self.client.get('/api/api/trip-finder/').status_code, 400)
+        self.assertEqual(self.client.get('/api/api/trip-finder/', {'ticket': 999}).status_code, 400)
+        response = self.client.get('/api/api/trip-finder/', {'ticket': self.ticket.pk, 'nights': 2, 'days_before': 3})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(TRIP_FINDER={'budget_ms': 0})
+    def test_searches_over_budget_are_cancelled(self):
+        response = self.client.get('/api/api/trip-finder/', {'ticket': self.ticket.pk})
+        self.assertEqual(response.status_code, 503)
+
+
+class RoutingTests(TestCase):
+    START = datetime(2030, 6, 1, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        reset_schedule()
+        self.addCleanup(reset_schedule)
+
+    def legs(self, *flights):
+        """(number, from, to, departs after START in hours, flight hours, price, seats) -> Flight rows"""
+        return {
+            number: Flight.objects.create(
+                flight_number=number, departure_city=origin, arrival_city=destination,
+                departure_time=self.START + timedelta(hours=departs), arrival_time=self.START + timedelta(hours=departs + hours),
+                price=price, available_seats=seats)
+            for number, origin, destination, departs, hours, price, seats in flights
+        }
+
+    def test_schedule_search(self):
+        hour = 3600
+        t = self.START.timestamp()
+        schedule = FlightSchedule.from_rows([
+            (1, 'New York', 'Paris', t, t + 8 * hour, Decimal('500'), 10),
+            (2, 'Paris', 'Rabat', t + 10 * hour, t + 13 * hour, Decimal('100'), 10),
+            (3, 'New York', 'Rabat', t + 2 * hour, t + 20 * hour, Decimal('900'), 10),
+            (4, 'New York', 'Madrid', t, t + 7 * hour, Decimal('300'), 10),
+            (5, 'Madrid', 'Rabat', t + 8.5 * hour, t + 10 * hour, Decimal('50'), 10),
+            (6, 'Paris', 'Rabat', t + 8.5 * hour, t + 11 * hour, Decimal('10'), 10),  # 30 minute connection
+        ])
+        search = lambda optimize, **kwargs: schedule.search('New York', 'Rabat', t, optimize, **kwargs)['flight_ids']  # noqa: E731
+        self.assertEqual(search('earliest'), [4, 5])
+        self.assertEqual(search('cheapest'), [4, 5])
+        self.assertEqual(search('earliest', min_connection=120), [1, 2])
+        self.assertEqual(search('cheapest', max_legs=1), [3])
+        self.assertIsNone(schedule.search('New York', 'Rabat', t, 'cheapest', travellers=11))
+        self.assertIsNone(schedule.search('Rabat', 'New York', t))
+
+        schedule.remove(5)
+        self.assertEqual(search('cheapest'), [1, 2])
+        schedule.upsert((7, 'New York', 'Lisbon', t, t + 6 * hour, Decimal('50'), 10))
+        schedule.upsert((8, 'Lisbon', 'Rabat', t + 7 * hour, t + 9 * hour, Decimal('20'), 10))
+        self.assertEqual(search('earliest'), [7, 8])
+        schedule.upsert((8, 'Lisbon', 'Rabat', t + 7 * hour, t + 9 * hour, Decimal('20'), 0))
+        self.assertEqual(search('cheapest'), [1, 2])
+        self.assertEqual(len(schedule), 7)
+
+    def test_routes_endpoint_follows_flight_changes(self):
+        flights = self.legs(('AF1', 'New York', 'Paris', 0, 8, 500, 10), ('AF2', 'Paris', 'Rabat', 10, 3, 100, 10),
+                            ('AT3', 'New York', 'Rabat', 2, 18, 900, 10))
+        query = {'origin': 'New York', 'destination': 'Rabat', 'departure': '2030-06-01T00:00:00Z', 'travellers': 2}
+        with mock.patch('core.background.BackgroundBuild.start') as start:
+            response = self.client.get('/api/api/routes/', query)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        start.assert_called_once_with()
+
+        refresh_schedule()
+        data = self.client.get('/api/api/routes/', query).json()
+        self.assertEqual([leg['flight_number'] for leg in data['earliest']['legs']], ['AF1', 'AF2'])
+        self.assertEqual(data['earliest']['connections_minutes'], [120])
+        self.assertEqual(Decimal(data['cheapest']['total_price']), 1200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.legs(('IB4', 'New York', 'Madrid', 0, 7, 300, 10), ('IB5', 'Madrid', 'Rabat', 8.5, 1.5, 50, 10))
+        data = self.client.get('/api/api/routes/', {**query, 'optimize': 'cheapest'}).json()
+        self.assertEqual([leg['flight_number'] for leg in data['cheapest']['legs']], ['IB4', 'IB5'])
+        self.assertNotIn('earliest', data)
+
+        # Assigned as strings, as form and fixture code does; converted like the database would
+        with self.captureOnCommitCallbacks(execute=True):
+            Flight.objects.create(flight_number='AT6', departure_city='New York', arrival_city='Rabat',
+                                  departure_time='2030-06-01 01:00:00', arrival_time='2030-06-01 09:00:00',
+                                  price='2000.00', available_seats='5')
+        data = self.client.get('/api/api/routes/', query).json()
+        self.assertEqual([leg['flight_number'] for leg in data['earliest']['legs']], ['AT6'])
+
+        # Deleted by another process: no signal, so the view drops the stale flight itself
+        Flight.objects.filter(flight_number='IB5')._raw_delete('default')
+        data = self.client.get('/api/api/routes/', {**query, 'optimize': 'cheapest'}).json()
+        self.assertEqual([leg['id'] for leg in data['cheapest']['legs']], [flights['AF1'].pk, flights['AF2'].pk])
+
+    def test_invalid_queries(self):
+        refresh_schedule()
+        self.assertEqual(self.client.get('/api/api/routes/', {'origin': 'Paris'}).status_code, 400)
+        response = self.client.get('/api/api/routes/', {'origin': 'Paris', 'destination': 'Rabat', 'departure': '2030-06-01T00:00:00Z',
+                                                        'min_connection': 300, 'max_connection': 60})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/api/routes/', {'origin': 'Nowhere', 'destination': 'Rabat', 'departure': '2030-06-01T00:00:00Z'})
+        self.assertEqual(response.json(), {'earliest': None, 'cheapest': None})
+
+
+class BackgroundBuildTests(SimpleTestCase):
+    def test_readers_keep_the_old_value_while_a_build_runs(self):
+        release, values = threading.Event(), iter(['first', 'second'])
+
+        def build():
+            release.wait(5)
+            return next(values)
+
+        holder = BackgroundBuild('test value', build)
+        self.addCleanup(BUILDS.remove, holder)
+        self.assertIsNone(holder.get(max_age=60))
+        holder.get(max_age=60)  # the build already running is not started twice
+        release.set()
+        holder.thread.join(5)
+        self.assertEqual(holder.get(max_age=60), 'first')
+
+        release.clear()
+        holder.built_at -= 120
+        self.assertEqual(holder.get(max_age=60), 'first')
+        release.set()
+        holder.thread.join(5)
+        self.assertEqual(holder.value, 'second')
+
+    def test_failed_builds_back_off_and_reset_discards_running_builds(self):
+        holder = BackgroundBuild('broken value', mock.Mock(side_effect=RuntimeError('down')))
+        self.addCleanup(BUILDS.remove, holder)
+        with self.assertLogs('core.background', 'ERROR'):
+            holder.start()
+            holder.thread.join(5)
+        holder.start()
+        self.assertFalse(holder.thread.is_alive())
+        self.assertEqual(holder.build.call_count, 1)
+
+        release = threading.Event()
+        holder.build = lambda: release.wait(5) and 'stale'
+        holder.reset()
+        holder.start()
+        holder.reset()
+        release.set()
+        holder.thread.join(5)
+        self.assertIsNone(holder.value)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        reset_index()
+        self.addCleanup(reset_index)
+
+    def hotel(self, name, city):
+        return Hotel.objects.create(name=name, city=city, address='-', description='-', price_per_night=100,
+                                    available_rooms=5, rating=4)
+
+    def suggest(self, q, **query):
+        response = self.client.get('/api/api/autocomplete/', {'q': q, **query})
+        self.assertEqual(response.status_code, 200)
+        return [(row['kind'], row['text'], row['score']) for row in response.json()['results']]
+
+    def test_trie_ranks_and_compacts(self):
+        trie = PrefixTrie.from_counts({'Casablanca': (5, 0), 'Cascais': (1, 0), 'Grand Casino': (1, 2)}, limit=2)
+        self.assertEqual(trie.search('cas'), [('Casablanca', 5), ('Grand Casino', 3)])
+        self.assertEqual(trie.search('CASC'), [('Cascais', 1)])
+        self.assertEqual(trie.search('casx'), [])
+        trie.adjust('Cascais', bookings=10)
+        self.assertEqual(trie.search('cas'), [('Cascais', 11), ('Casablanca', 5)])
+        trie.adjust('Cascais', rows=-1)
+        self.assertEqual(trie.search('cas', 3), [('Casablanca', 5), ('Grand Casino', 3)])
+        self.assertEqual(sorted(trie.root.children['c'].children), ['a', 'i'])
+        # The edge split for Casino's key is folded back into one
+        trie.adjust('Grand Casino', rows=-1)
+        self.assertEqual(trie.search('g'), [])
+        self.assertEqual((trie.root.children['c'].label, trie.root.children['c'].children), ('casablanca', None))
+
+    def test_suggestions_follow_catalog_writes(self):
+        for city in ('Fès', 'Fès', 'Rabat'):
+            self.hotel(f'Riad {city}', city)
+        self.hotel('Hotel Farah', 'Rabat')
+        Match.objects.create(home_team='Morocco', away_team='Ferroviário', date=timezone.now(), venue='Rabat',
+                             ticket_price=50)
+        # Requests never wait for the build: they get nothing until it is done
+        with mock.patch.object(BackgroundBuild, 'start') as start:
+            self.assertEqual(self.suggest('fe'), [])
+        start.assert_called_once_with()
+        refresh_index()
+        self.assertEqual(self.suggest('fe'), [('city', 'Fès', 2), ('hotel', 'Riad Fès', 2), ('team', 'Ferroviário', 1)])
+        self.assertEqual(self.suggest('FARAH'), [('hotel', 'Hotel Farah', 1)])
+        self.assertEqual(self.suggest('r', kind=['city', 'team'], limit=1), [('city', 'Rabat', 2)])
+        self.assertEqual(self.client.get('/api/api/autocomplete/').status_code, 400)
+
+        user = User.objects.create_user(username='fan', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            farah = Hotel.objects.get(name='Hotel Farah')
+            Booking.objects.create(user=user, total_price=100).hotel.add(farah)
+        self.assertEqual(self.suggest('ra'), [('city', 'Rabat', 3), ('hotel', 'Riad Rabat', 1)])
+        self.assertEqual(self.suggest('hotel'), [('hotel', 'Hotel Farah', 2)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            farah.name, farah.city = 'Farah Palace', 'Tangier'
+            farah.save()
+        self.assertEqual(self.suggest('hotel'), [])
+        self.assertEqual(self.suggest('farah'), [('hotel', 'Farah Palace', 2)])
+        self.assertEqual(self.suggest('tan'), [('city', 'Tangier', 2)])
+        self.assertEqual(self.suggest('rab', kind=['city']), [('city', 'Rabat', 1)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Hotel.objects.filter(city='Fès').first().delete()
+            Match.objects.all().delete()
+        self.assertEqual(self.suggest('fe'), [('city', 'Fès', 1), ('hotel', 'Riad Fès', 1)])
+
+class PriceCalendarTests(TestCase):
+    DAY = datetime(2030, 6, 10, 9, tzinfo=dt_timezone.utc)
+
+    def flight(self, number, days=0, price=100, seats=10, origin='Paris', destination='Rabat'):
+        departs = self.DAY + timedelta(days=days)
+        return Flight.objects.create(flight_number=number, departure_city=origin, arrival_city=destination,
+                                     departure_time=departs, arrival_time=departs + timedelta(hours=3),
+                                     price=price, available_seats=seats)
+
+    def calendar(self, month='2030-06', **query):
+        response = self.client.get('/api/api/price-calendar/', {'origin': 'Paris', 'destination': 'Rabat', 'month': month, **query})
+        self.assertEqual(response.status_code, 200)
+        return {day['date']: (day['min_price'] and Decimal(day['min_price']), day['available_seats'], day['flights'])
+                for day in response.json()['days']}
+
+    def test_calendar_follows_flight_writes(self):
+        cheap = self.flight('AT1', price=80, seats=5)
+        self.flight('AF2', price=120, seats=20)
+        self.flight('AF3', days=1, price=150)
+        self.flight('AF4', days=30, price=90)  # July
+        self.flight('IB5', price=10, destination='Madrid')
+        self.assertEqual(self.calendar(), {'2030-06-10': (80, 25, 2), '2030-06-11': (150, 10, 1)})
+        self.assertEqual(self.calendar('2030-07'), {'2030-07-10': (90, 10, 1)})
+
+        cheap.available_seats = 0
+        cheap.save()
+        self.assertEqual(self.calendar()['2030-06-10'], (120, 20, 2))
+
+        # Moving a flight refreshes both its old and its new day
+        cheap.departure_time += timedelta(days=1)
+        cheap.available_seats = 5
+        cheap.save()
+        self.assertEqual(self.calendar(), {'2030-06-10': (120, 20, 1), '2030-06-11': (80, 15, 2)})
+
+        Flight.objects.get(flight_number='AF2').delete()
+        self.assertEqual(self.calendar(), {'2030-06-11': (80, 15, 2)})
+        Flight.objects.filter(flight_number='AF3').update(available_seats=0)
+        self.assertEqual(rebuild_calendar(), 3)
+        self.assertEqual(self.calendar(), {'2030-06-11': (80, 5, 2)})
+
+        with self.assertNumQueries(1):
+            self.client.get('/api/api/price-calendar/', {'origin': 'Paris', 'destination': 'Rabat', 'month': '2030-06'})
+        self.assertEqual(plan_problems(hot_querysets()['price_calendar_month']), [])
+
+    def test_sold_out_action_and_bulk_import(self):
+        admin_user = User.objects.create_superuser('calendar_admin', 'admin@example.com', 'password')
+        flight = self.flight('AT1', price=80)
+        self.flight('AF2', price=120)
+        self.client.force_login(admin_user)
+        self.client.post('/admin/core/flight/', {'action': 'mark_sold_out', '_selected_action': [flight.pk]})
+        self.assertEqual(FlightPriceDay.objects.get().min_price, 120)
+
+        Generator(scale=0.01, seed=3).generate_flights()
+        self.assertEqual(FlightPriceDay.objects.count(), Flight.objects.values('departure_city', 'arrival_city', 'departure_time__date')
+                         .distinct().count())
+        call_command('rebuild_price_calendar', stdout=io.StringIO())
+        self.assertEqual(FlightPriceDay.objects.get(departure_city='Paris', arrival_city='Rabat', date='2030-06-10').min_price, 120)
+
+    def test_invalid_queries(self):
+        self.assertEqual(self.client.get('/api/api/price-calendar/', {'origin': 'Paris', 'destination': 'Rabat'}).status_code, 400)
+        response = self.client.get('/api/api/price-calendar/', {'origin': 'Paris', 'destination': 'Rabat', 'month': '2030-13'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                   AVAILABILITY_PUSH={'interval': 0.05, 'max_subscriptions': 2, 'enabled': True})
+class AvailabilityPushTests(TestCase):
+    def setUp(self):
+        self.ticket = MatchTicket.objects.create(match_name='Morocco vs Senegal', match_date='2025-12-21T20:00:00Z',
+                                                 stadium='Stade Mohammed V - Casablanca', match_type='CAN',
+                                                 price=90, available_tickets=100)
+
+    def published(self):
+        return async_to_sync(get_channel_layer().receive)(BROADCASTER_CHANNEL)['tickets']
+
+    async def test_subscribers_get_a_snapshot_then_coalesced_deltas(self):
+        with mock.patch('core.background.start_builds'):
+            from fanzone_backend.asgi import application
+
+        # channels.testing needs daphne, so speak the ASGI WebSocket messages directly
+        socket = ApplicationCommunicator(application, {'type': 'websocket', 'path': '/ws/availability/',
+                                                       'headers': [(b'origin', b'http://localhost')]})
+        send = lambda content: socket.send_input({'type': 'websocket.receive', 'text': json.dumps(content)})  # noqa: E731
+
+        async def received():
+            return json.loads((await socket.receive_output(1))['text'])
+
+        pk = self.ticket.pk
+        await socket.send_input({'type': 'websocket.connect'})
+        self.assertEqual((await socket.receive_output(1))['type'], 'websocket.accept')
+        await send({'action': 'subscribe', 'tickets': [pk]})
+        self.assertEqual(await received(), {'type': 'snapshot', 'tickets': {str(pk): 100}})
+        await send({'action': 'subscribe', 'tickets': [pk + 1, pk + 2]})
+        self.assertEqual((await received())['type'], 'error')
+        await send({'action': 'watch', 'tickets': 'all'})
+        self.assertEqual((await received())['type'], 'error')
+
+        # Three changes in one interval, committed out of order: one delta with the newest value
+        broadcaster = ApplicationCommunicator(AvailabilityBroadcaster.as_asgi(), {'type': 'channel', 'channel': BROADCASTER_CHANNEL})
+        for available, changed_at in [(99, 1.0), (97, 3.0), (98, 2.0)]:
+            await broadcaster.send_input({'type': 'availability.changed', 'tickets': [[pk, available, changed_at]]})
+        self.assertEqual(await received(), {'type': 'delta', 'tickets': {str(pk): 97}})
+        self.assertTrue(await socket.receive_nothing(0.1))
+
+        await send({'action': 'unsubscribe', 'tickets': [pk]})
+        await broadcaster.send_input({'type': 'availability.changed', 'tickets': [[pk, 50, 4.0]]})
+        self.assertTrue(await socket.receive_nothing(0.2))
+        await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await socket.wait(1)
+        broadcaster.stop()
+        await get_hub().stop()
+
+    def test_ticket_writes_are_published_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.available_tickets = 80
+            self.ticket.save()
+        self.assertEqual([row[:2] for row in self.published()], [[self.ticket.pk, 80]])
+
+        admin_user = User.objects.create_superuser('push_admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/core/matchticket/', {'action': 'mark_sold_out', '_selected_action': [self.ticket.pk]})
+        self.assertEqual([row[:2] for row in self.published()], [[self.ticket.pk, 0]])
+
+        # A per-process in-memory layer has no broadcaster reading it
+        with self.settings(AVAILABILITY_PUSH={}), mock.patch.object(get_channel_layer(), 'send') as send:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ticket.save()
+        send.assert_not_called()
+
+    async def test_hub_rejoins_the_group_while_idle(self):
+        with self.settings(AVAILABILITY_PUSH={'group_refresh': 0.05}):
+            hub = AvailabilityHub(get_channel_layer())
+            with mock.patch.object(hub.layer, 'group_add', wraps=hub.layer.group_add) as group_add:
+                await hub.start()
+                await asyncio.sleep(0.2)
+                await hub.stop()
+        self.assertGreaterEqual(group_add.await_count, 3)
+
+
+CALLS = []
+
+
+@task(name='tests.record')
+def record_call(value, fail_times=0):
+    CALLS.append(value)
+    if CALLS.count(value) <= fail_times:
+        raise RuntimeError(f'failing {value}')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_priorities_retries_and_dead_letters(self):
+        record_call.enqueue(value='low', _priority=-1)
+        record_call.enqueue(value='high', _priority=5)
+        record_call.enqueue(value='later', _delay=3600)
+        record_call.enqueue(value='flaky', fail_times=1)
+        record_call.enqueue(value='broken', fail_times=99)
+        self.assertEqual(run_pending(), {'done': 2, 'retried': 2, 'dead': 0})
+        self.assertEqual(CALLS, ['high', 'flaky', 'broken', 'low'])
+
+        flaky = Task.objects.get(payload__value='flaky')
+        self.assertEqual((flaky.status, flaky.attempts), (Task.QUEUED, 1))
+        self.assertIn('failing flaky', flaky.last_error)
+        self.assertAlmostEqual((flaky.run_at - timezone.now()).total_seconds(), backoff(1), delta=2)
+        self.assertEqual(backoff(3), backoff(1) * 4)
+
+        # Retries run once their backoff has passed; the last failed attempt dead-letters the task
+        Task.objects.update(run_at=timezone.now())
+        Task.objects.filter(payload__value='broken').update(attempts=4)
+        self.assertEqual(run_pending(), {'done': 2, 'retried': 0, 'dead': 1})
+        self.assertEqual(CALLS[-3:], ['later', 'flaky', 'broken'])
+        self.assertEqual(queue_status(), {'tests.record': {'dead': 1}})
+
+        self.assertEqual(retry_dead(['tests.record']), 1)
+        self.assertEqual(Task.objects.get(payload__value='broken').attempts, 0)
+
+    def test_claims_are_exclusive_and_lost_tasks_come_back(self):
+        for value in range(3):
+            record_call.enqueue(value=value)
+        first = claim('worker-a', 2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual([t.pk for t in claim('worker-b', 5)], [Task.objects.exclude(pk__in=[t.pk for t in first]).get().pk])
+        self.assertEqual(claim('worker-c', 5), [])
+
+        # worker-a died holding its tasks
+        Task.objects.filter(pk__in=[t.pk for t in first]).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 2)
+        self.assertEqual(Task.objects.filter(status=Task.QUEUED).count(), 2)
+
+        Task.objects.create(name='tests.unknown')
+        Task.objects.update(run_at=timezone.now())
+        out = io.StringIO()
+        call_command('run_workers', '--once', stdout=out)
+        self.assertIn('2 done, 0 retried, 1 dead', out.getvalue())
+        self.assertEqual(Task.objects.get(name='tests.unknown').status, Task.DEAD)
+        self.assertEqual(Task.objects.get(name='tests.record').locked_by.split(':')[0], 'worker-b')
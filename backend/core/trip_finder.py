@@ -0,0 +1,142 @@
+"""
+Trip finder: the flights, hotels and activities that go with one match ticket.
+
+The match city comes from the ticket's stadium (``'Stade Mohammed V -
+Casablanca'``). The stay starts ``days_before`` days before kickoff and lasts
+``nights`` nights. ``find_trip`` returns the cheapest ``limit`` options per
+category:
+- flights into the city that land in time for the match;
+- hotels with enough rooms;
+- activities during the stay.
+
+Each option is ranked by its total price for the party, and the response
+includes the cheapest ticket + flight + hotel total. Each category is one
+range query on an index (see ``Meta.indexes`` on the models and
+``core/query_plans.py``). The whole search runs under a time budget of
+``budget_ms``. PostgreSQL enforces it with ``statement_timeout``. On SQLite a
+progress handler interrupts the running query. A search that goes over the
+budget raises ``TripSearchTimeout``.
+"""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, connections, router, transaction
+
+from .models import Activity, Flight, Hotel
+
+DEFAULTS = {
+    'limit': 5,  # options per category
+    'days_before': 1,  # the stay starts this many days before kickoff
+    'nights': 2,
+    'arrival_margin_hours': 3,  # flights must land this long before kickoff
+    'max_flight_hours': 24,  # bounds the departure time range searched for a given arrival
+    'budget_ms': 500,
+}
+
+
+class TripSearchTimeout(Exception):
+    pass
+
+
+def trip_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'TRIP_FINDER', {}))
+    return config
+
+
+@contextmanager
+def query_budget(using, seconds):
+    """Cancel queries on ``using`` that run past ``seconds`` from now"""
+    connection = connections[using]
+    deadline = time.perf_counter() + seconds
+    try:
+        if connection.vendor == 'postgresql':
+            with transaction.atomic(using=using):
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL statement_timeout = %s', [max(1, int(seconds * 1000))])
+                yield deadline
+        elif connection.vendor == 'sqlite':
+            connection.ensure_connection()
+            connection.connection.set_progress_handler(lambda: time.perf_counter() > deadline, 1000)
+            try:
+                yield deadline
+            finally:
+                connection.connection.set_progress_handler(None, 0)
+        else:
+            yield deadline
+    except OperationalError as exc:
+        if time.perf_counter() > deadline:
+            raise TripSearchTimeout() from exc
+        raise
+
+
+def host_city(venue, known_cities=()):
+    """Map a stadium or venue name such as 'Ibn Battuta - Tangier' to its city"""
+    if ' - ' in venue:
+        return venue.rsplit(' - ', 1)[1].strip()
+    lowered = venue.lower()
+    for city in sorted(known_cities, key=len, reverse=True):
+        if city.lower() in lowered:
+            return city
+    return venue.strip()
+
+
+def check_deadline(deadline):
+    if time.perf_counter() > deadline:
+        raise TripSearchTimeout()
+
+
+def find_trip(ticket, origin=None, city=None, travellers=1, rooms=1, nights=None, days_before=None, limit=None):
+    config = trip_settings()
+    nights = config['nights'] if nights is None else nights
+    days_before = config['days_before'] if days_before is None else days_before
+    limit = limit or config['limit']
+    city = city or host_city(ticket.stadium)
+
+    kickoff = ticket.match_date
+    stay_start = kickoff - timedelta(days=days_before)
+    stay_end = stay_start + timedelta(days=nights)
+    arrive_by = kickoff - timedelta(hours=config['arrival_margin_hours'])
+
+    # Bounding departure_time as well lets a known origin use the route index.
+    flights = Flight.objects.filter(
+        arrival_city=city, arrival_time__range=(stay_start, arrive_by),
+        departure_time__range=(stay_start - timedelta(hours=config['max_flight_hours']), arrive_by),
+        available_seats__gte=travellers,
+    )
+    if origin:
+        flights = flights.filter(departure_city=origin)
+    hotels = Hotel.objects.filter(city=city, available_rooms__gt=0, available_rooms__gte=rooms)
+    activities = Activity.objects.filter(
+        city=city, activity_date__range=(stay_start, stay_end), available_spots__gte=travellers)
+
+    # One alias for all three queries: the replica router may pick another replica on each call
+    using = router.db_for_read(Flight)
+    started = time.perf_counter()
+    with query_budget(using, config['budget_ms'] / 1000) as deadline:
+        flights = list(flights.using(using).order_by('price', 'id')[:limit])
+        check_deadline(deadline)
+        hotels = list(hotels.using(using).order_by('price_per_night', 'id')[:limit])
+        check_deadline(deadline)
+        activities = list(activities.using(using).order_by('price', 'id')[:limit])
+        check_deadline(deadline)
+
+    ticket_total = ticket.price * travellers
+    flight_totals = [flight.price * travellers for flight in flights]
+    hotel_totals = [hotel.price_per_night * nights * rooms for hotel in hotels]
+    cheapest = None
+    if flights and hotels:
+        cheapest = ticket_total + flight_totals[0] + hotel_totals[0]
+    return {
+        'city': city,
+        'stay_start': stay_start,
+        'stay_end': stay_end,
+        'ticket_total': ticket_total,
+        'flights': list(zip(flights, flight_totals)),
+        'hotels': list(zip(hotels, hotel_totals)),
+        'activities': [(activity, activity.price * travellers) for activity in activities],
+        'cheapest_total': cheapest,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
@@ -4,7 +4,8 @@ from .views import (
     UserViewSet, FlightViewSet, HotelViewSet,
     MatchTicketViewSet, ActivityViewSet,
     BookingViewSet, PackageViewSet,
-    chat_message, chat_history,
+    chat_message, chat_history, db_pool_metrics, trip_finder, routes, price_calendar,
+    autocomplete,
     home, login_view, logout_view, register_view,
     flights, hotels, match_tickets,
     activities, packages, bookings,
@@ -38,4 +39,9 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/chat/message/', chat_message, name='chat_message'),
     path('api/chat/history/', chat_history, name='chat_history'),
+    path('api/db/pool/metrics/', db_pool_metrics, name='db_pool_metrics'),
+    path('api/trip-finder/', trip_finder, name='trip_finder'),
+    path('api/routes/', routes, name='routes'),
+    path('api/price-calendar/', price_calendar, name='price_calendar'),
+    path('api/autocomplete/', autocomplete, name='autocomplete'),
 ] 
\ No newline at end of file
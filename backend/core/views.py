@@ -10,9 +10,21 @@ from .models import Flight, Hotel, MatchTicket, Activity, Booking, Package, Matc
 from .serializers import (
     UserSerializer, FlightSerializer, HotelSerializer,
     MatchTicketSerializer, ActivitySerializer, BookingSerializer,
-    PackageSerializer, UserRegistrationSerializer
+    PackageSerializer, UserRegistrationSerializer, TripFinderQuerySerializer,
+    RouteQuerySerializer, PriceCalendarQuerySerializer, FlightPriceDaySerializer,
+    AutocompleteQuerySerializer
 )
+from .authentication import revoke_tokens
+from .autocomplete import autocomplete_settings, get_index
 from .chatbot import Chatbot
+from .compression import CatalogExportMixin, CatalogResponseCacheMixin
+from .db_pool import connection_metrics
+from .db_router import ReplicaReadMixin, replica_reads
+from .metrics import record_booking
+from .pages import cache_anonymous_page, page_context
+from .price_calendar import month_calendar
+from .sqlite import run_write
+from .trip_finder import TripSearchTimeout, find_trip
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 
@@ -40,6 +52,7 @@ class CustomUserCreationForm(UserCreationForm):
 chatbot = Chatbot()
 
 # Template-based views
+@cache_anonymous_page
 def home(request):
     return render(request, 'home.html')
 
@@ -77,54 +90,59 @@ def logout_view(request):
     return redirect('home')
 
 @login_required
+@replica_reads
 def flights(request):
-    flights = Flight.objects.all()
-    return render(request, 'flights.html', {'flights': flights})
+    flights = Flight.objects.order_by('departure_time', 'id')
+    return render(request, 'flights.html', page_context(request, flights, 'flights'))
 
 @login_required
+@replica_reads
 def hotels(request):
-    hotels = Hotel.objects.all()
-    return render(request, 'hotels.html', {'hotels': hotels})
+    hotels = Hotel.objects.order_by('id')
+    return render(request, 'hotels.html', page_context(request, hotels, 'hotels'))
 
 @login_required
+@replica_reads
 def match_tickets(request):
     match_type = request.GET.get('match_type')
-    tickets = MatchTicket.objects.all()
+    tickets = MatchTicket.objects.order_by('match_date', 'id')
     
     if match_type:
         tickets = tickets.filter(match_type=match_type)
     
     context = {
-        'tickets': tickets,
+        **page_context(request, tickets, 'tickets'),
         'match_types': MatchType.choices,
         'selected_type': match_type
     }
     return render(request, 'match_tickets.html', context)
 
 @login_required
+@replica_reads
 def activities(request):
     activity_type = request.GET.get('activity_type')
-    activities = Activity.objects.all()
+    activities = Activity.objects.order_by('activity_date', 'id')
     
     if activity_type:
         activities = activities.filter(activity_type=activity_type)
     
     context = {
-        'activities': activities,
+        **page_context(request, activities, 'activities'),
         'activity_types': ActivityType.choices,  # This line passes all activity types
         'selected_type': activity_type
     }
     return render(request, 'activities.html', context)
 
 @login_required
+@replica_reads
 def packages(request):
-    packages = Package.objects.all()
-    return render(request, 'packages.html', {'packages': packages})
+    packages = Package.objects.order_by('id')
+    return render(request, 'packages.html', page_context(request, packages, 'packages'))
 
 @login_required
 def bookings(request):
-    bookings = Booking.objects.filter(user=request.user)
-    return render(request, 'bookings.html', {'bookings': bookings})
+    bookings = Booking.objects.filter(user=request.user).order_by('-booking_date', '-id')
+    return render(request, 'bookings.html', page_context(request, bookings, 'bookings', catalog=False))
 
 @login_required
 def profile(request):
@@ -143,7 +161,12 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class FlightViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'], url_path='revoke-tokens')
+    def revoke_tokens(self, request, pk=None):
+        revoke_tokens(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class FlightViewSet(ReplicaReadMixin, CatalogResponseCacheMixin, CatalogExportMixin, viewsets.ModelViewSet):
     queryset = Flight.objects.all()
     serializer_class = FlightSerializer
     
@@ -154,7 +177,7 @@ class FlightViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
 
-class HotelViewSet(viewsets.ModelViewSet):
+class HotelViewSet(ReplicaReadMixin, CatalogResponseCacheMixin, CatalogExportMixin, viewsets.ModelViewSet):
     queryset = Hotel.objects.all()
     serializer_class = HotelSerializer
     
@@ -165,7 +188,7 @@ class HotelViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
 
-class MatchTicketViewSet(viewsets.ModelViewSet):
+class MatchTicketViewSet(ReplicaReadMixin, CatalogResponseCacheMixin, CatalogExportMixin, viewsets.ModelViewSet):
     queryset = MatchTicket.objects.all()
     serializer_class = MatchTicketSerializer
     
@@ -176,7 +199,7 @@ class MatchTicketViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
 
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(ReplicaReadMixin, CatalogResponseCacheMixin, CatalogExportMixin, viewsets.ModelViewSet):
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
     
@@ -198,17 +221,27 @@ class BookingViewSet(viewsets.ModelViewSet):
         return Booking.objects.filter(user=user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        run_write(serializer.save, user=self.request.user)
+        record_booking('created')
+
+    def perform_update(self, serializer):
+        run_write(serializer.save)
+        if serializer.validated_data.get('status') == 'cancelled':
+            record_booking('cancelled')
+
+    def perform_destroy(self, instance):
+        run_write(instance.delete)
+        record_booking('cancelled')
 
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
         if request.data.get('status') == 'cancelled':
             # Delete the booking instead of updating its status
-            instance.delete()
+            self.perform_destroy(instance)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return super().partial_update(request, *args, **kwargs)
 
-class PackageViewSet(viewsets.ModelViewSet):
+class PackageViewSet(ReplicaReadMixin, CatalogResponseCacheMixin, viewsets.ModelViewSet):
     queryset = Package.objects.all()
     serializer_class = PackageSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -216,14 +249,20 @@ class PackageViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def book(self, request, pk=None):
         package = self.get_object()
-        booking = Booking.objects.create(
-            user=request.user,
-            total_price=package.price * (1 - package.discount/100)
-        )
-        booking.flight.set(package.flights.all())
-        booking.hotel.set(package.hotels.all())
-        booking.match_ticket.set(package.match_tickets.all())
-        booking.activity.set(package.activities.all())
+
+        def create_booking():
+            booking = Booking.objects.create(
+                user=request.user,
+                total_price=package.price * (1 - package.discount/100)
+            )
+            booking.flight.set(package.flights.all())
+            booking.hotel.set(package.hotels.all())
+            booking.match_ticket.set(package.match_tickets.all())
+            booking.activity.set(package.activities.all())
+            return booking
+
+        booking = run_write(create_booking)
+        record_booking('created')
         return Response(BookingSerializer(booking).data, status=status.HTTP_201_CREATED)
 
 @api_view(['POST'])
@@ -247,3 +286,127 @@ def chat_history(request):
     """
     history = chatbot.get_conversation_history()
     return Response({'history': history})
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def db_pool_metrics(request):
+    """
+    Database connection reuse and pool wait/utilization metrics
+    """
+    return Response({'databases': connection_metrics()})
+
+def priced(serializer_class, options):
+    # One many=True serializer builds its fields once, not once per item
+    data = serializer_class([item for item, _ in options], many=True).data
+    return [{**row, 'total_price': total} for row, (_, total) in zip(data, options)]
+
+@replica_reads
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def trip_finder(request):
+    """
+    Flights, hotels and activities around one match ticket, cheapest first
+    """
+    query = TripFinderQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    params = dict(query.validated_data)
+    ticket = params.pop('ticket')
+    try:
+        trip = find_trip(ticket, **params)
+    except TripSearchTimeout:
+        return Response({'detail': 'Trip search took too long; narrow it with origin or fewer nights.'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response({
+        'ticket': MatchTicketSerializer(ticket).data,
+        'city': trip['city'],
+        'stay': {'start': trip['stay_start'], 'end': trip['stay_end'], 'nights': params['nights']},
+        'travellers': params['travellers'],
+        'ticket_total': trip['ticket_total'],
+        'cheapest_total': trip['cheapest_total'],
+        'flights': priced(FlightSerializer, trip['flights']),
+        'hotels': priced(HotelSerializer, trip['hotels']),
+        'activities': priced(ActivitySerializer, trip['activities']),
+        'elapsed_ms': trip['elapsed_ms'],
+    })
+
+def route_itinerary(schedule, optimize, params):
+    # A flight deleted by another worker stays in the schedule until its next rebuild; drop it and search again.
+    while True:
+        found = schedule.search(optimize=optimize, **params)
+        if found is None:
+            return None
+        flights = Flight.objects.in_bulk(found['flight_ids'])
+        missing = [pk for pk in found['flight_ids'] if pk not in flights]
+        if not missing:
+            break
+        for pk in missing:
+            schedule.remove(pk)
+    legs = [flights[pk] for pk in found['flight_ids']]
+    return {
+        'departure': legs[0].departure_time,
+        'arrival': legs[-1].arrival_time,
+        'duration_minutes': int((legs[-1].arrival_time - legs[0].departure_time).total_seconds() // 60),
+        'connections_minutes': [int((nxt.departure_time - prev.arrival_time).total_seconds() // 60)
+                                for prev, nxt in zip(legs, legs[1:])],
+        'total_price': sum(leg.price for leg in legs) * params['travellers'],
+        'legs': FlightSerializer(legs, many=True).data,
+    }
+
+@replica_reads
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def routes(request):
+    """
+    Earliest-arriving and cheapest itineraries between two cities, with connections
+    """
+    query = RouteQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    params = dict(query.validated_data)
+    optimize = params.pop('optimize', None)
+    # Imported here so that loading the URLconf does not pull in NumPy.
+    from .routing import get_schedule
+
+    schedule = get_schedule()
+    if schedule is None:
+        return Response({'detail': 'The flight schedule is still loading; try again shortly.'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '30'})
+    return Response({
+        mode: route_itinerary(schedule, mode, params)
+        for mode in ([optimize] if optimize else ['earliest', 'cheapest'])
+    })
+
+@replica_reads
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def price_calendar(request):
+    """
+    Lowest fare and seats left per departure date of one route, for one month
+    """
+    query = PriceCalendarQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    params = query.validated_data
+    days = month_calendar(params['origin'], params['destination'], params['month'])
+    return Response({
+        'origin': params['origin'],
+        'destination': params['destination'],
+        'month': params['month'].strftime('%Y-%m'),
+        'days': FlightPriceDaySerializer(days, many=True).data,
+    })
+
+@replica_reads
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def autocomplete(request):
+    """
+    Most popular cities, hotels, stadiums, matches, activities and teams with a word starting with q
+    """
+    query = AutocompleteQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    params = query.validated_data
+    limit = params.get('limit', autocomplete_settings()['limit'])
+    index = get_index()
+    return Response({
+        'query': params['q'],
+        # No suggestions while the first build runs in the background
+        'results': index.search(params['q'], sorted(params.get('kind', ())), limit) if index is not None else [],
+    })
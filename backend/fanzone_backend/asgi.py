@@ -2,6 +2,9 @@
 ASGI config for fanzone_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django, ``/ws/availability/`` to the ticket availability push
+(core/consumers.py), and the ``availability-broadcaster`` channel to the
+broadcaster run by ``python manage.py runworker availability-broadcaster``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +16,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fanzone_backend.settings')
 
-application = get_asgi_application()
+# Set up Django before the consumers import models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ChannelNameRouter, ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from core.availability import BROADCASTER_CHANNEL  # noqa: E402
+from core.background import start_builds  # noqa: E402
+from core.consumers import AvailabilityBroadcaster, websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(URLRouter(websocket_urlpatterns)),
+    'channel': ChannelNameRouter({BROADCASTER_CHANNEL: AvailabilityBroadcaster.as_asgi()}),
+})
+
+# Build the in-memory indexes in the background before the first requests need them
+start_builds()
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'corsheaders',
+    'channels',
     
     # Local apps
     'core',
@@ -50,12 +51,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.PrometheusMetricsMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.RequestTimingMiddleware',
+    'core.db_router.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -94,6 +99,64 @@ DATABASES = {
     }
 }
 
+if os.getenv('POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('POSTGRES_DB'),
+        'USER': os.getenv('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+    }
+
+# Connections are closed after each request by default: the app also runs
+# under ASGI, where every request runs in another thread and persistent
+# connections leak. Under WSGI, DB_CONN_MAX_AGE keeps them open (health-checked
+# before reuse). With PostgreSQL, DB_POOL=True switches to psycopg 3's native
+# pool instead (Django requires CONN_MAX_AGE=0 then). Metrics: core/db_pool.py.
+DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '0'))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if os.getenv('POSTGRES_DB') and os.getenv('DB_POOL', 'False') == 'True':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            'max_idle': 300,
+            'max_lifetime': 3600,
+        },
+    }
+
+# Read replicas for catalog browsing (see core/db_router.py). Every alias must
+# also be in DATABASES. SQLITE_REPLICAS=N adds N local SQLite copies kept in
+# sync by `python manage.py replicate_sqlite`.
+DATABASE_REPLICAS = {}
+for i in range(1, int(os.getenv('SQLITE_REPLICAS', '0')) + 1):
+    DATABASES[f'replica{i}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.replica{i}.sqlite3',
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS[f'replica{i}'] = {'weight': 1}
+
+DATABASE_ROUTERS = ['core.db_router.ReadReplicaRouter']
+REPLICA_STICKY_SECONDS = 5
+REPLICA_HEALTH_CHECK_INTERVAL = 5
+
+# SQLite production profile (see core/sqlite.py): WAL, busy_timeout, mmap and
+# synchronous=NORMAL on every connection, with booking, conversation and hotel
+# import writes funneled through a single writer thread.
+SQLITE_PROFILE = {
+    'enabled': os.getenv('SQLITE_PROFILE', 'False') == 'True',
+    'busy_timeout_ms': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'write_lane': True,
+    'checkpoint_interval': 30,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -169,11 +232,21 @@ CORS_ALLOW_HEADERS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson when installed, the stdlib otherwise (core/fastjson.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.fastjson.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.fastjson.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 # JWT settings
@@ -190,11 +263,159 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # Refuses refresh tokens of deactivated users and of users whose tokens were revoked
+    'TOKEN_REFRESH_SERIALIZER': 'core.authentication.TokenRefreshSerializer',
+}
+
+# Per-user authentication state cached by CachedJWTAuthentication (core/authentication.py)
+JWT_USER_CACHE = {
+    'cache': 'default',
+    'timeout': 60,
 }
 
 # Custom user model
 AUTH_USER_MODEL = 'core.User'
 
+# Chatbot language model and hotel inventory backends (see chatbot/backends.py).
+# chatbot.backends.FakeLLMBackend and FakeHotelAPI run offline with configurable
+# 'latency', 'jitter', 'error_rate' and 'seed' options.
+CHATBOT_BACKENDS = {
+    'llm': {
+        'BACKEND': 'chatbot.backends.GeminiBackend',
+        'OPTIONS': {},
+    },
+    'hotels': {
+        'BACKEND': 'chatbot.hotel_api.HotelAPIClient',
+        'OPTIONS': {},
+    },
+}
+
+# Limits for the chatbot's outbound calls (see chatbot/resilience.py)
+CHATBOT_RESILIENCE = {
+    'gemini': {
+        'timeout': 15.0,
+        'max_concurrency': 8,
+        'failure_threshold': 5,
+        'reset_timeout': 30.0,
+    },
+    'rapidapi': {
+        'timeout': 8.0,
+        'max_concurrency': 4,
+        'failure_threshold': 3,
+        'reset_timeout': 60.0,
+    },
+}
+
+# Prompt budget for chatbot conversations (see chatbot/context.py)
+CHATBOT_CONTEXT = {
+    'max_tokens': 4000,  # system prompt + summary + recent turns + new message
+    'keep_turns': 6,  # most recent exchanges kept verbatim
+    'summary_tokens': 600,  # cap for the rolling summary of older turns
+}
+
+# In-process BM25 index over the catalog used to ground chatbot answers (see chatbot/retrieval.py)
+CATALOG_INDEX = {
+    'compact_threshold': 50000,  # delta postings that start a background rebuild into one compacted segment
+    'max_postings_per_term': 2000,  # strongest postings scored per query term
+    'rebuild_interval': 3600,  # seconds between background rebuilds, which pick up other processes' writes
+}
+
+# Prefetching of external hotel inventory for match host cities (see chatbot/prewarm.py)
+HOTEL_PREWARM = {
+    'batch_size': 5,
+    'rate': 0.5,  # RapidAPI requests per second
+    'max_age_hours': 12,
+    'horizon_days': 90,
+    'interval': 3600,  # seconds between scheduler runs
+    'live_search': False,  # chat reads only prefetched hotels when False
+}
+
+# br/zstd/gzip compression of JSON and CSV responses and the precompressed
+# catalog response cache (core/compression.py)
+RESPONSE_COMPRESSION = {
+    'enabled': os.getenv('RESPONSE_COMPRESSION', 'True') == 'True',
+    'min_size': 1024,
+    'cache_timeout': int(os.getenv('CATALOG_RESPONSE_CACHE_SECONDS', '60')),
+}
+
+# Flights, hotels and activities around a match ticket (core/trip_finder.py)
+TRIP_FINDER = {
+    'limit': 5,
+    'budget_ms': int(os.getenv('TRIP_FINDER_BUDGET_MS', '500')),
+}
+
+# Database-backed background tasks run by `python manage.py run_workers`
+# (core/task_queue.py)
+TASK_QUEUE = {
+    'processes': int(os.getenv('TASK_WORKERS', '2')),
+    'max_attempts': 5,
+    'backoff': 5.0,
+    'timeout': 300,
+}
+
+# WebSocket push of match ticket availability (core/availability.py). The
+# in-memory layer only reaches consumers in the same process; run several
+# processes and the broadcaster worker on channels_redis by setting
+# CHANNEL_REDIS_URL.
+ASGI_APPLICATION = 'fanzone_backend.asgi.application'
+CHANNEL_LAYERS = {
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+}
+if os.getenv('CHANNEL_REDIS_URL'):
+    CHANNEL_LAYERS['default'] = {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {'hosts': [os.getenv('CHANNEL_REDIS_URL')]},
+    }
+AVAILABILITY_PUSH = {
+    'interval': float(os.getenv('AVAILABILITY_PUSH_INTERVAL', '0.5')),
+    'max_subscriptions': 50,
+}
+
+# Multi-leg flight search over an in-memory schedule (core/routing.py)
+ROUTING = {
+    'min_connection_minutes': 60,
+    'max_connection_minutes': 720,
+    'max_legs': 3,
+    'refresh_interval': int(os.getenv('ROUTING_REFRESH_SECONDS', '30')),
+    'rebuild_interval': int(os.getenv('ROUTING_REBUILD_SECONDS', '3600')),
+}
+
+# Search-box suggestions from in-memory prefix tries (core/autocomplete.py)
+AUTOCOMPLETE = {
+    'limit': 10,
+    'rebuild_interval': int(os.getenv('AUTOCOMPLETE_REBUILD_SECONDS', '3600')),
+}
+
+# Row count estimates and cached filter choices for admin changelists
+# (core/admin_tools.py)
+ADMIN_CHANGELIST = {
+    'estimate_threshold': 10000,
+    'filter_timeout': 600,
+}
+
+# Pagination, card fragment caching and anonymous full-page caching of the
+# server-rendered site (core/pages.py)
+SITE_PAGES = {
+    'page_size': int(os.getenv('SITE_PAGE_SIZE', '24')),
+    'page_timeout': int(os.getenv('ANONYMOUS_PAGE_CACHE_SECONDS', '300')),
+}
+
+# Prometheus metrics at /metrics (core/metrics.py). Set PROMETHEUS_MULTIPROC_DIR
+# to a directory shared by all workers when running several processes.
+METRICS = {
+    'enabled': os.getenv('METRICS', 'True') == 'True',
+    'token': os.getenv('METRICS_TOKEN') or None,
+    'pool_sample_interval': 1.0,
+}
+
+# Per-request phase timing (core/profiling.py): Server-Timing headers, one JSON
+# log line per request and X-Profile profiles for staff. Off means no overhead.
+REQUEST_TIMING = {
+    'enabled': os.getenv('REQUEST_TIMING', 'False') == 'True',
+    'header': True,
+    'log': True,
+}
+
 # Logging configuration
 LOGGING = {
     'version': 1,
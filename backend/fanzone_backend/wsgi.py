@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fanzone_backend.settings')
 
 application = get_wsgi_application()
+
+# Build the in-memory indexes in the background before the first requests need them
+from core.background import start_builds  # noqa: E402
+
+start_builds()